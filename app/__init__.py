@@ -1,4 +1,4 @@
-from flask import Flask, redirect, url_for
+from flask import Flask, redirect, request, url_for
 from flask_session import Session
 import os
 from dotenv import load_dotenv
@@ -22,14 +22,54 @@ def create_app():
     app.config['TIMETABLE_FILE'] = os.environ.get('TIMETABLE_FILE', "timetable.csv")
     app.config['ATTENDANCE_DIR'] = os.environ.get('ATTENDANCE_DIR', "attendance_logs")
     app.config['SPLIT_DIR'] = os.environ.get('SPLIT_DIR', "split_encodings")
+    app.config['VIDEO_JOBS_DIR'] = os.environ.get('VIDEO_JOBS_DIR', "video_jobs")
+    # Live attendance WebSocket: pings keep proxies from closing quiet sockets
+    app.config['SOCK_SERVER_OPTIONS'] = {
+        'ping_interval': int(os.environ.get('LIVE_WS_PING_SECONDS', 25)),
+        'max_message_size': int(os.environ.get('LIVE_WS_MAX_FRAME_BYTES', 4 * 1024 * 1024))
+    }
     
     # Create necessary directories
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
     os.makedirs("encodings", exist_ok=True)
     os.makedirs(app.config['SPLIT_DIR'], exist_ok=True)
+    os.makedirs(app.config['VIDEO_JOBS_DIR'], exist_ok=True)
     
     # Initialize MongoDB
     init_mongo_client(app)
+
+    # Create missing indexes, then make sure the hot queries actually use them
+    if os.environ.get('MONGO_ENSURE_INDEXES', '1') == '1':
+        from .db.indexes import ensure_indexes
+        try:
+            for collection, name, error in ensure_indexes(app.db):
+                if error:
+                    app.logger.error(f"Index {collection}.{name} not created: {error}")
+        except Exception as e:
+            app.logger.error(f"Could not ensure MongoDB indexes: {e}")
+    if os.environ.get('MONGO_CHECK_QUERY_PLANS', '1') == '1':
+        from .db.indexes import check_query_plans
+        try:
+            problems = check_query_plans(app.db)
+        except Exception as e:
+            app.logger.error(f"Could not check MongoDB query plans: {e}")
+            problems = []
+        for query, stages in problems:
+            app.logger.error(f"Query '{query}' scans its whole collection: {' <- '.join(stages)}")
+        # A collection scan on a dashboard query degrades every page load; refuse to boot
+        if problems and os.environ.get('MONGO_QUERY_PLANS_STRICT', '1') == '1':
+            raise RuntimeError(f"{len(problems)} canonical queries are not covered by an index; "
+                               f"run mongo_indexes.py or set MONGO_QUERY_PLANS_STRICT=0 to boot anyway")
+    
+    # Load and warm up the face recognition model once per worker at boot
+    if os.environ.get('FACE_RECOGNITION_PRELOAD', '1') == '1':
+        from .services.face_recognition import get_face_service
+        try:
+            face_service = get_face_service()
+            app.logger.info(f"Face recognition model ready: {face_service.status()}")
+        except Exception as e:
+            # Routes retry the load lazily; don't stop the app from booting
+            app.logger.error(f"Face recognition preload failed: {e}")
     
     # Register blueprints
     from .routes import student_routes, faculty_routes, attendance_routes
@@ -37,7 +77,27 @@ def create_app():
     app.register_blueprint(student_routes.bp)
     app.register_blueprint(faculty_routes.bp)
     app.register_blueprint(attendance_routes.bp)
-    
+
+    # Expire live sessions whose page went away without stopping them
+    if os.environ.get('LIVE_SESSION_REAPER', '1') == '1':
+        attendance_routes.start_session_reaper()
+
+    # Report the MongoDB commands each request sends (X-Mongo-Commands header)
+    if os.environ.get('MONGO_QUERY_COUNT', '0') == '1':
+        from .db.query_counter import get_query_counter
+        query_counter = get_query_counter()
+
+        @app.before_request
+        def start_query_count():
+            query_counter.start()
+
+        @app.after_request
+        def report_query_count(response):
+            counts = query_counter.stop()
+            response.headers['X-Mongo-Commands'] = str(sum(counts.values()))
+            app.logger.info(f"{request.method} {request.path}: {sum(counts.values())} MongoDB commands {dict(counts)}")
+            return response
+
     # Root route
     @app.route('/')
     def root():
@@ -0,0 +1,200 @@
+from pymongo.errors import OperationFailure
+
+# One attendance record per student and lecture (same fields as
+# services.attendance_writer.ATTENDANCE_KEY)
+ATTENDANCE_KEY_FIELDS = ('date', 'subject', 'branch', 'semester', 'section', 'student.roll_no')
+
+# Every index the app relies on, created by ensure_indexes
+INDEXES = [
+    {
+        'collection': 'attendance',
+        'name': 'attendance_lecture_student',
+        'keys': [(field, 1) for field in ATTENDANCE_KEY_FIELDS],
+        # Partial on non-empty roll numbers: name-only records (video and
+        # single-frame live attendance) stay out of the unique key. A range
+        # filter rather than $type lets the planner use it for equality lookups
+        'options': {'unique': True, 'partialFilterExpression': {'student.roll_no': {'$gt': ''}}}
+    },
+    {
+        # Faculty dashboard: today's counts, per-class counts, trend and matrix
+        'collection': 'attendance',
+        'name': 'attendance_faculty_date_status',
+        'keys': [('faculty_email', 1), ('date', 1), ('student.status', 1)]
+    },
+    {
+        # Student dashboard and attendance pages, deleting a student's records
+        'collection': 'attendance',
+        'name': 'attendance_student_subject_date',
+        'keys': [('student.roll_no', 1), ('subject', 1), ('date', 1)]
+    },
+    {
+        'collection': 'students',
+        'name': 'students_roll_no',
+        'keys': [('roll_no', 1)]
+    },
+    {
+        'collection': 'students',
+        'name': 'students_class',
+        'keys': [('branch', 1), ('semester', 1), ('section', 1)]
+    },
+    {
+        'collection': 'faculty',
+        'name': 'faculty_email',
+        'keys': [('email', 1)]
+    },
+    {
+        # Stopped live sessions are removed once their grace period ends
+        'collection': 'live_sessions',
+        'name': 'live_sessions_expires_at',
+        'keys': [('expires_at', 1)],
+        'options': {'expireAfterSeconds': 0}
+    }
+]
+
+# Filters the hot paths run, with sample values, checked by check_query_plans
+CANONICAL_QUERIES = [
+    {
+        'name': 'faculty today by status',
+        'collection': 'attendance',
+        'filter': {'date': '2024-01-15', 'faculty_email': 'faculty@example.com', 'student.status': 'Present'}
+    },
+    {
+        'name': 'faculty class today',
+        'collection': 'attendance',
+        'filter': {'date': '2024-01-15', 'subject': 'DBMS', 'branch': 'CE', 'semester': 3, 'section': 'A',
+                   'faculty_email': 'faculty@example.com', 'student.status': 'Present'}
+    },
+    {
+        'name': 'faculty date range',
+        'collection': 'attendance',
+        'filter': {'faculty_email': 'faculty@example.com', 'date': {'$gte': '2024-01-01', '$lte': '2024-01-31'}}
+    },
+    {
+        'name': 'faculty all records',
+        'collection': 'attendance',
+        'filter': {'faculty_email': 'faculty@example.com'}
+    },
+    {
+        'name': 'attendance upsert key',
+        'collection': 'attendance',
+        'filter': {'date': '2024-01-15', 'subject': 'DBMS', 'branch': 'CE', 'semester': 3, 'section': 'A',
+                   'student.roll_no': '21CE001'}
+    },
+    {
+        'name': 'student records',
+        'collection': 'attendance',
+        'filter': {'student.roll_no': '21CE001'},
+        'sort': [('_id', -1)]
+    },
+    {
+        'name': 'student subject',
+        'collection': 'attendance',
+        'filter': {'student.roll_no': '21CE001', 'subject': 'DBMS', 'student.status': 'Present'}
+    },
+    {
+        'name': 'student subject week',
+        'collection': 'attendance',
+        'filter': {'student.roll_no': '21CE001', 'subject': 'DBMS', 'date': {'$gte': '2024-01-08'}}
+    },
+    {
+        'name': 'student by roll number',
+        'collection': 'students',
+        'filter': {'roll_no': '21CE001'}
+    },
+    {
+        'name': 'class roster',
+        'collection': 'students',
+        'filter': {'branch': 'CE', 'semester': 3, 'section': 'A'}
+    },
+    {
+        'name': 'branch and semester students',
+        'collection': 'students',
+        'filter': {'branch': 'CE', 'semester': 3}
+    },
+    {
+        'name': 'faculty by email',
+        'collection': 'faculty',
+        'filter': {'email': 'faculty@example.com'}
+    }
+]
+
+# Index build errors meaning an index of that name or keys exists with other options
+_CONFLICT_CODES = (85, 86)
+
+
+def ensure_indexes(db, collections=None):
+    """
+    Create the registered indexes that are missing
+
+    ``create_index`` is a no-op for an index that already exists with the
+    same keys and options, so this is safe to run on every boot.
+
+    Args:
+        db: pymongo database
+        collections: Only ensure the indexes of these collections (all if None)
+
+    Returns:
+        list: ``(collection, index name, error)`` per index; error is None on success
+    """
+    report = []
+    for spec in INDEXES:
+        if collections is not None and spec['collection'] not in collections:
+            continue
+        try:
+            db[spec['collection']].create_index(spec['keys'], name=spec['name'], **spec.get('options', {}))
+            report.append((spec['collection'], spec['name'], None))
+        except OperationFailure as e:
+            if e.code in _CONFLICT_CODES:
+                error = f"exists with different options; drop it to rebuild ({e})"
+            elif e.code == 11000:
+                error = f"duplicate records block the unique index; run dedupe_attendance.py ({e})"
+            else:
+                error = str(e)
+            report.append((spec['collection'], spec['name'], error))
+    return report
+
+
+def plan_stages(plan):
+    """
+    Stages of an explained query plan, outermost first
+
+    Args:
+        plan: ``winningPlan`` document of an explain result
+
+    Returns:
+        list: Stage names (``IXSCAN``, ``FETCH``, ``COLLSCAN``, ...)
+    """
+    stages = []
+    pending = [plan]
+    while pending:
+        node = pending.pop(0)
+        if 'queryPlan' in node:  # slot-based engine wraps the classic plan
+            node = node['queryPlan']
+        if 'stage' in node:
+            stages.append(node['stage'])
+        if 'inputStage' in node:
+            pending.append(node['inputStage'])
+        pending.extend(node.get('inputStages', []))
+    return stages
+
+
+def check_query_plans(db, queries=None):
+    """
+    Explain the canonical queries and find the ones that scan a whole collection
+
+    Args:
+        db: pymongo database
+        queries: Queries to check (``CANONICAL_QUERIES`` if None)
+
+    Returns:
+        list: ``(query name, plan stages)`` for every query planned as a COLLSCAN
+    """
+    problems = []
+    for query in CANONICAL_QUERIES if queries is None else queries:
+        cursor = db[query['collection']].find(query['filter'])
+        if query.get('sort'):
+            cursor = cursor.sort(query['sort'])
+        stages = plan_stages(cursor.explain()['queryPlanner']['winningPlan'])
+        if 'COLLSCAN' in stages:
+            problems.append((query['name'], stages))
+    return problems
@@ -1,5 +1,6 @@
 from pymongo import MongoClient
 import os
+from .query_counter import get_query_counter
 
 client = None
 db = None
@@ -16,7 +17,7 @@ def init_mongo_client(app):
     if not mongodb_uri:
         raise ValueError("Please set MONGO_URI environment variable for MongoDB Atlas")
 
-    client = MongoClient(mongodb_uri)
+    client = MongoClient(mongodb_uri, event_listeners=[get_query_counter()])
     db = client[mongodb_db]
     attendance_col = db["attendance"]
     students_col = db["students"]
@@ -36,5 +37,6 @@ def get_collections():
         "students": db["students"],
         "attendance": db["attendance"],
         "users": db["users"],
-        "timetable": db["timetable"]
+        "timetable": db["timetable"],
+        "live_sessions": db["live_sessions"]
     }
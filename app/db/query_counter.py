@@ -0,0 +1,76 @@
+import threading
+from collections import Counter
+from contextlib import contextmanager
+from pymongo import monitoring
+
+_counter = None
+_counter_lock = threading.Lock()
+
+
+class QueryCounter(monitoring.CommandListener):
+    """
+    Count the MongoDB commands a thread sends
+
+    Registered on the client as a command listener. pymongo reports a
+    command's start on the thread that sends it, so counting is scoped to
+    one thread (one request): commands are only tallied between ``start``
+    and ``stop``, and cost nothing otherwise.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+
+    def start(self):
+        """
+        Start counting the current thread's commands
+
+        Returns:
+            Counter: Commands by name, updated as they are sent
+        """
+        self._local.counts = Counter()
+        return self._local.counts
+
+    def stop(self):
+        """
+        Stop counting the current thread's commands
+
+        Returns:
+            Counter: Commands by name sent since ``start`` (empty if not counting)
+        """
+        counts = getattr(self._local, 'counts', None)
+        self._local.counts = None
+        return counts if counts is not None else Counter()
+
+    @contextmanager
+    def counting(self):
+        """Count the commands sent inside a ``with`` block"""
+        counts = self.start()
+        try:
+            yield counts
+        finally:
+            self.stop()
+
+    def started(self, event):
+        counts = getattr(self._local, 'counts', None)
+        if counts is not None:
+            counts[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+def get_query_counter():
+    """
+    Get the process-wide query counter registered on the Mongo client
+
+    Returns:
+        QueryCounter: Shared counter instance
+    """
+    global _counter
+    with _counter_lock:
+        if _counter is None:
+            _counter = QueryCounter()
+        return _counter
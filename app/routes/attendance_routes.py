@@ -1,32 +1,41 @@
-from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, session, current_app
+from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, session, current_app, Response
 from werkzeug.utils import secure_filename
 import os
-import pickle
-import numpy as np
 import pandas as pd
-import cv2
-import base64
-import io
+import json
 import threading
 import time
-from threading import Lock
 import logging
 from datetime import datetime
-from PIL import Image
-from ..services.face_recognition import FaceRecognitionService
+from ..services.face_recognition import get_face_service, get_face_service_status
 from ..db.mongo_client import get_collections
 from ..services.attendance import AttendanceService
+from ..services.attendance_writer import attendance_upsert, get_attendance_writer
+from ..services.gallery_cache import get_gallery_cache
+from ..services.face_matcher import match_embeddings
+from ..services.video_attendance import recognize_video
+from ..services.video_jobs import get_video_job_queue
+from ..services.change_detector import ChangeDetector
+from ..services.face_tracker import FaceTracker, track_and_recognize
+from ..services.live_channel import LiveFrameChannel
+from ..services.live_events import format_sse
+from ..services.live_sessions import TimingWindow, get_session_reaper, get_session_store
+from ..utils.camera_utils import base64_to_frame, bytes_to_frame
 
-bp = Blueprint('attendance', __name__, url_prefix='/attendance')
+try:
+    from flask_sock import Sock
+except ImportError:  # WebSocket channel is optional; live attendance falls back to HTTP
+    Sock = None
 
-# Global variables for live attendance tracking
-live_attendance_sessions = {}  # Store active sessions
-session_lock = Lock()  # Thread-safe access to sessions
+bp = Blueprint('attendance', __name__, url_prefix='/attendance')
 
 # Add logging for debugging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# How long live frames hold their session's lock, and how long stopping takes
+live_timings = {'frame_lock_hold': TimingWindow(), 'stop_session': TimingWindow()}
+
 @bp.route('/', methods=['GET'])
 def attendance():
     """Attendance page with class selection"""
@@ -54,7 +63,7 @@ def attendance():
 
 @bp.route('/upload', methods=['POST'])
 def attendance_upload():
-    """Upload video for attendance processing"""
+    """Upload video for attendance processing; the video is processed by a background job"""
     try:
         faculty_email = session.get('faculty_email')
         if not faculty_email:
@@ -82,89 +91,6 @@ def attendance_upload():
             return redirect('/multilogin')
         faculty_name = faculty_row.iloc[0]['faculty_name']
         
-        # Save video temporarily
-        os.makedirs('temp_uploads', exist_ok=True)
-        video_path = os.path.join('temp_uploads', secure_filename(video.filename))
-        video.save(video_path)
-        logger.info(f"Video saved to {video_path}")
-        
-        # Load encodings
-        pickle_path = f'split_encodings/{class_id}.pickle'
-        if not os.path.exists(pickle_path):
-            logger.error(f"Encoding file not found: {pickle_path}")
-            flash('Encoding file not found for this class.', 'error')
-            os.remove(video_path)
-            return redirect(url_for('attendance.attendance'))
-        
-        logger.info(f"Loading encodings from {pickle_path}")
-        try:
-            with open(pickle_path, 'rb') as f:
-                data = pickle.load(f)
-                known_encodings = np.array(data['encodings'])
-                known_metadata = data.get('metadata', [])
-        except (ModuleNotFoundError, ImportError, ValueError) as e:
-            logger.error(f"Could not load pickle file due to version incompatibility: {e}")
-            flash('Encoding file is incompatible with current numpy version. Please re-register students.', 'error')
-            os.remove(video_path)
-            return redirect(url_for('attendance.attendance'))
-        
-        logger.info(f"Loaded {len(known_encodings)} encodings for {len(known_metadata)} students")
-        
-        # Initialize face recognition service
-        try:
-            face_service = FaceRecognitionService()
-            logger.info("Face recognition service initialized successfully")
-        except Exception as e:
-            logger.error(f"Failed to initialize face recognition service: {e}")
-            os.remove(video_path)
-            flash('Failed to initialize face recognition service.', 'error')
-            return redirect(url_for('attendance.attendance'))
-        
-        # Process video
-        video_capture = cv2.VideoCapture(video_path)
-        if not video_capture.isOpened():
-            logger.error(f"Failed to open video file: {video_path}")
-            os.remove(video_path)
-            flash('Failed to process video file.', 'error')
-            return redirect(url_for('attendance.attendance'))
-        
-        recognized_students = set()
-        tolerance = 0.85
-        frame_count = 0
-        
-        logger.info("Starting video processing...")
-        while True:
-            ret, frame = video_capture.read()
-            if not ret:
-                break
-            
-            frame_count += 1
-            if frame_count % 30 == 0:  # Log every 30 frames
-                logger.info(f"Processing frame {frame_count}")
-            
-            small_frame = cv2.resize(frame, (0, 0), fx=0.25, fy=0.25)
-            rgb_small_frame = cv2.cvtColor(small_frame, cv2.COLOR_BGR2RGB)
-            
-            try:
-                faces = face_service.get_faces(rgb_small_frame)
-                for face in faces:
-                    embedding = face.normed_embedding
-                    dists = np.linalg.norm(known_encodings - embedding, axis=1)
-                    min_dist = np.min(dists)
-                    min_idx = np.argmin(dists)
-                    if min_dist < tolerance:
-                        name = known_metadata[min_idx].get('roll_no') or known_metadata[min_idx].get('name')
-                        recognized_students.add(name)
-                        logger.info(f"Recognized student: {name} (distance: {min_dist:.3f})")
-            except Exception as e:
-                logger.error(f"Error processing frame {frame_count}: {e}")
-                continue
-        
-        video_capture.release()
-        os.remove(video_path)
-        logger.info(f"Video processing completed. Recognized {len(recognized_students)} students")
-        
-        # Mark attendance in DB for recognized students
         # Get lecture info from timetable
         df = pd.read_csv('timetable.csv')
         branch, semester = class_id.split('_')
@@ -173,37 +99,45 @@ def attendance_upload():
             logger.error(f"Lecture info not found for class {class_id}")
             flash('Lecture info not found.', 'error')
             return redirect(url_for('attendance.attendance'))
+        lecture = {key: value.item() if hasattr(value, 'item') else value
+                   for key, value in lecture_row.iloc[0].to_dict().items()}
         
-        lecture = lecture_row.iloc[0]
-        subject = lecture['subject']
-        section = lecture['section']
-        classroom = lecture['classroom']
-        start_time = lecture['start_time']
-        end_time = lecture['end_time']
-        date_str = datetime.now().strftime('%Y-%m-%d')
+        # Load encodings (the job reuses the cached gallery)
+        gallery_cache = get_gallery_cache(current_app.config['SPLIT_DIR'])
+        try:
+            gallery = gallery_cache.get(class_id)
+        except (ModuleNotFoundError, ImportError, ValueError) as e:
+            logger.error(f"Could not load encodings due to version incompatibility: {e}")
+            flash('Encoding file is incompatible with current numpy version. Please re-register students.', 'error')
+            return redirect(url_for('attendance.attendance'))
+        if gallery is None:
+            logger.error(f"Encoding file not found for class {class_id}")
+            flash('Encoding file not found for this class.', 'error')
+            return redirect(url_for('attendance.attendance'))
         
-        # Save to database
-        collections = get_collections()
-        saved_count = 0
-        for name in recognized_students:
-            collections['attendance'].insert_one({
-                'date': date_str,
-                'subject': subject,
-                'faculty_email': faculty_email,
-                'classroom': classroom,
-                'branch': branch,
-                'semester': int(semester),
-                'section': section,
-                'student': {
-                    'name': name,
-                    'status': 'Present'
-                }
-            })
-            saved_count += 1
+        # Save video temporarily
+        os.makedirs('temp_uploads', exist_ok=True)
+        video_path = os.path.join('temp_uploads', f"{int(time.time() * 1000)}_{secure_filename(video.filename)}")
+        video.save(video_path)
+        logger.info(f"Video saved to {video_path}")
         
-        logger.info(f"Saved {saved_count} attendance records to database")
+        job_queue = get_video_job_queue(current_app.config['VIDEO_JOBS_DIR'])
+        job_id = job_queue.submit(_run_video_job, {
+            'video_path': video_path,
+            'class_id': class_id,
+            'split_dir': current_app.config['SPLIT_DIR'],
+            'faculty_email': faculty_email,
+            'lecture': lecture,
+            'date': datetime.now().strftime('%Y-%m-%d')
+        }, faculty_email=faculty_email, class_id=class_id)
+        logger.info(f"Queued video job {job_id} for class {class_id}")
         
-        return render_template('attendance_result.html', present_students=recognized_students, lecture=lecture)
+        return jsonify({
+            'job_id': job_id,
+            'status': 'queued',
+            'status_url': url_for('attendance.video_job_status', job_id=job_id),
+            'result_url': url_for('attendance.video_job_result', job_id=job_id)
+        }), 202
         
     except Exception as e:
         logger.error(f"Unexpected error in attendance_upload: {e}")
@@ -220,6 +154,102 @@ def attendance_upload():
         flash(f'An error occurred while processing the video: {str(e)}', 'error')
         return redirect(url_for('attendance.attendance'))
 
+def _run_video_job(job):
+    """Background job: recognize students in an uploaded video and save their attendance"""
+    payload = job.payload
+    class_id = payload['class_id']
+    try:
+        logger.info(f"Video job {job.job_id}: processing {payload['video_path']}")
+        outcome = recognize_video(payload['video_path'], payload['split_dir'], class_id, tolerance=0.85,
+                                  progress=job.progress)
+    finally:
+        if os.path.exists(payload['video_path']):
+            os.remove(payload['video_path'])
+    recognized_students = outcome['recognized']
+    sampling = outcome['sampling'] or {}
+    logger.info(f"Video job {job.job_id}: recognized {len(recognized_students)} students "
+                f"in {outcome['frames_done']} sampled frames over {outcome['workers']} workers "
+                f"({sampling.get('sample_fps_achieved')} fps, {sampling.get('decode_ms_per_sample')} ms decode/frame, "
+                f"bottleneck: {outcome['timings']['bottleneck']}, "
+                f"recognition ratio: {outcome['tracking']['recognition_ratio']}, "
+                f"skip ratio: {outcome['gating']['skip_ratio']}, "
+                f"stopped: {outcome['early_stop']['reason']} at {outcome['early_stop']['fraction_processed']:.0%})")
+    
+    # Mark attendance in DB for recognized students
+    lecture = payload['lecture']
+    branch, semester = class_id.split('_')
+    saved = AttendanceService().save_attendance([{
+        'date': payload['date'],
+        'subject': lecture['subject'],
+        'faculty_email': payload['faculty_email'],
+        'classroom': lecture['classroom'],
+        'branch': branch,
+        'semester': int(semester),
+        'section': lecture['section'],
+        'student': {
+            'name': name,
+            'status': 'Present'
+        }
+    } for name in recognized_students])
+    saved_count = len(recognized_students)
+    
+    logger.info(f"Saved {saved_count} attendance records to database "
+                f"({saved['inserted']} new, {saved['updated']} updated)")
+    return {'present_students': recognized_students, 'saved_count': saved_count, 'saved': saved,
+            'sampling': outcome['sampling'],
+            'timings': outcome['timings'], 'tracking': outcome['tracking'], 'gating': outcome['gating'],
+            'early_stop': outcome['early_stop'], 'segments': outcome['segments'], 'workers': outcome['workers']}
+
+def _get_own_video_job(job_id):
+    """Load a video job if it belongs to the logged-in faculty"""
+    job = get_video_job_queue(current_app.config['VIDEO_JOBS_DIR']).get(job_id)
+    if job is None or job.get('faculty_email') != session.get('faculty_email'):
+        return None
+    return job
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def video_job_status(job_id):
+    """Progress of a video attendance job"""
+    if not session.get('faculty_email'):
+        return jsonify({'error': 'Not logged in'}), 401
+    job = _get_own_video_job(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify({
+        'job_id': job['job_id'],
+        'status': job['status'],
+        'class_id': job.get('class_id'),
+        'frames_done': job.get('frames_done'),
+        'frames_total': job.get('frames_total'),
+        'eta_seconds': job.get('eta_seconds'),
+        'recognized': job.get('recognized', []),
+        'recognized_count': len(job.get('recognized', [])),
+        'error': job.get('error'),
+        'sampling': (job.get('result') or {}).get('sampling'),
+        'timings': (job.get('result') or {}).get('timings'),
+        'gating': (job.get('result') or {}).get('gating'),
+        'early_stop': (job.get('result') or {}).get('early_stop'),
+        'result_url': url_for('attendance.video_job_result', job_id=job_id)
+    })
+
+@bp.route('/jobs/<job_id>/result', methods=['GET'])
+def video_job_result(job_id):
+    """Result page of a finished video attendance job"""
+    if not session.get('faculty_email'):
+        return redirect('/multilogin')
+    job = _get_own_video_job(job_id)
+    if job is None:
+        flash('Video job not found.', 'error')
+        return redirect(url_for('attendance.attendance'))
+    if job['status'] == 'failed':
+        flash(f"An error occurred while processing the video: {job.get('error')}", 'error')
+        return redirect(url_for('attendance.attendance'))
+    if job['status'] != 'done':
+        flash('The video is still being processed.', 'info')
+        return redirect(url_for('attendance.attendance'))
+    return render_template('attendance_result.html', present_students=job['result']['present_students'],
+                           lecture=job['payload']['lecture'])
+
 # Manual Attendance Routes
 @bp.route('/manual_attendance', methods=['GET', 'POST'])
 def manual_attendance():
@@ -324,28 +354,53 @@ def manual_attendance_submit():
     # Get present students from form
     present_rolls = request.form.getlist('present')
 
-    # Mark attendance in DB with required structure
-    for roll in roll_numbers:
-        status = 'Present' if roll in present_rolls else 'Absent'
-        name = roll_name_map.get(roll, '')
-        collections['attendance'].insert_one({
-            'date': date_str,
-            'subject': subject,
-            'faculty_email': faculty_email,
-            'classroom': classroom,
-            'branch': branch,
-            'semester': int(semester),
-            'section': section,
-            'student': {
-                'roll_no': roll,
-                'name': name,
-                'status': status
-            }
-        })
+    # Mark attendance in DB with required structure; resubmitting updates the same records
+    saved = AttendanceService().save_attendance([{
+        'date': date_str,
+        'subject': subject,
+        'faculty_email': faculty_email,
+        'classroom': classroom,
+        'branch': branch,
+        'semester': int(semester),
+        'section': section,
+        'student': {
+            'roll_no': roll,
+            'name': roll_name_map.get(roll, ''),
+            'status': 'Present' if roll in present_rolls else 'Absent'
+        }
+    } for roll in roll_numbers])
+    logger.info(f"Manual attendance for {branch}_{semester} {subject}: "
+                f"{saved['inserted']} new, {saved['updated']} updated records")
     flash('Attendance marked successfully!', 'success')
     return redirect('/dashboard')
 
 # Live Attendance Routes
+# Raw frame bodies accepted by the live endpoints besides multipart forms
+_BINARY_FRAME_TYPES = ('application/octet-stream', 'image/jpeg', 'image/png', 'image/webp')
+
+def _has_frame():
+    """Whether the request carries a frame in any of the supported encodings"""
+    return (request.mimetype in _BINARY_FRAME_TYPES or 'frame' in request.files
+            or bool(request.form.get('frame')))
+
+def _read_frame():
+    """
+    Decode the frame sent with a live attendance request
+    
+    The frame may be a raw image body (``application/octet-stream`` or an
+    image type, other fields in the query string), a ``frame`` file part of a
+    multipart form (``canvas.toBlob``), or the older base64 data URL in the
+    ``frame`` form field.
+    
+    Returns:
+        numpy array: RGB frame, or None if the frame could not be decoded
+    """
+    if request.mimetype in _BINARY_FRAME_TYPES:
+        return bytes_to_frame(request.get_data(cache=False))
+    if 'frame' in request.files:
+        return bytes_to_frame(request.files['frame'].read())
+    return base64_to_frame(request.form.get('frame', ''))
+
 @bp.route('/live_frame', methods=['POST'])
 def attendance_live_frame():
     """Process single frame for live attendance"""
@@ -353,40 +408,34 @@ def attendance_live_frame():
     if not faculty_email:
         return jsonify({'error': 'Not logged in'}), 401
     
-    class_id = request.form.get('class_id')
-    img_data = request.form.get('frame')
-    if not class_id or not img_data:
+    class_id = request.values.get('class_id')
+    if not class_id or not _has_frame():
         return jsonify({'error': 'Missing data'}), 400
     
     # Load encodings
-    pickle_path = f'split_encodings/{class_id}.pickle'
-    if not os.path.exists(pickle_path):
-        return jsonify({'error': 'Encoding file not found'}), 404
-    
     try:
-        with open(pickle_path, 'rb') as f:
-            data = pickle.load(f)
-            known_encodings = np.array(data['encodings'])
-            known_metadata = data.get('metadata', [])
+        gallery = get_gallery_cache(current_app.config['SPLIT_DIR']).get(class_id)
     except (ModuleNotFoundError, ImportError, ValueError) as e:
-        logger.error(f"Could not load pickle file due to version incompatibility: {e}")
+        logger.error(f"Could not load encodings due to version incompatibility: {e}")
         return jsonify({'error': 'Encoding file is incompatible with current numpy version'}), 500
+    if gallery is None:
+        return jsonify({'error': 'Encoding file not found'}), 404
+    known_encodings = gallery.encodings
+    known_metadata = gallery.metadata
     
-    face_service = FaceRecognitionService()
-    img_bytes = base64.b64decode(img_data.split(',')[1])
-    img = Image.open(io.BytesIO(img_bytes)).convert('RGB')
-    frame = np.array(img)
+    frame = _read_frame()
+    if frame is None:
+        return jsonify({'error': 'Invalid frame data'}), 400
+    face_service = get_face_service()
     faces = face_service.get_faces(frame)
     recognized = set()
     tolerance = 0.85
     
-    for face in faces:
-        embedding = face.normed_embedding
-        dists = np.linalg.norm(known_encodings - embedding, axis=1)
-        min_dist = np.min(dists)
-        min_idx = np.argmin(dists)
-        if min_dist < tolerance:
-            name = known_metadata[min_idx].get('roll_no') or known_metadata[min_idx].get('name')
+    matches = match_embeddings([face.normed_embedding for face in faces], known_encodings,
+                               known_metadata, tolerance, known_sq_norms=gallery.sq_norms)
+    for match in matches:
+        if match['metadata'] is not None:
+            name = match['metadata'].get('roll_no') or match['metadata'].get('name')
             recognized.add(name)
     
     return jsonify({'recognized': list(recognized)})
@@ -426,36 +475,35 @@ def attendance_live_submit():
     end_time = lecture['end_time']
     date_str = datetime.now().strftime('%Y-%m-%d')
     
-    collections = get_collections()
-    for name in recognized_students:
-        collections['attendance'].insert_one({
-            'date': date_str,
-            'subject': subject,
-            'faculty_email': faculty_email,
-            'classroom': classroom,
-            'branch': branch,
-            'semester': int(semester),
-            'section': section,
-            'student': {
-                'name': name,
-                'status': 'Present'
-            }
-        })
+    saved = AttendanceService().save_attendance([{
+        'date': date_str,
+        'subject': subject,
+        'faculty_email': faculty_email,
+        'classroom': classroom,
+        'branch': branch,
+        'semester': int(semester),
+        'section': section,
+        'student': {
+            'name': name,
+            'status': 'Present'
+        }
+    } for name in recognized_students])
     
-    return jsonify({'success': True, 'present': recognized_students})
+    return jsonify({'success': True, 'present': recognized_students, 'saved': saved})
 
 @bp.route('/model_status')
 def attendance_model_status():
     """Check if face recognition model is ready"""
     try:
-        face_service = FaceRecognitionService()
-        # Dummy recognition: blank image
-        import numpy as np
-        blank = np.zeros((100, 100, 3), dtype=np.uint8)
-        _ = face_service.get_faces(blank)
-        return jsonify({'ready': True})
+        # Loads and warms up the shared model if this worker hasn't yet
+        face_service = get_face_service()
+        return jsonify({
+            'ready': True,
+            'status': face_service.status(),
+            'gallery_cache': get_gallery_cache(current_app.config['SPLIT_DIR']).stats()
+        })
     except Exception as e:
-        return jsonify({'ready': False, 'error': str(e)})
+        return jsonify({'ready': False, 'error': str(e), 'status': get_face_service_status()})
 
 # Live attendance session management
 @bp.route('/start_session', methods=['POST'])
@@ -472,27 +520,24 @@ def start_attendance_session():
     logger.info(f"Starting attendance session for faculty {faculty_email}, class {class_id}")
     
     # Check if encoding file exists
-    pickle_path = f'split_encodings/{class_id}.pickle'
-    if not os.path.exists(pickle_path):
-        logger.error(f"Encoding file not found: {pickle_path}")
+    if not get_gallery_cache(current_app.config['SPLIT_DIR']).store.exists(class_id):
+        logger.error(f"Encoding file not found for class {class_id}")
         return jsonify({'error': 'Encoding file not found for this class'}), 404
     
+    # Resolve the lecture now, so recognized students can be saved as they come in
+    try:
+        lecture = _lecture_for_class(faculty_email, class_id)
+    except LookupError as e:
+        return jsonify({'error': str(e)}), 404
+    
     # Create unique session ID
     session_id = f"{faculty_email}_{class_id}_{int(time.time())}"
     
     # Initialize session data
-    with session_lock:
-        live_attendance_sessions[session_id] = {
-            'faculty_email': faculty_email,
-            'class_id': class_id,
-            'recognized_students': set(),
-            'is_active': True,
-            'start_time': time.time(),
-            'thread': None,
-            'model_verified': False
-        }
+    store = get_session_store()
+    store.create(session_id, faculty_email, class_id, lecture)
     
-    logger.info(f"Created session {session_id} with {len(live_attendance_sessions)} active sessions")
+    logger.info(f"Created session {session_id} with {store.count()} active sessions")
     
     return jsonify({
         'success': True,
@@ -500,92 +545,248 @@ def start_attendance_session():
         'message': 'Attendance session started'
     })
 
-@bp.route('/process_frame', methods=['POST'])
-def process_attendance_frame():
-    """Process a frame in live attendance session"""
-    faculty_email = session.get('faculty_email')
-    if not faculty_email:
-        return jsonify({'error': 'Not logged in'}), 401
+def _live_student_id(student_info):
+    """Identifier a live session records for a recognized student"""
+    roll_no = student_info.get('roll_no', '')
+    name = student_info.get('name', '')
+    return f"{roll_no}_{name}" if roll_no else name
+
+def _split_live_student_id(student_id):
+    """Roll number and name of a live session student identifier ("roll_no_name" or just "name")"""
+    if '_' in student_id:
+        roll_no, name = student_id.split('_', 1)
+        return roll_no, name
+    return '', student_id
+
+def _lecture_for_class(faculty_email, class_id):
+    """
+    Find the lecture a faculty teaches a class today, from the CSV timetable
     
-    session_id = request.form.get('session_id')
-    img_data = request.form.get('frame')
+    Args:
+        faculty_email: Faculty taking attendance
+        class_id: Class identifier (``{branch}_{semester}``)
+        
+    Returns:
+        dict: Fields every attendance record of the lecture shares
+        
+    Raises:
+        LookupError: If the faculty or the lecture of the class is unknown
+    """
+    faculty_map = pd.read_csv('faculty_users.csv')
+    faculty_map['faculty_email'] = faculty_map['faculty_email'].str.strip().str.lower()
+    faculty_map['faculty_name'] = faculty_map['faculty_name'].str.strip().str.lower()
+    faculty_row = faculty_map[faculty_map['faculty_email'] == faculty_email.strip().lower()]
     
-    if not session_id or not img_data:
-        return jsonify({'error': 'Missing session_id or frame data'}), 400
+    if faculty_row.empty:
+        logger.error(f"Faculty {faculty_email} not found in faculty_users.csv")
+        raise LookupError('Faculty not found')
     
-    with session_lock:
-        if session_id not in live_attendance_sessions:
-            return jsonify({'error': 'Session not found'}), 404
-        
-        session_data = live_attendance_sessions[session_id]
-        if not session_data['is_active']:
-            return jsonify({'error': 'Session is not active'}), 400
+    faculty_name = faculty_row.iloc[0]['faculty_name']
+    df = pd.read_csv('timetable.csv')
+    branch, semester = class_id.split('_')
+    lecture_row = df[(df['branch'] == branch) & (df['semester'].astype(str) == semester) & (df['faculty_name'].str.strip().str.lower() == faculty_name)]
+    
+    if lecture_row.empty:
+        logger.error(f"Lecture info not found for class {class_id}")
+        raise LookupError('Lecture info not found')
+    
+    lecture = lecture_row.iloc[0]
+    return {
+        'date': datetime.now().strftime('%Y-%m-%d'),
+        'subject': str(lecture['subject']),
+        'faculty_email': faculty_email,
+        'classroom': str(lecture['classroom']),
+        'branch': branch,
+        'semester': int(semester),
+        'section': str(lecture['section'])
+    }
+
+def _live_attendance_record(lecture, roll_no, name, status):
+    """Attendance document of one student of a live session's lecture"""
+    record = dict(lecture)
+    record['student'] = {'roll_no': roll_no, 'name': name, 'status': status} if roll_no else \
+        {'name': name, 'status': status}
+    return record
+
+def _get_live_session(session_id, faculty_email=None):
+    """
+    Look up an active live session
+    
+    Args:
+        session_id: Live session identifier
+        faculty_email: If given, the session must belong to this faculty
+        
+    Returns:
+        tuple: (session data, None, None), or (None, error message, HTTP status)
+    """
+    session_data = get_session_store().get(session_id)
+    if session_data is None or (faculty_email and session_data['faculty_email'] != faculty_email):
+        return None, 'Session not found', 404
+    if not session_data['is_active']:
+        return None, 'Session is not active', 400
+    return session_data, None, None
+
+def _process_live_frame(session_id, session_data, frame):
+    """
+    Run one frame of a live session through change gating, tracking and recognition
     
+    Args:
+        session_id: Live session identifier
+        session_data: Session from the live session store
+        frame: Decoded RGB frame
+        
+    Returns:
+        tuple: (response dict, HTTP status)
+    """
     try:
-        # Load encodings for this class
+        # Load encodings for this class (cached in-process after the first frame)
         class_id = session_data['class_id']
-        pickle_path = f'split_encodings/{class_id}.pickle'
-        
         try:
-            with open(pickle_path, 'rb') as f:
-                data = pickle.load(f)
-                known_encodings = np.array(data['encodings'])
-                known_metadata = data.get('metadata', [])
+            gallery = get_gallery_cache(current_app.config['SPLIT_DIR']).get(class_id)
         except (ModuleNotFoundError, ImportError, ValueError) as e:
-            logger.error(f"Could not load pickle file due to version incompatibility: {e}")
-            return jsonify({'error': 'Encoding file is incompatible with current numpy version'}), 500
+            logger.error(f"Could not load encodings due to version incompatibility: {e}")
+            return {'error': 'Encoding file is incompatible with current numpy version'}, 500
+        if gallery is None:
+            return {'error': 'Encoding file not found for this class'}, 404
         
         # Initialize face recognition
-        face_service = FaceRecognitionService()
-        
-        # Process the frame
-        img_bytes = base64.b64decode(img_data.split(',')[1])
-        img = Image.open(io.BytesIO(img_bytes)).convert('RGB')
-        frame = np.array(img)
-        
-        # Attempt inference; success here (even with zero faces) verifies model
-        faces = face_service.get_faces(frame)
-        with session_lock:
-            if session_id in live_attendance_sessions:
-                live_attendance_sessions[session_id]['model_verified'] = True
-        recognized_in_frame = set()
-        tolerance = 0.85
-        
-        for face in faces:
-            embedding = face.normed_embedding
-            dists = np.linalg.norm(known_encodings - embedding, axis=1)
-            min_dist = np.min(dists)
-            min_idx = np.argmin(dists)
-            
-            if min_dist < tolerance:
-                student_info = known_metadata[min_idx]
-                roll_no = student_info.get('roll_no', '')
-                name = student_info.get('name', '')
-                student_id = f"{roll_no}_{name}" if roll_no else name
-                recognized_in_frame.add(student_id)
-        
-        # Update session with new recognitions
-        with session_lock:
-            if session_id in live_attendance_sessions:
-                session_data = live_attendance_sessions[session_id]
-                session_data['recognized_students'].update(recognized_in_frame)
-        
-        with session_lock:
-            current_verified = live_attendance_sessions.get(session_id, {}).get('model_verified', False)
-            total_recognized = len(live_attendance_sessions.get(session_id, {}).get('recognized_students', set()))
-        return jsonify({
+        face_service = get_face_service()
+        
+        # Frames where nothing moved since the last processed one reuse its result.
+        # Tracker and change detector belong to this worker; the lock is per session
+        store = get_session_store()
+        runtime = store.runtime(session_id)
+        now = time.monotonic()
+        with runtime['lock']:
+            locked = time.perf_counter()
+            tracker = runtime.setdefault('tracker', FaceTracker())
+            change_detector = runtime.setdefault('change_detector', ChangeDetector())
+            skipped = not change_detector.changed(frame, now)
+            if skipped:
+                tracker.carry_forward(now)
+                recognized_in_frame = set(runtime.get('last_recognized_in_frame', ()))
+            live_timings['frame_lock_hold'].add(time.perf_counter() - locked)
+        
+        if not skipped:
+            # Attempt inference; success here (even with zero faces) verifies model.
+            # Faces are tracked across frames, so only new or re-verified tracks are recognized
+            tolerance = 0.85
+            tracks = track_and_recognize(face_service, tracker, [frame], [now], gallery, tolerance,
+                                         _live_student_id)[0]
+            recognized_in_frame = {track.identity(tracker.min_votes) for track in tracks}
+            recognized_in_frame.discard(None)
+            runtime['last_recognized_in_frame'] = recognized_in_frame
+        
+        # Merge the recognitions into the session (a set union in the store)
+        result = store.record_frame(session_id, recognized_in_frame, skipped)
+        if result is None:
+            return {'error': 'Session is not active'}, 400
+        
+        # Save each student as Present the first time any worker recognizes them
+        if result['new_students'] and session_data.get('lecture'):
+            get_attendance_writer().submit(session_id, [
+                attendance_upsert(_live_attendance_record(session_data['lecture'], *_split_live_student_id(student_id),
+                                                          'Present'))
+                for student_id in sorted(result['new_students'])
+            ])
+        
+        # Event streams only hear about actual changes
+        if result['new_students'] or result['newly_verified']:
+            events = store.events(session_id)
+            if events is not None:
+                events.publish('update', {
+                    'new_students': sorted(result['new_students']),
+                    'total_recognized': result['total_recognized'],
+                    'model_verified': result['model_verified']
+                })
+        return {
             'success': True,
             'recognized_in_frame': list(recognized_in_frame),
-            'total_recognized': total_recognized,
-            'model_verified': current_verified
-        })
+            'new_students': sorted(result['new_students']),
+            'total_recognized': result['total_recognized'],
+            'model_verified': result['model_verified'],
+            'skipped': skipped,
+            'tracking': tracker.stats(),
+            'gating': result['gating']
+        }, 200
         
     except Exception as e:
-        return jsonify({'error': f'Processing error: {str(e)}'}), 500
+        return {'error': f'Processing error: {str(e)}'}, 500
+
+@bp.route('/process_frame', methods=['POST'])
+def process_attendance_frame():
+    """Process a frame in live attendance session"""
+    faculty_email = session.get('faculty_email')
+    if not faculty_email:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    session_id = request.values.get('session_id')
+    
+    if not session_id or not _has_frame():
+        return jsonify({'error': 'Missing session_id or frame data'}), 400
+    
+    session_data, error, status = _get_live_session(session_id)
+    if error:
+        return jsonify({'error': error}), status
+    
+    frame = _read_frame()
+    if frame is None:
+        return jsonify({'error': 'Invalid frame data'}), 400
+    response, status = _process_live_frame(session_id, session_data, frame)
+    return jsonify(response), status
+
+if Sock is not None:
+    sock = Sock()
+    
+    @sock.route('/live_ws', bp=bp)
+    def live_attendance_socket(ws):
+        """
+        Persistent channel for a live session: JPEG frames up, results down
+        
+        The client sends each frame as a binary message and receives one JSON
+        message per processed frame with the recognition delta
+        (``new_students``) and session counters, so it needs neither
+        ``process_frame`` nor ``poll_session`` while the socket is open.
+        Frames that arrive while one is being processed replace each other;
+        only the newest is processed and the rest are counted as dropped.
+        """
+        faculty_email = session.get('faculty_email')
+        session_id = request.args.get('session_id')
+        if not faculty_email or not session_id:
+            ws.send(json.dumps({'type': 'error', 'error': 'Not logged in' if not faculty_email else 'Missing session_id'}))
+            return
+        session_data, error, _ = _get_live_session(session_id, faculty_email)
+        if error:
+            ws.send(json.dumps({'type': 'error', 'error': error}))
+            return
+        
+        channel = LiveFrameChannel(ws)
+        channel.start()
+        logger.info(f"Session {session_id}: WebSocket channel opened")
+        try:
+            while True:
+                data = channel.next_frame()
+                if data is None:
+                    break
+                session_data, error, _ = _get_live_session(session_id)
+                if error:
+                    ws.send(json.dumps({'type': 'error', 'error': error}))
+                    break
+                frame = bytes_to_frame(data)
+                if frame is None:
+                    response = {'error': 'Invalid frame data'}
+                else:
+                    response, _ = _process_live_frame(session_id, session_data, frame)
+                response.update({'type': 'result' if 'error' not in response else 'error',
+                                 'dropped': channel.dropped})
+                ws.send(json.dumps(response))
+        finally:
+            channel.close()
+            logger.info(f"Session {session_id}: WebSocket channel closed ({channel.stats()})")
 
 @bp.route('/poll_session', methods=['GET'])
 def poll_attendance_session():
-    """Poll session status for live attendance"""
+    """Poll session status for live attendance (fallback for ``session_events``)"""
     faculty_email = session.get('faculty_email')
     if not faculty_email:
         return jsonify({'error': 'Not logged in'}), 401
@@ -594,25 +795,157 @@ def poll_attendance_session():
     if not session_id:
         return jsonify({'error': 'Missing session_id'}), 400
     
-    with session_lock:
-        if session_id not in live_attendance_sessions:
-            return jsonify({'error': 'Session not found'}), 404
-        
-        session_data = live_attendance_sessions[session_id]
-        if not session_data['is_active']:
-            return jsonify({'error': 'Session is not active'}), 400
-        
-        # Get current recognized students
-        recognized_students = list(session_data['recognized_students'])
-        model_verified = session_data.get('model_verified', False)
-        
-        return jsonify({
-            'success': True,
-            'recognized_students': recognized_students,
-            'count': len(recognized_students),
-            'is_active': session_data['is_active'],
-            'model_verified': model_verified
-        })
+    session_data, error, status = _get_live_session(session_id)
+    if error:
+        return jsonify({'error': error}), status
+    
+    # Get current recognized students
+    recognized_students = list(session_data['recognized_students'])
+    
+    return jsonify({
+        'success': True,
+        'recognized_students': recognized_students,
+        'count': len(recognized_students),
+        'is_active': session_data['is_active'],
+        'model_verified': session_data['model_verified'],
+        'gating': session_data['gating']
+    })
+
+@bp.route('/session_events', methods=['GET'])
+def live_session_events():
+    """
+    Server-Sent Events stream of a live session's changes
+    
+    The stream opens with a ``snapshot`` of the recognized students (or,
+    when the browser reconnects with ``Last-Event-ID``, replays the events
+    it missed), then sends an ``update`` event with the newly recognized
+    students and counters whenever the session changes, and a final ``end``
+    event when the session is stopped. Comment heartbeats keep proxies from
+    closing a quiet stream; after ``LIVE_EVENTS_MAX_SECONDS`` the server ends
+    the response and the browser reconnects, so a stream never pins a worker
+    thread indefinitely. ``poll_session`` remains as the fallback.
+    """
+    faculty_email = session.get('faculty_email')
+    if not faculty_email:
+        return jsonify({'error': 'Not logged in'}), 401
+    
+    session_id = request.args.get('session_id')
+    if not session_id:
+        return jsonify({'error': 'Missing session_id'}), 400
+    
+    session_data, error, status = _get_live_session(session_id, faculty_email)
+    if error:
+        return jsonify({'error': error}), status
+    store = get_session_store()
+    events = store.events(session_id)
+    if events is None:
+        # Stopped and removed between the lookup and here
+        return jsonify({'error': 'Session not found'}), 404
+    try:
+        resume_id = int(request.headers.get('Last-Event-ID', ''))
+    except ValueError:
+        resume_id = None
+    heartbeat = float(os.environ.get('LIVE_EVENTS_HEARTBEAT_SECONDS', 15))
+    max_seconds = float(os.environ.get('LIVE_EVENTS_MAX_SECONDS', 300))
+    
+    def snapshot():
+        last_id = events.last_id
+        current = store.get(session_id) or session_data
+        payload = {
+            'recognized_students': sorted(current['recognized_students']),
+            'total_recognized': len(current['recognized_students']),
+            'model_verified': current['model_verified']
+        }
+        return last_id, format_sse(last_id, 'snapshot', payload)
+    
+    def generate():
+        yield "retry: 3000\n\n"
+        last_id = resume_id
+        pending = events.since(resume_id) if resume_id is not None else None
+        if pending is None:
+            last_id, message = snapshot()
+            yield message
+            pending = []
+        deadline = time.monotonic() + max_seconds
+        while True:
+            for event_id, event, data in pending:
+                yield format_sse(event_id, event, data)
+                last_id = event_id
+                if event == 'end':
+                    return
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            pending = events.wait(last_id, min(heartbeat, remaining))
+            if pending is None:
+                last_id, message = snapshot()
+                yield message
+                pending = []
+            elif not pending:
+                if events.closed:
+                    return
+                yield ": heartbeat\n\n"
+    
+    return Response(generate(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+def _save_live_attendance(session_data):
+    """
+    Finish saving a live session's attendance
+    
+    Present records are written while the session runs, as students are
+    recognized; this waits for this worker's pending ones, then rewrites
+    every recognized student's Present record and bulk-writes the absentees.
+    The Present upserts are idempotent, so rewriting them covers background
+    writes that failed or were lost with a restarted worker. Absent upserts
+    never replace an existing record, so a Present that lands later from
+    another worker still wins. Used by ``stop_session`` and by the reaper
+    for sessions that expired.
+    
+    Args:
+        session_data: Session from the live session store
+        
+    Returns:
+        int: Number of students saved as present
+        
+    Raises:
+        LookupError: If the faculty or the lecture of the class is unknown
+    """
+    session_id = session_data['session_id']
+    lecture = session_data.get('lecture') or _lecture_for_class(session_data['faculty_email'],
+                                                                session_data['class_id'])
+    recognized = [_split_live_student_id(student_id) for student_id in session_data['recognized_students']]
+    present_roll_nos = {roll_no for roll_no, _ in recognized}
+    
+    attendance_service = AttendanceService()
+    if session_data.get('lecture') and not get_attendance_writer().flush(session_id):
+        logger.warning(f"Session {session_id}: background Present writes failed or timed out")
+    # The background writer only gets records in early; this write is the one that must succeed
+    attendance_service.save_attendance([_live_attendance_record(lecture, roll_no, name, 'Present')
+                                        for roll_no, name in recognized])
+    
+    # Mark absent for students not recognized
+    all_students = attendance_service.get_students_for_class(lecture['branch'], lecture['semester'],
+                                                              lecture['section'])
+    absent = [student for student in all_students if student['roll_no'] not in present_roll_nos]
+    attendance_service.save_attendance([
+        _live_attendance_record(lecture, student['roll_no'], student['name'], 'Absent') for student in absent
+    ], overwrite=False)
+    
+    logger.info(f"Session {session_id}: Saved {len(recognized)} present and {len(absent)} absent records")
+    return len(recognized)
+
+def start_session_reaper():
+    """Start this worker's sweep of live sessions that were never stopped"""
+    get_session_reaper(_save_live_attendance).start()
+
+@bp.route('/session_stats', methods=['GET'])
+def live_session_stats():
+    """Counters of active, expired and committed live sessions, and live timings of this worker"""
+    stats = get_session_reaper(_save_live_attendance).stats()
+    stats.update({name: timing.stats() for name, timing in live_timings.items()})
+    stats['attendance_writer'] = get_attendance_writer().stats()
+    return jsonify(stats)
 
 @bp.route('/stop_session', methods=['POST'])
 def stop_attendance_session():
@@ -627,100 +960,40 @@ def stop_attendance_session():
     
     logger.info(f"Stopping attendance session {session_id} for faculty {faculty_email}")
     
-    with session_lock:
-        if session_id not in live_attendance_sessions:
-            logger.error(f"Session {session_id} not found")
-            return jsonify({'error': 'Session not found'}), 404
-        
-        session_data = live_attendance_sessions[session_id]
-        session_data['is_active'] = False
-        recognized_students = list(session_data['recognized_students'])
-        
-        logger.info(f"Session {session_id}: Stopping with {len(recognized_students)} recognized students")
-        
-        # Get lecture info for database insertion
-        class_id = session_data['class_id']
-        faculty_map = pd.read_csv('faculty_users.csv')
-        faculty_map['faculty_email'] = faculty_map['faculty_email'].str.strip().str.lower()
-        faculty_map['faculty_name'] = faculty_map['faculty_name'].str.strip().str.lower()
-        faculty_row = faculty_map[faculty_map['faculty_email'] == faculty_email.strip().lower()]
-        
-        if faculty_row.empty:
-            logger.error(f"Faculty {faculty_email} not found in faculty_users.csv")
-            return jsonify({'error': 'Faculty not found'}), 404
-        
-        faculty_name = faculty_row.iloc[0]['faculty_name']
-        df = pd.read_csv('timetable.csv')
-        branch, semester = class_id.split('_')
-        lecture_row = df[(df['branch'] == branch) & (df['semester'].astype(str) == semester) & (df['faculty_name'].str.strip().str.lower() == faculty_name)]
-        
-        if lecture_row.empty:
-            logger.error(f"Lecture info not found for class {class_id}")
-            return jsonify({'error': 'Lecture info not found'}), 404
-        
-        lecture = lecture_row.iloc[0]
-        subject = lecture['subject']
-        section = lecture['section']
-        classroom = lecture['classroom']
-        date_str = datetime.now().strftime('%Y-%m-%d')
-        
-        # Save attendance to database
-        collections = get_collections()
-        saved_count = 0
-        present_roll_nos = set()
-        for student_id in recognized_students:
-            # Parse student_id (format: "roll_no_name" or just "name")
-            if '_' in student_id:
-                roll_no, name = student_id.split('_', 1)
-            else:
-                roll_no = ''
-                name = student_id
-            present_roll_nos.add(roll_no)
-            collections['attendance'].insert_one({
-                'date': date_str,
-                'subject': subject,
-                'faculty_email': faculty_email,
-                'classroom': classroom,
-                'branch': branch,
-                'semester': int(semester),
-                'section': section,
-                'student': {
-                    'roll_no': roll_no,
-                    'name': name,
-                    'status': 'Present'
-                }
-            })
-            saved_count += 1
-        
-        # Mark absent for students not recognized
-        attendance_service = AttendanceService()
-        all_students = attendance_service.get_students_for_class(branch, semester, section)
-        for student in all_students:
-            if student['roll_no'] not in present_roll_nos:
-                collections['attendance'].insert_one({
-                    'date': date_str,
-                    'subject': subject,
-                    'faculty_email': faculty_email,
-                    'classroom': classroom,
-                    'branch': branch,
-                    'semester': int(semester),
-                    'section': section,
-                    'student': {
-                        'roll_no': student['roll_no'],
-                        'name': student['name'],
-                        'status': 'Absent'
-                    }
-                })
-        
-        logger.info(f"Session {session_id}: Saved {saved_count} attendance records to database")
-        
-        # Clean up session
-        del live_attendance_sessions[session_id]
-        logger.info(f"Session {session_id} cleaned up. Active sessions: {len(live_attendance_sessions)}")
-        
-        return jsonify({
-            'success': True,
-            'message': 'Attendance session stopped and saved',
-            'recognized_students': recognized_students,
-            'count': len(recognized_students)
-        }) 
\ No newline at end of file
+    started = time.perf_counter()
+    store = get_session_store()
+    session_data = store.deactivate(session_id)
+    if session_data is None:
+        logger.error(f"Session {session_id} not found or already stopped")
+        return jsonify({'error': 'Session not found'}), 404
+    recognized_students = list(session_data['recognized_students'])
+    
+    logger.info(f"Session {session_id}: Stopping with {len(recognized_students)} recognized students")
+    
+    try:
+        _save_live_attendance(session_data)
+        error = None
+    except LookupError as e:
+        error = str(e)
+    gating = session_data['gating']
+    logger.info(f"Session {session_id}: skipped {gating['skipped']} of {gating['frames']} unchanged frames")
+    
+    # Tell event streams the session is over, then clean up
+    events = store.events(session_id)
+    if events is not None:
+        events.close({'saved': error is None, 'count': len(recognized_students)})
+    store.delete(session_id)
+    stop_seconds = time.perf_counter() - started
+    live_timings['stop_session'].add(stop_seconds)
+    logger.info(f"Session {session_id} cleaned up in {stop_seconds * 1000:.0f} ms. "
+                f"Active sessions: {store.count()}")
+    if error:
+        return jsonify({'error': error}), 404
+    
+    return jsonify({
+        'success': True,
+        'message': 'Attendance session stopped and saved',
+        'recognized_students': recognized_students,
+        'count': len(recognized_students),
+        'gating': gating
+    }) 
\ No newline at end of file
@@ -1,9 +1,10 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, session, current_app
 import bcrypt
 import pandas as pd
-from datetime import datetime, timedelta
+from datetime import datetime
 from collections import defaultdict
 from ..db.mongo_client import get_collections
+from ..services.attendance import AttendanceService
 from dotenv import load_dotenv
 import os
 
@@ -207,41 +208,18 @@ def dashboard():
 
     today_str = datetime.now().strftime('%Y-%m-%d')
     collections = get_collections()
+    # Trend, matrix, per-class and today's counts in a single aggregation
+    stats = AttendanceService().get_dashboard_stats(faculty_email, today_str)
     class_attendance = defaultdict(int)
     for _, row in faculty_df.iterrows():
-        query = {
-            "date": today_str,
-            "subject": row['subject'],
-            "branch": row['branch'],
-            "semester": row['semester'],
-            "section": row['section'],
-            "faculty_email": faculty_email,
-            "student.status": "Present"
-        }
-        count = collections['attendance'].count_documents(query)
+        count = stats['classes'].get((row['subject'], row['branch'], int(row['semester']), row['section']), 0)
         class_attendance[f"{row['branch']}-{row['semester']}-{row['section']}"] += count
 
-    today = datetime.now()
-    thirty_days_ago = today - timedelta(days=30)
-    monthly_trend = defaultdict(int)
-    for doc in collections['attendance'].find({"faculty_email": faculty_email}):
-        try:
-            doc_date = datetime.strptime(doc.get("date", ""), "%Y-%m-%d")
-            if thirty_days_ago <= doc_date <= today:
-                if doc.get("student", {}).get("status") == "Present":
-                    monthly_trend[doc_date.strftime("%Y-%m-%d")] += 1
-        except:
-            continue
+    monthly_trend = stats['trend']
     monthly_labels = sorted(monthly_trend.keys())
     monthly_data = [monthly_trend[date] for date in monthly_labels]
 
-    matrix = defaultdict(lambda: defaultdict(int))
-    for doc in collections['attendance'].find({"faculty_email": faculty_email}):
-        subject = doc.get("subject", "?")
-        classroom = doc.get("classroom", "?")
-        if doc.get("student", {}).get("status") == "Present":
-            matrix[subject][classroom] += 1
-
+    matrix = stats['matrix']
     bar_labels = sorted(matrix.keys())
     classroom_list = sorted(set(cls for subj in matrix.values() for cls in subj))
     bar_data = {cls: [matrix[subj].get(cls, 0) for subj in bar_labels] for cls in classroom_list}
@@ -278,14 +256,7 @@ def dashboard():
             else:
                 upcoming_lectures.append(lec)
 
-    attendance_stats = {'Present': 0, 'Absent': 0}
-    for status in attendance_stats.keys():
-        count = collections['attendance'].count_documents({
-            "date": today_str,
-            "faculty_email": faculty_email,
-            "student.status": status
-        })
-        attendance_stats[status] = count
+    attendance_stats = stats['today']
 
     students_list = []
     for branch, semester, section in faculty_df[['branch', 'semester', 'section']].drop_duplicates().to_records(index=False):
@@ -1,13 +1,17 @@
 from flask import Blueprint, render_template, request, flash, redirect, url_for, jsonify, current_app, session
 from werkzeug.utils import secure_filename
 import os
-import pickle
 import numpy as np
 import base64
 import io
 from PIL import Image
-from ..services.face_recognition import FaceRecognitionService
+from ..services.face_recognition import get_face_service
+from ..services.gallery_cache import get_gallery_cache
+from ..services.embedding_store import EmbeddingStore
+from ..services.face_index import get_face_index
 from ..db.mongo_client import get_collections
+from ..services.attendance import AttendanceService
+from ..utils.camera_utils import bytes_to_frame
 import pandas as pd
 import bcrypt
 
@@ -55,7 +59,6 @@ def student_dashboard():
     if not roll_no:
         return redirect('/multilogin')
 
-    cols = get_collections()
     student = _get_student_doc(roll_no)
     if not student:
         flash('Student not found.', 'error')
@@ -78,27 +81,18 @@ def student_dashboard():
         class_df = df[(df['branch'] == branch) & (df['semester'].astype(str) == semester) & (df['section'] == section) & (df['day'] == today)]
         today_classes = class_df.to_dict(orient='records')
 
-    # Subject-wise attendance stats for this student
-    # Build list of subjects from timetable or attendance
-    subjects = set([c.get('subject') for c in today_classes])
-    for doc in cols['attendance'].find({"student.roll_no": roll_no}):
-        if doc.get('subject'):
-            subjects.add(doc['subject'])
+    # Subject totals, weekly breakdown and recent records in a single aggregation
+    stats = AttendanceService().get_student_stats(roll_no, subject_records=0)
 
+    # Subjects from today's timetable and from attendance
+    subjects = set([c.get('subject') for c in today_classes]) | set(stats['subjects'])
     for subj in subjects:
-        total = cols['attendance'].count_documents({"student.roll_no": roll_no, "subject": subj})
-        present = cols['attendance'].count_documents({"student.roll_no": roll_no, "subject": subj, "student.status": "Present"})
-        percentage = int(round((present / total) * 100)) if total > 0 else 0
-        attendance_stats[subj] = {"total": total, "present": present, "percentage": percentage}
+        counts = stats['subjects'].get(subj, {"total": 0, "present": 0, "percentage": 0})
+        attendance_stats[subj] = {"total": counts['total'], "present": counts['present'],
+                                  "percentage": counts['percentage']}
 
     # Recent attendance (latest 10)
-    recent_cursor = cols['attendance'].find({"student.roll_no": roll_no}).sort("_id", -1).limit(10)
-    for r in recent_cursor:
-        recent_attendance.append({
-            'subject': r.get('subject', ''),
-            'date': r.get('date', ''),
-            'status': r.get('student', {}).get('status', '')
-        })
+    recent_attendance = stats['recent']
 
     # Get all unique subjects from timetable for this student
     timetable_subjects = set()
@@ -107,33 +101,8 @@ def student_dashboard():
         timetable_subjects = student_timetable['subject'].drop_duplicates().tolist()
 
     # Weekly attendance by subject (past 7 days)
-    from datetime import datetime, timedelta
-
-    weekly_attendance = {}
-    week_ago = datetime.now() - timedelta(days=7)
-
-    for subject in timetable_subjects:
-        # Get attendance records for this subject in the past week
-        weekly_docs = cols['attendance'].find({
-            "student.roll_no": roll_no,
-            "subject": subject,
-            "date": {"$gte": week_ago.strftime("%Y-%m-%d")}
-        })
-
-        total_weekly = 0
-        present_weekly = 0
-
-        for doc in weekly_docs:
-            total_weekly += 1
-            if doc.get('student', {}).get('status') == 'Present':
-                present_weekly += 1
-
-        if total_weekly > 0:
-            weekly_attendance[subject] = {
-                "present": present_weekly,
-                "absent": total_weekly - present_weekly,
-                "total": total_weekly
-            }
+    weekly_attendance = {subject: stats['weekly'][subject] for subject in timetable_subjects
+                         if subject in stats['weekly']}
 
     overall_total = sum(v['total'] for v in attendance_stats.values())
     overall_present = sum(v['present'] for v in attendance_stats.values())
@@ -208,30 +177,18 @@ def student_attendance():
 
     student_name = student.get('name', 'Student')
 
-    cols = get_collections()
     detailed = []
 
-    # Build subject list from attendance docs
-    subjects = cols['attendance'].distinct('subject', {"student.roll_no": roll_no})
-    for subj in subjects:
-        if not subj:
-            continue
-        total = cols['attendance'].count_documents({"student.roll_no": roll_no, "subject": subj})
-        present = cols['attendance'].count_documents({"student.roll_no": roll_no, "subject": subj, "student.status": "Present"})
-        percentage = int(round((present / total) * 100)) if total > 0 else 0
-        # recent records for subject
-        records = []
-        for r in cols['attendance'].find({"student.roll_no": roll_no, "subject": subj}).sort("_id", -1).limit(20):
-            records.append({
-                'date': r.get('date', ''),
-                'status': r.get('student', {}).get('status', '')
-            })
+    # Per-subject counts and latest 20 records in a single aggregation
+    stats = AttendanceService().get_student_stats(roll_no, facets=['subjects'])
+    for subj, counts in stats['subjects'].items():
+        records = [{'date': r['date'], 'status': r['status']} for r in counts['records']]
         detailed.append({
             'subject': subj,
-            'faculty': r.get('faculty_email', '' ) if records else '',
-            'present_classes': present,
-            'total_classes': total,
-            'percentage': percentage,
+            'faculty': counts['records'][0]['faculty_email'] if records else '',
+            'present_classes': counts['present'],
+            'total_classes': counts['total'],
+            'percentage': counts['percentage'],
             'attendance_records': records
         })
 
@@ -416,18 +373,18 @@ def register_student_face():
         if not error and (not all(photos) or not all(photo and photo.filename for photo in photos)):
             error = "Please upload 3 face photos."
         if not error:
-            face_service = FaceRecognitionService()
+            face_service = get_face_service()
             encodings = []
             for idx, photo in enumerate(photos):
                 filename = secure_filename(f"{roll_no}_{name}_face{idx+1}.jpg")
                 save_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
                 photo.save(save_path)
-                import cv2
-                img = cv2.imread(save_path)
-                if img is None:
+                # Phone photos are decoded at reduced scale, near the detector's working size
+                with open(save_path, 'rb') as f:
+                    rgb = bytes_to_frame(f.read())
+                if rgb is None:
                     error = f"Failed to read uploaded image {filename}."
                     break
-                rgb = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
                 faces = face_service.get_faces(rgb)
                 if not faces:
                     error = f"No face found in {filename}."
@@ -439,71 +396,31 @@ def register_student_face():
                 
                 # Check if this face is already registered in any class
                 split_dir = current_app.config['SPLIT_DIR']
-                os.makedirs(split_dir, exist_ok=True)
-                
-                # Get all pickle files in split_encodings directory
-                all_pickle_files = [f for f in os.listdir(split_dir) if f.endswith('.pickle')]
+                store = EmbeddingStore(split_dir)
+                face_index = get_face_index(split_dir)
                 existing_registration = None
                 
-                for pickle_file in all_pickle_files:
-                    pickle_path = os.path.join(split_dir, pickle_file)
-                    try:
-                        with open(pickle_path, 'rb') as f:
-                            data = pickle.load(f)
-                            existing_encodings = data.get('encodings', [])
-                            existing_metadata = data.get('metadata', [])
-                            
-                            if existing_encodings:
-                                # Compare with existing encodings
-                                for i, existing_encoding in enumerate(existing_encodings):
-                                    distance = np.linalg.norm(avg_encoding - existing_encoding)
-                                    if distance < 0.85:  # Same tolerance as face recognition
-                                        existing_student = existing_metadata[i]
-                                        existing_class = pickle_file.replace('.pickle', '')
-                                        existing_registration = {
-                                            'student_name': existing_student.get('name', 'Unknown'),
-                                            'student_roll': existing_student.get('roll_no', 'Unknown'),
-                                            'class': existing_class,
-                                            'distance': distance
-                                        }
-                                        break
-                                        
-                    except (ModuleNotFoundError, ImportError, ValueError) as e:
-                        # Skip incompatible files
-                        continue
-                    except Exception as e:
-                        # Skip other errors
-                        continue
-                    
-                    if existing_registration:
-                        break
+                nearest = face_index.nearest(avg_encoding, tolerance=0.85)  # Same tolerance as face recognition
+                if nearest:
+                    existing_student = nearest['metadata']
+                    existing_registration = {
+                        'student_name': existing_student.get('name', 'Unknown'),
+                        'student_roll': existing_student.get('roll_no', 'Unknown'),
+                        'class': nearest['class_id'],
+                        'distance': nearest['distance']
+                    }
                 
                 # If face is already registered in another class
                 if existing_registration:
                     error = f"Face already registered! This face belongs to {existing_registration['student_name']} ({existing_registration['student_roll']}) in class {existing_registration['class']}. Distance: {existing_registration['distance']:.3f}"
                 else:
-                    # Proceed with registration in the selected class
-                    pickle_path = os.path.join(split_dir, f"{branch}_{semester}.pickle")
-                    if os.path.exists(pickle_path):
-                        try:
-                            with open(pickle_path, 'rb') as f:
-                                data = pickle.load(f)
-                        except (ModuleNotFoundError, ImportError, ValueError) as e:
-                            # Handle numpy version incompatibility
-                            print(f"Warning: Could not load existing pickle file due to version incompatibility: {e}")
-                            print("Creating new pickle file...")
-                            data = {"encodings": [], "metadata": []}
-                    else:
-                        data = {"encodings": [], "metadata": []}
-                    
+                    # Proceed with registration in the selected class; the upsert
+                    # replaces any earlier registration with the same roll number
+                    class_id = f"{branch}_{semester}"
                     new_metadata = {"roll_no": roll_no, "name": name, "semester": int(semester), "branch": branch, "section": section}
-                    filtered = [(e, m) for e, m in zip(data["encodings"], data["metadata"]) if m.get("roll_no") != roll_no]
-                    data["encodings"] = [e for e, m in filtered]
-                    data["metadata"] = [m for e, m in filtered]
-                    data["encodings"].append(avg_encoding)
-                    data["metadata"].append(new_metadata)
-                    with open(pickle_path, 'wb') as f:
-                        pickle.dump(data, f)
+                    store.upsert(class_id, avg_encoding, new_metadata)
+                    face_index.insert(class_id, avg_encoding, new_metadata)
+                    get_gallery_cache(split_dir).invalidate(class_id)
                     message = f"Student {name} ({roll_no}) registered successfully!"
         # Refresh students list for the selected branch/semester
         if selected_branch and selected_semester:
@@ -540,39 +457,16 @@ def check_existing_registration():
     if not student:
         return jsonify({'error': 'Student not found'}), 404
     
-    # Check all pickle files for this student's face
-    split_dir = current_app.config['SPLIT_DIR']
+    # Check every class gallery for this student's face
     existing_registrations = []
-    
-    if os.path.exists(split_dir):
-        all_pickle_files = [f for f in os.listdir(split_dir) if f.endswith('.pickle')]
-        
-        for pickle_file in all_pickle_files:
-            pickle_path = os.path.join(split_dir, pickle_file)
-            try:
-                with open(pickle_path, 'rb') as f:
-                    data = pickle.load(f)
-                    existing_metadata = data.get('metadata', [])
-                    
-                    # Check if this student is in this class
-                    for metadata in existing_metadata:
-                        if metadata.get('roll_no') == student_id:
-                            class_name = pickle_file.replace('.pickle', '')
-                            branch, semester = class_name.split('_')
-                            existing_registrations.append({
-                                'class': class_name,
-                                'branch': branch,
-                                'semester': semester,
-                                'section': metadata.get('section', 'A')
-                            })
-                            break
-                            
-            except (ModuleNotFoundError, ImportError, ValueError) as e:
-                # Skip incompatible files
-                continue
-            except Exception as e:
-                # Skip other errors
-                continue
+    for class_name, metadata in get_face_index(current_app.config['SPLIT_DIR']).find_key(student_id):
+        branch, semester = class_name.split('_')
+        existing_registrations.append({
+            'class': class_name,
+            'branch': branch,
+            'semester': semester,
+            'section': metadata.get('section', 'A')
+        })
     
     return jsonify({
         'student_name': student.get('name', 'Unknown'),
@@ -600,40 +494,18 @@ def face_registrations_summary():
     faculty_name = faculty_row.iloc[0]['faculty_name']
     
     # Get all face registrations
-    split_dir = current_app.config['SPLIT_DIR']
     all_registrations = []
-    
-    if os.path.exists(split_dir):
-        all_pickle_files = [f for f in os.listdir(split_dir) if f.endswith('.pickle')]
-        
-        for pickle_file in all_pickle_files:
-            pickle_path = os.path.join(split_dir, pickle_file)
-            try:
-                with open(pickle_path, 'rb') as f:
-                    data = pickle.load(f)
-                    encodings = data.get('encodings', [])
-                    metadata = data.get('metadata', [])
-                    
-                    class_name = pickle_file.replace('.pickle', '')
-                    branch, semester = class_name.split('_')
-                    
-                    for i, student_meta in enumerate(metadata):
-                        all_registrations.append({
-                            'student_name': student_meta.get('name', 'Unknown'),
-                            'student_roll': student_meta.get('roll_no', 'Unknown'),
-                            'class': class_name,
-                            'branch': branch,
-                            'semester': semester,
-                            'section': student_meta.get('section', 'A'),
-                            'encoding_index': i
-                        })
-                        
-            except (ModuleNotFoundError, ImportError, ValueError) as e:
-                # Skip incompatible files
-                continue
-            except Exception as e:
-                # Skip other errors
-                continue
+    for class_name, i, student_meta in get_face_index(current_app.config['SPLIT_DIR']).entries():
+        branch, semester = class_name.split('_')
+        all_registrations.append({
+            'student_name': student_meta.get('name', 'Unknown'),
+            'student_roll': student_meta.get('roll_no', 'Unknown'),
+            'class': class_name,
+            'branch': branch,
+            'semester': semester,
+            'section': student_meta.get('section', 'A'),
+            'encoding_index': i
+        })
     # Sort by class and then by student name
     all_registrations.sort(key=lambda x: (x['class'], x['student_name']))
     
@@ -676,40 +548,21 @@ def delete_student_face():
 
         print(f"Split dir: {split_dir}, Upload folder: {upload_folder}")
 
-        # Remove student's face data from ALL class pickle files
+        # Remove student's face data from ALL class galleries
+        store = EmbeddingStore(split_dir)
+        face_index = get_face_index(split_dir)
         classes_affected = []
         total_removed = 0
-        if os.path.exists(split_dir):
-            all_pickle_files = [f for f in os.listdir(split_dir) if f.endswith('.pickle')]
-            for pickle_file in all_pickle_files:
-                pickle_path = os.path.join(split_dir, pickle_file)
-                try:
-                    with open(pickle_path, 'rb') as f:
-                        pkl = pickle.load(f)
-                    encodings = pkl.get('encodings', [])
-                    metadata = pkl.get('metadata', [])
-                    original_count = len(metadata)
-
-                    filtered_encodings = []
-                    filtered_metadata = []
-                    removed_here = 0
-
-                    for i, meta in enumerate(metadata):
-                        if meta.get('roll_no') != student_roll:
-                            filtered_encodings.append(encodings[i])
-                            filtered_metadata.append(meta)
-                        else:
-                            removed_here += 1
-
-                    if removed_here > 0:
-                        pkl['encodings'] = filtered_encodings
-                        pkl['metadata'] = filtered_metadata
-                        with open(pickle_path, 'wb') as f:
-                            pickle.dump(pkl, f)
-                        classes_affected.append(pickle_file.replace('.pickle', ''))
-                        total_removed += removed_here
-                except Exception as e:
-                    print(f"Warning: Skipping pickle {pickle_path} due to error: {e}")
+        for class_name, _ in face_index.find_key(student_roll):
+            try:
+                if class_name not in classes_affected:
+                    store.tombstone(class_name, student_roll)
+                    face_index.remove(class_name, student_roll)
+                    get_gallery_cache(split_dir).invalidate(class_name)
+                    classes_affected.append(class_name)
+                total_removed += 1
+            except Exception as e:
+                print(f"Warning: Skipping gallery {class_name} due to error: {e}")
 
         # Remove uploaded face images for this roll number
         removed_files = []
@@ -810,26 +663,22 @@ def edit_student_face():
                 'message': f'Student with roll number {new_roll_no} already exists'
             }), 400
 
-        # Find and update the pickle file for the old class
-        old_pickle_path = os.path.join(split_dir, f"{old_class_name}.pickle")
-        print(f"Looking for old pickle file: {old_pickle_path}")
-        print(f"Old file exists: {os.path.exists(old_pickle_path)}")
+        # Find and update the gallery for the old class
+        store = EmbeddingStore(split_dir)
+        print(f"Looking for old class gallery: {old_class_name}")
+        print(f"Old gallery exists: {store.exists(old_class_name)}")
 
-        if os.path.exists(old_pickle_path):
+        if store.exists(old_class_name):
             try:
-                with open(old_pickle_path, 'rb') as f:
-                    data = pickle.load(f)
-
                 # Find and update the student's data
-                encodings = data.get('encodings', [])
-                metadata = data.get('metadata', [])
+                encodings, metadata = store.load(old_class_name)
 
                 # Find the student to update
                 student_found = False
-                for i, meta in enumerate(metadata):
+                for i, meta in enumerate(metadata or []):
                     if meta.get('roll_no') == old_roll_no:
-                        # Update metadata
-                        metadata[i] = {
+                        student_encoding = np.array(encodings[i])
+                        student_metadata = {
                             'roll_no': new_roll_no,
                             'name': new_name,
                             'semester': int(new_semester),
@@ -846,12 +695,16 @@ def edit_student_face():
                         'message': f'Student {old_roll_no} not found in class {old_class_name}'
                     }), 404
 
-                # Update the pickle file
-                data['metadata'] = metadata
-                with open(old_pickle_path, 'wb') as f:
-                    pickle.dump(data, f)
+                # Update the class gallery
+                face_index = get_face_index(split_dir)
+                if new_roll_no != old_roll_no:
+                    store.tombstone(old_class_name, old_roll_no)
+                    face_index.remove(old_class_name, old_roll_no)
+                store.upsert(old_class_name, student_encoding, student_metadata)
+                face_index.insert(old_class_name, student_encoding, student_metadata)
+                get_gallery_cache(split_dir).invalidate(old_class_name)
 
-                print(f"Updated old pickle file: {old_pickle_path}")
+                print(f"Updated old class gallery: {old_class_name}")
 
                 # Update student record in MongoDB
                 update_result = collections['students'].update_one(
@@ -874,32 +727,12 @@ def edit_student_face():
                     new_class_name = f"{new_branch}_{new_semester}"
                     if new_class_name != old_class_name:
                         print(f"Class changed from {old_class_name} to {new_class_name}")
-                        # Move data to new class file
-                        new_pickle_path = os.path.join(split_dir, f"{new_class_name}.pickle")
-
-                        if os.path.exists(new_pickle_path):
-                            try:
-                                with open(new_pickle_path, 'rb') as f:
-                                    new_data = pickle.load(f)
-                                new_encodings = new_data.get('encodings', [])
-                                new_metadata = new_data.get('metadata', [])
-                            except:
-                                new_encodings = []
-                                new_metadata = []
-                        else:
-                            new_encodings = []
-                            new_metadata = []
-
-                        # Add student to new class
-                        new_encodings.append(encodings[i])  # Use the encoding from old file
-                        new_metadata.append(metadata[i])
-
-                        # Update new class file
-                        new_data = {'encodings': new_encodings, 'metadata': new_metadata}
-                        with open(new_pickle_path, 'wb') as f:
-                            pickle.dump(new_data, f)
-
-                        print(f"Added student to new class file: {new_pickle_path}")
+                        # Add student to new class gallery, using the encoding from the old one
+                        store.upsert(new_class_name, student_encoding, student_metadata)
+                        face_index.insert(new_class_name, student_encoding, student_metadata)
+                        get_gallery_cache(split_dir).invalidate(new_class_name)
+
+                        print(f"Added student to new class gallery: {new_class_name}")
 
                         # Remove from old class file (we already updated it above)
                         # The old file already has the student removed since we updated metadata
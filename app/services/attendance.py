@@ -1,6 +1,9 @@
+import os
 from datetime import datetime, timedelta
-from collections import defaultdict
 from ..db.mongo_client import get_collections
+from .attendance_stats import (faculty_dashboard_pipeline, faculty_dashboard_stats, student_stats,
+                               student_stats_pipeline)
+from .attendance_writer import attendance_upsert, bulk_upsert
 
 class AttendanceService:
     """Service for attendance-related business logic"""
@@ -9,6 +12,27 @@ class AttendanceService:
         """Initialize the attendance service"""
         self.collections = get_collections()
     
+    def save_attendance(self, records, overwrite=True):
+        """
+        Save attendance records in unordered bulk upserts
+        
+        Saving the same student's attendance for the same lecture again
+        updates the existing record, so resubmitted forms create no duplicates.
+        
+        Args:
+            records: Attendance documents (date, subject, faculty_email,
+                classroom, branch, semester, section and student)
+            overwrite: Update existing records; if False only missing records
+                are inserted
+            
+        Returns:
+            dict: Number of records ``inserted`` and ``updated``
+        """
+        operations = [attendance_upsert(record, overwrite) for record in records]
+        if not operations:
+            return {'inserted': 0, 'updated': 0}
+        return bulk_upsert(self.collections['attendance'], operations)
+    
     def mark_attendance(self, faculty_email, subject, classroom, branch, semester, section, 
                        student_roll_no, student_name, status, date_str=None):
         """
@@ -48,7 +72,7 @@ class AttendanceService:
                 }
             }
             
-            self.collections['attendance'].insert_one(attendance_record)
+            self.save_attendance([attendance_record])
             return True
         except Exception as e:
             print(f"Error marking attendance: {e}")
@@ -110,6 +134,31 @@ class AttendanceService:
         
         return self.collections['attendance'].count_documents(query)
     
+    def get_dashboard_stats(self, faculty_email, date_str=None, days=30, matrix_days=None, facets=None):
+        """
+        Get the faculty dashboard statistics in one aggregation
+        
+        Args:
+            faculty_email: Email of the faculty member
+            date_str: Date string (defaults to today)
+            days: Number of days in the daily trend, today included
+            matrix_days: Days of history in the subject x classroom matrix,
+                today included (uses env var if None)
+            facets: Statistics to compute (all if None), see
+                ``faculty_dashboard_pipeline``
+            
+        Returns:
+            dict: ``trend``, ``matrix``, ``classes`` and ``today`` statistics
+        """
+        if date_str is None:
+            date_str = datetime.now().strftime('%Y-%m-%d')
+        if matrix_days is None:
+            matrix_days = int(os.environ.get('DASHBOARD_MATRIX_DAYS', days))
+        
+        pipeline = faculty_dashboard_pipeline(faculty_email, date_str, days, matrix_days, facets)
+        result = next(self.collections['attendance'].aggregate(pipeline), None)
+        return faculty_dashboard_stats(result)
+    
     def get_monthly_trend(self, faculty_email, days=30):
         """
         Get monthly attendance trend for a faculty member
@@ -121,41 +170,43 @@ class AttendanceService:
         Returns:
             dict: Daily attendance counts
         """
-        today = datetime.now()
-        start_date = today - timedelta(days=days)
-        
-        monthly_trend = defaultdict(int)
-        
-        for doc in self.collections['attendance'].find({"faculty_email": faculty_email}):
-            try:
-                doc_date = datetime.strptime(doc.get("date", ""), "%Y-%m-%d")
-                if start_date <= doc_date <= today:
-                    if doc.get("student", {}).get("status") == "Present":
-                        monthly_trend[doc_date.strftime("%Y-%m-%d")] += 1
-            except:
-                continue
-        
-        return monthly_trend
+        return self.get_dashboard_stats(faculty_email, days=days, facets=['trend'])['trend']
     
-    def get_subject_classroom_matrix(self, faculty_email):
+    def get_subject_classroom_matrix(self, faculty_email, days=None):
         """
         Get attendance matrix by subject and classroom
         
         Args:
             faculty_email: Email of the faculty member
+            days: Number of days to look back (uses env var if None)
             
         Returns:
             dict: Matrix of attendance counts by subject and classroom
         """
-        matrix = defaultdict(lambda: defaultdict(int))
+        return self.get_dashboard_stats(faculty_email, matrix_days=days, facets=['matrix'])['matrix']
+    
+    def get_student_stats(self, roll_no, date_str=None, week_days=7, recent=10, subject_records=20, facets=None):
+        """
+        Get a student's attendance statistics in one aggregation
         
-        for doc in self.collections['attendance'].find({"faculty_email": faculty_email}):
-            subject = doc.get("subject", "?")
-            classroom = doc.get("classroom", "?")
-            if doc.get("student", {}).get("status") == "Present":
-                matrix[subject][classroom] += 1
+        Args:
+            roll_no: Student roll number
+            date_str: Date string (defaults to today)
+            week_days: Days before ``date_str`` in the weekly breakdown
+            recent: Latest records of any subject to return
+            subject_records: Latest records per subject to return (0 = none)
+            facets: Statistics to compute (all if None), see
+                ``student_stats_pipeline``
+            
+        Returns:
+            dict: ``subjects``, ``weekly`` and ``recent`` statistics
+        """
+        today = datetime.strptime(date_str, '%Y-%m-%d') if date_str else datetime.now()
+        week_start = (today - timedelta(days=week_days)).strftime('%Y-%m-%d')
         
-        return matrix
+        pipeline = student_stats_pipeline(roll_no, week_start, recent, subject_records, facets)
+        result = next(self.collections['attendance'].aggregate(pipeline), None)
+        return student_stats(result)
     
     def get_students_for_class(self, branch, semester, section):
         """
@@ -203,28 +254,32 @@ class AttendanceService:
             date_str: Date string (defaults to today)
             
         Returns:
-            int: Number of attendance records created
+            int: Number of attendance records created or updated
         """
         if date_str is None:
             date_str = datetime.now().strftime('%Y-%m-%d')
         
         # Get all students for this class
         students = self.get_students_for_class(branch, semester, section)
-        roll_name_map = {s['roll_no']: s['name'] for s in students}
-        
-        created_count = 0
         
-        for student in students:
-            roll_no = student['roll_no']
-            name = student['name']
-            status = 'Present' if roll_no in present_roll_numbers else 'Absent'
-            
-            success = self.mark_attendance(
-                faculty_email, subject, classroom, branch, semester, section,
-                roll_no, name, status, date_str
-            )
-            
-            if success:
-                created_count += 1
+        records = [{
+            'date': date_str,
+            'subject': subject,
+            'faculty_email': faculty_email,
+            'classroom': classroom,
+            'branch': branch,
+            'semester': int(semester),
+            'section': section,
+            'student': {
+                'roll_no': student['roll_no'],
+                'name': student['name'],
+                'status': 'Present' if student['roll_no'] in present_roll_numbers else 'Absent'
+            }
+        } for student in students]
         
-        return created_count 
\ No newline at end of file
+        try:
+            result = self.save_attendance(records)
+        except Exception as e:
+            print(f"Error marking attendance: {e}")
+            return 0
+        return result['inserted'] + result['updated'] 
\ No newline at end of file
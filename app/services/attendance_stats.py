@@ -0,0 +1,184 @@
+from datetime import datetime, timedelta
+from collections import defaultdict
+
+
+def _window_start(today, days):
+    """First date string of a window of ``days`` days ending with ``today``"""
+    return (datetime.strptime(today, '%Y-%m-%d') - timedelta(days=days - 1)).strftime('%Y-%m-%d')
+
+
+def faculty_dashboard_pipeline(faculty_email, today, days=30, matrix_days=None, facets=None):
+    """
+    Build the aggregation behind the faculty dashboard
+
+    One ``$match`` on the faculty (served by the ``attendance_faculty_date_status``
+    index) feeds a ``$facet`` computing every chart in the same round trip.
+    Every facet covers a bounded window of days, so the cost does not grow
+    with the faculty's history. Dates are stored as ``YYYY-MM-DD`` strings,
+    so date ranges compare as strings.
+
+    Args:
+        faculty_email: Email of the faculty member
+        today: Today's date string (``YYYY-MM-DD``)
+        days: Days of the daily Present trend, today included
+        matrix_days: Days of history in the subject x classroom matrix
+            (the trend window if None)
+        facets: Names of the facets to compute (all if None): ``trend``,
+            ``matrix``, ``classes`` and ``today``
+
+    Returns:
+        list: Aggregation pipeline for the ``attendance`` collection
+    """
+    trend_start = _window_start(today, max(1, days))
+    matrix_start = _window_start(today, max(1, matrix_days or days))
+    all_facets = {
+        'trend': [
+            {'$match': {'date': {'$gte': trend_start, '$lte': today}, 'student.status': 'Present'}},
+            {'$group': {'_id': '$date', 'count': {'$sum': 1}}},
+            {'$sort': {'_id': 1}}
+        ],
+        'matrix': [
+            {'$match': {'date': {'$gte': matrix_start, '$lte': today}, 'student.status': 'Present'}},
+            {'$group': {'_id': {'subject': {'$ifNull': ['$subject', '?']},
+                                'classroom': {'$ifNull': ['$classroom', '?']}},
+                        'count': {'$sum': 1}}}
+        ],
+        'classes': [
+            {'$match': {'date': today, 'student.status': 'Present'}},
+            {'$group': {'_id': {'subject': '$subject', 'branch': '$branch', 'semester': '$semester',
+                                'section': '$section'},
+                        'count': {'$sum': 1}}}
+        ],
+        'today': [
+            {'$match': {'date': today}},
+            {'$group': {'_id': '$student.status', 'count': {'$sum': 1}}}
+        ]
+    }
+    selected = {name: stages for name, stages in all_facets.items() if facets is None or name in facets}
+
+    # Only read the history the selected facets look at
+    starts = [today]
+    if 'trend' in selected:
+        starts.append(trend_start)
+    if 'matrix' in selected:
+        starts.append(matrix_start)
+    match = {'faculty_email': faculty_email, 'date': {'$gte': min(starts), '$lte': today}}
+    return [{'$match': match}, {'$facet': selected}]
+
+
+def faculty_dashboard_stats(result):
+    """
+    Shape the faculty dashboard aggregation result
+
+    Args:
+        result: The single document returned by the ``faculty_dashboard_pipeline``
+            aggregation (None or an empty dict when nothing matched)
+
+    Returns:
+        dict: ``trend`` (date -> Present count), ``matrix`` (subject ->
+        classroom -> Present count), ``classes`` ((subject, branch, semester,
+        section) -> Present count today) and ``today`` ({'Present', 'Absent'} counts)
+    """
+    result = result or {}
+    trend = defaultdict(int)
+    for row in result.get('trend', []):
+        trend[row['_id']] = row['count']
+
+    matrix = defaultdict(lambda: defaultdict(int))
+    for row in result.get('matrix', []):
+        matrix[row['_id']['subject']][row['_id']['classroom']] = row['count']
+
+    classes = {}
+    for row in result.get('classes', []):
+        key = row['_id']
+        classes[(key.get('subject'), key.get('branch'), key.get('semester'), key.get('section'))] = row['count']
+
+    today = {'Present': 0, 'Absent': 0}
+    for row in result.get('today', []):
+        if row['_id'] in today:
+            today[row['_id']] = row['count']
+
+    return {'trend': trend, 'matrix': matrix, 'classes': classes, 'today': today}
+
+
+def student_stats_pipeline(roll_no, week_start, recent=10, subject_records=20, facets=None):
+    """
+    Build the aggregation behind the student dashboard and attendance pages
+
+    One ``$match`` on the roll number (served by the
+    ``attendance_student_subject_date`` index) feeds a ``$facet`` with the
+    per-subject counts, the recent week per subject and the latest records.
+
+    Args:
+        roll_no: Student roll number
+        week_start: First date string (``YYYY-MM-DD``) of the weekly breakdown
+        recent: Latest records of any subject to return
+        subject_records: Latest records per subject to return (0 = none)
+        facets: Names of the facets to compute (all if None): ``subjects``,
+            ``weekly`` and ``recent``
+
+    Returns:
+        list: Aggregation pipeline for the ``attendance`` collection
+    """
+    present = {'$sum': {'$cond': [{'$eq': ['$student.status', 'Present']}, 1, 0]}}
+    subjects = [
+        {'$match': {'subject': {'$nin': [None, '']}}},
+        {'$sort': {'_id': -1}},
+        {'$group': {'_id': '$subject', 'total': {'$sum': 1}, 'present': present}}
+    ]
+    if subject_records:
+        subjects[-1]['$group']['records'] = {'$push': {'date': '$date', 'status': '$student.status',
+                                                       'faculty_email': '$faculty_email'}}
+        subjects.append({'$project': {'total': 1, 'present': 1, 'records': {'$slice': ['$records', subject_records]}}})
+    all_facets = {
+        'subjects': subjects,
+        'weekly': [
+            {'$match': {'date': {'$gte': week_start}, 'subject': {'$nin': [None, '']}}},
+            {'$group': {'_id': '$subject', 'total': {'$sum': 1}, 'present': present}}
+        ],
+        'recent': [
+            {'$sort': {'_id': -1}},
+            {'$limit': recent},
+            {'$project': {'_id': 0, 'subject': 1, 'date': 1, 'status': '$student.status'}}
+        ]
+    }
+    selected = {name: stages for name, stages in all_facets.items() if facets is None or name in facets}
+    return [{'$match': {'student.roll_no': roll_no}}, {'$facet': selected}]
+
+
+def _percentage(present, total):
+    return int(round((present / total) * 100)) if total > 0 else 0
+
+
+def student_stats(result):
+    """
+    Shape the student stats aggregation result
+
+    Args:
+        result: The single document returned by the ``student_stats_pipeline``
+            aggregation (None or an empty dict when nothing matched)
+
+    Returns:
+        dict: ``subjects`` (subject -> total, present, percentage and latest
+        ``records``), ``weekly`` (subject -> present, absent, total) and
+        ``recent`` (latest records with subject, date and status)
+    """
+    result = result or {}
+    subjects = {}
+    for row in sorted(result.get('subjects', []), key=lambda row: str(row['_id'])):
+        subjects[row['_id']] = {
+            'total': row['total'],
+            'present': row['present'],
+            'percentage': _percentage(row['present'], row['total']),
+            'records': [{'date': r.get('date', ''), 'status': r.get('status', ''),
+                         'faculty_email': r.get('faculty_email', '')} for r in row.get('records', [])]
+        }
+
+    weekly = {}
+    for row in result.get('weekly', []):
+        weekly[row['_id']] = {'present': row['present'], 'absent': row['total'] - row['present'],
+                              'total': row['total']}
+
+    recent = [{'subject': r.get('subject', ''), 'date': r.get('date', ''), 'status': r.get('status', '')}
+              for r in result.get('recent', [])]
+    return {'subjects': subjects, 'weekly': weekly, 'recent': recent}
@@ -0,0 +1,305 @@
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+# One attendance record per student and lecture (unique index in db/indexes.py)
+ATTENDANCE_KEY = ('date', 'subject', 'branch', 'semester', 'section', 'student.roll_no')
+DUPLICATE_KEY = 11000
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def attendance_key(record):
+    """
+    Filter selecting the stored record of a student's attendance at a lecture
+
+    Records are keyed on date, subject, branch, semester, section and roll
+    number. Records that only carry a name (video and single-frame live
+    attendance) are keyed on the name instead.
+
+    Args:
+        record: Attendance document as stored in the ``attendance`` collection
+
+    Returns:
+        dict: Query filter
+    """
+    key = {field: record[field] for field in ATTENDANCE_KEY[:-1]}
+    roll_no = record['student'].get('roll_no')
+    if roll_no:
+        key['student.roll_no'] = roll_no
+    else:
+        key['student.name'] = record['student'].get('name')
+        key['student.roll_no'] = {'$exists': False}
+    return key
+
+
+def attendance_upsert(record, overwrite=True):
+    """
+    Build an idempotent write of one attendance record
+
+    Args:
+        record: Attendance document as stored in the ``attendance`` collection
+        overwrite: Replace the fields of an existing record; if False an
+            existing record is left as it is (used for absentees, so they
+            never override a Present written meanwhile)
+
+    Returns:
+        UpdateOne: Upsert for ``bulk_write``
+    """
+    key = attendance_key(record)
+    fields = {name: value for name, value in record.items() if name not in key and name != 'student'}
+    fields.update({f"student.{name}": value for name, value in record['student'].items()
+                   if f"student.{name}" not in key})
+    return UpdateOne(key, {'$set' if overwrite else '$setOnInsert': fields}, upsert=True)
+
+
+def bulk_upsert(collection, operations, batch_size=None):
+    """
+    Apply attendance upserts in unordered ``bulk_write`` batches
+
+    Two requests inserting the same new record at once make one of them fail
+    on the unique key; those writes are retried once, and then match the
+    record the other request inserted.
+
+    Args:
+        collection: pymongo collection to write to
+        operations: Upserts built by ``attendance_upsert``
+        batch_size: Most operations per bulk write (uses env var if None)
+
+    Returns:
+        dict: Number of records ``inserted`` and ``updated``
+
+    Raises:
+        BulkWriteError: If writes failed for another reason than a duplicate key
+    """
+    if batch_size is None:
+        batch_size = int(os.environ.get('ATTENDANCE_WRITE_BATCH', 1000))
+    batch_size = max(1, batch_size)
+    operations = list(operations)
+    counts = {'inserted': 0, 'updated': 0}
+    for start in range(0, len(operations), batch_size):
+        batch = operations[start:start + batch_size]
+        for attempt in range(2):
+            try:
+                result = collection.bulk_write(batch, ordered=False)
+                counts['inserted'] += result.upserted_count
+                counts['updated'] += result.modified_count
+                break
+            except BulkWriteError as e:
+                details = e.details
+                counts['inserted'] += details.get('nUpserted', 0)
+                counts['updated'] += details.get('nModified', 0)
+                errors = details.get('writeErrors', [])
+                if attempt or any(error['code'] != DUPLICATE_KEY for error in errors):
+                    raise
+                batch = [batch[error['index']] for error in errors]
+    return counts
+
+
+def remove_duplicate_attendance(collection, dry_run=False):
+    """
+    Delete extra records of a student's attendance at a lecture
+
+    Before the unique key existed, resubmitted forms inserted the same
+    record again. The most recently inserted record of each key is kept.
+
+    Args:
+        collection: The ``attendance`` collection
+        dry_run: Only count the records that would be deleted
+
+    Returns:
+        int: Number of duplicate records (deleted unless ``dry_run``)
+    """
+    pipeline = [
+        {'$match': {'student.roll_no': {'$gt': ''}}},
+        {'$group': {'_id': {field.replace('.', '_'): f"${field}" for field in ATTENDANCE_KEY},
+                    'ids': {'$push': '$_id'}, 'count': {'$sum': 1}}},
+        {'$match': {'count': {'$gt': 1}}}
+    ]
+    duplicates = []
+    for group in collection.aggregate(pipeline, allowDiskUse=True):
+        duplicates.extend(sorted(group['ids'])[:-1])
+    if duplicates and not dry_run:
+        for start in range(0, len(duplicates), 1000):
+            collection.delete_many({'_id': {'$in': duplicates[start:start + 1000]}})
+    return len(duplicates)
+
+
+class AttendanceWriter:
+    """
+    Bounded background writer of attendance upserts
+
+    Live sessions submit a Present upsert as soon as a student is first
+    recognized; a daemon thread drains the queue and sends up to
+    ``batch_size`` writes per unordered ``bulk_write``. When the queue is
+    full for ``put_timeout`` seconds the caller writes its operations itself,
+    so memory stays bounded and nothing is dropped. Writes are counted per
+    key (the session id) so ``flush`` can wait for one session only, and
+    reports whether any of its writes failed.
+    """
+
+    def __init__(self, collection=None, max_queue=None, batch_size=None, put_timeout=None):
+        """
+        Args:
+            collection: pymongo collection to write to (the ``attendance``
+                collection if None)
+            max_queue: Operations the queue holds (uses env var if None)
+            batch_size: Most operations per bulk write (uses env var if None)
+            put_timeout: Seconds to wait for queue space before writing inline (uses env var if None)
+        """
+        if max_queue is None:
+            max_queue = int(os.environ.get('ATTENDANCE_WRITER_QUEUE', 1024))
+        if batch_size is None:
+            batch_size = int(os.environ.get('ATTENDANCE_WRITER_BATCH', 100))
+        if put_timeout is None:
+            put_timeout = float(os.environ.get('ATTENDANCE_WRITER_PUT_SECONDS', 0.5))
+
+        self._collection = collection
+        self.max_queue = max(1, max_queue)
+        self.batch_size = max(1, batch_size)
+        self.put_timeout = put_timeout
+        self._queue = queue.Queue(maxsize=self.max_queue)
+        self._pending = Counter()
+        self._failed_keys = set()
+        self._cond = threading.Condition()
+        self._thread = None
+        self.written = 0
+        self.batches = 0
+        self.inline_writes = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+
+    @property
+    def collection(self):
+        if self._collection is None:
+            from ..db.mongo_client import get_collections
+            self._collection = get_collections()['attendance']
+        return self._collection
+
+    def submit(self, key, operations):
+        """
+        Queue writes for the background thread
+
+        Args:
+            key: Group the writes belong to, for ``flush`` (the live session id)
+            operations: pymongo write operations (``UpdateOne`` upserts)
+        """
+        operations = list(operations)
+        if not operations:
+            return
+        self._start()
+        with self._cond:
+            self._pending[key] += len(operations)
+        for index, operation in enumerate(operations):
+            try:
+                self._queue.put((key, operation), timeout=self.put_timeout)
+            except queue.Full:
+                # Writer is behind: apply the rest here instead of growing the queue
+                rest = operations[index:]
+                self._write(rest, [key])
+                with self._cond:
+                    self.inline_writes += len(rest)
+                self._done(key, len(rest))
+                return
+        with self._cond:
+            self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+
+    def flush(self, key, timeout=None):
+        """
+        Wait until the queued writes of one group are applied
+
+        Args:
+            key: Group passed to ``submit``
+            timeout: Most seconds to wait (uses env var if None)
+
+        Returns:
+            bool: True if every write of the group was applied; False if
+            some are still pending after ``timeout`` or failed since the
+            last flush
+        """
+        if timeout is None:
+            timeout = float(os.environ.get('ATTENDANCE_WRITER_FLUSH_SECONDS', 10))
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while self._pending[key] > 0:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            if key in self._failed_keys:
+                self._failed_keys.discard(key)
+                return False
+            return True
+
+    def stats(self):
+        """
+        Get writer counters
+
+        Returns:
+            dict: Operations written, batches, inline writes, failures and queue depth
+        """
+        with self._cond:
+            return {
+                'written': self.written,
+                'batches': self.batches,
+                'inline_writes': self.inline_writes,
+                'failed': self.failed,
+                'queued': self._queue.qsize(),
+                'max_queue_depth': self.max_queue_depth
+            }
+
+    def _start(self):
+        with self._cond:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._write([operation for _, operation in batch], {key for key, _ in batch})
+            for key, count in Counter(key for key, _ in batch).items():
+                self._done(key, count)
+
+    def _write(self, operations, keys):
+        try:
+            bulk_upsert(self.collection, operations, self.batch_size)
+            with self._cond:
+                self.written += len(operations)
+                self.batches += 1
+        except Exception as e:
+            print(f"Error writing attendance: {e}")
+            with self._cond:
+                self.failed += len(operations)
+                self._failed_keys.update(keys)
+
+    def _done(self, key, count):
+        with self._cond:
+            self._pending[key] -= count
+            if self._pending[key] <= 0:
+                del self._pending[key]
+                self._cond.notify_all()
+
+
+def get_attendance_writer():
+    """
+    Get the process-wide attendance writer
+
+    Returns:
+        AttendanceWriter: Shared writer instance
+    """
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = AttendanceWriter()
+        return _writer
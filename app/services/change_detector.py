@@ -0,0 +1,102 @@
+import os
+import cv2
+import numpy as np
+
+
+class ChangeDetector:
+    """
+    Cheap scene-change test for a stream of frames from a fixed camera
+
+    Each frame is reduced to a small grayscale thumbnail and compared with
+    the thumbnail of the last frame that was processed. A frame counts as
+    changed when enough thumbnail pixels moved by more than
+    ``pixel_delta``; unchanged frames can skip detection and reuse the last
+    result. Comparing against the last processed frame rather than the
+    previous one means slow drift still adds up to a change, and
+    ``max_skip_seconds`` forces a processed frame now and then regardless.
+    """
+
+    def __init__(self, width=None, pixel_delta=None, min_changed_fraction=None, max_skip_seconds=None,
+                 enabled=None):
+        """
+        Args:
+            width: Thumbnail width in pixels (uses env var if None)
+            pixel_delta: Gray-level difference for a thumbnail pixel to count as changed (uses env var if None)
+            min_changed_fraction: Share of changed pixels that makes a frame changed (uses env var if None)
+            max_skip_seconds: Longest stretch of skipped frames (uses env var if None)
+            enabled: Whether to skip frames at all (uses env var if None)
+        """
+        if width is None:
+            width = int(os.environ.get('FRAME_CHANGE_WIDTH', 64))
+        if pixel_delta is None:
+            pixel_delta = int(os.environ.get('FRAME_CHANGE_PIXEL_DELTA', 15))
+        if min_changed_fraction is None:
+            min_changed_fraction = float(os.environ.get('FRAME_CHANGE_MIN_FRACTION', 0.005))
+        if max_skip_seconds is None:
+            max_skip_seconds = float(os.environ.get('FRAME_CHANGE_MAX_SKIP_SECONDS', 10))
+        if enabled is None:
+            enabled = os.environ.get('FRAME_CHANGE_GATING', '1') == '1'
+
+        self.width = width
+        self.pixel_delta = pixel_delta
+        self.min_changed_fraction = min_changed_fraction
+        self.max_skip_seconds = max_skip_seconds
+        self.enabled = enabled
+        self._reference = None
+        self._reference_time = None
+        self.frames = 0
+        self.skipped = 0
+
+    def thumbnail(self, frame):
+        """
+        Reduce a frame to the grayscale thumbnail used for comparison
+
+        Args:
+            frame: RGB (or grayscale) numpy array
+
+        Returns:
+            numpy array: (h, width) int16 thumbnail
+        """
+        height = max(1, round(frame.shape[0] * self.width / frame.shape[1]))
+        small = cv2.resize(frame, (self.width, height), interpolation=cv2.INTER_AREA)
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+        return small.astype(np.int16)
+
+    def changed(self, frame, timestamp):
+        """
+        Decide whether a frame needs processing
+
+        Args:
+            frame: RGB numpy array
+            timestamp: Frame time in seconds
+
+        Returns:
+            bool: True if the frame should be processed, False if it can be skipped
+        """
+        self.frames += 1
+        if not self.enabled:
+            return True
+        thumb = self.thumbnail(frame)
+        if (self._reference is not None and self._reference.shape == thumb.shape
+                and timestamp - self._reference_time < self.max_skip_seconds):
+            moved = np.count_nonzero(np.abs(thumb - self._reference) > self.pixel_delta)
+            if moved < self.min_changed_fraction * thumb.size:
+                self.skipped += 1
+                return False
+        self._reference = thumb
+        self._reference_time = timestamp
+        return True
+
+    def stats(self):
+        """
+        Get gating counters
+
+        Returns:
+            dict: Frames seen, frames skipped and the skip ratio
+        """
+        return {
+            'frames': self.frames,
+            'skipped': self.skipped,
+            'skip_ratio': round(self.skipped / self.frames, 4) if self.frames else None
+        }
@@ -0,0 +1,481 @@
+import os
+import json
+import glob
+import base64
+import pickle
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: fall back to in-process locking only
+    fcntl = None
+
+SCHEMA_VERSION = 1
+SIDECAR_SUFFIX = '.json'
+LEGACY_SUFFIX = '.pickle'
+JOURNAL_SUFFIX = '.journal'
+LOCK_SUFFIX = '.lock'
+# Lock-free reads of a gallery before load() waits for the class lock
+_LOAD_ATTEMPTS = 3
+
+_local_locks = {}
+_local_locks_guard = threading.Lock()
+_compacting = set()
+_compacting_guard = threading.Lock()
+
+
+def entry_key(metadata):
+    """Identity of a gallery row: roll number, falling back to name"""
+    return metadata.get('roll_no') or metadata.get('name')
+
+
+def _json_default(value):
+    # Legacy pickles carry numpy scalars in their metadata
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class EmbeddingStore:
+    """
+    Versioned on-disk store for per-class face galleries
+
+    Each class is a float32 ``.npy`` matrix plus a JSON sidecar holding the
+    schema version, generation counter and per-row metadata. Matrices are
+    opened with ``mmap_mode='r'`` so loading is zero-copy and every gunicorn
+    worker shares the same pages through the OS page cache.
+
+    A save writes a new ``{class_id}.{generation}.npy`` and then atomically
+    replaces the sidecar that points to it, so readers never observe a
+    half-written gallery and existing mmaps stay valid until they are dropped.
+
+    Single-student changes don't rewrite the snapshot: ``upsert`` and
+    ``tombstone`` append one record to ``{class_id}.journal`` under an
+    exclusive file lock, and readers replay the journal over the snapshot.
+    Once the journal grows past ``compact_threshold`` records a background
+    thread folds it back into a new snapshot.
+    """
+
+    def __init__(self, split_dir, compact_threshold=None):
+        """
+        Args:
+            split_dir: Directory holding the per-class gallery files
+            compact_threshold: Journal records that trigger background compaction (uses env var if None)
+        """
+        if compact_threshold is None:
+            compact_threshold = int(os.environ.get('GALLERY_JOURNAL_COMPACT_THRESHOLD', 64))
+        self.split_dir = split_dir
+        self.compact_threshold = compact_threshold
+
+    def sidecar_path(self, class_id):
+        """Path of the metadata sidecar for a class"""
+        return os.path.join(self.split_dir, f"{class_id}{SIDECAR_SUFFIX}")
+
+    def legacy_path(self, class_id):
+        """Path of the pre-store pickle file for a class"""
+        return os.path.join(self.split_dir, f"{class_id}{LEGACY_SUFFIX}")
+
+    def journal_path(self, class_id):
+        """Path of the append-only change journal for a class"""
+        return os.path.join(self.split_dir, f"{class_id}{JOURNAL_SUFFIX}")
+
+    def exists(self, class_id):
+        """Check whether a class has a gallery (migrated, legacy or journal-only)"""
+        return any(os.path.exists(p) for p in (self.sidecar_path(class_id), self.legacy_path(class_id),
+                                                self.journal_path(class_id)))
+
+    def list_classes(self):
+        """
+        List every class with a gallery
+
+        Returns:
+            list: Sorted class identifiers
+        """
+        if not os.path.isdir(self.split_dir):
+            return []
+        classes = set()
+        for filename in os.listdir(self.split_dir):
+            for suffix in (SIDECAR_SUFFIX, LEGACY_SUFFIX, JOURNAL_SUFFIX):
+                if filename.endswith(suffix):
+                    classes.add(filename[:-len(suffix)])
+        return sorted(classes)
+
+    def signature(self, class_id):
+        """
+        Cheap change detector for a class gallery
+
+        Returns:
+            tuple: (mtime_ns, size, inode) of the snapshot file and the journal
+            size, or None if the class has no gallery
+        """
+        snapshot = None
+        for path in (self.sidecar_path(class_id), self.legacy_path(class_id)):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            snapshot = (st.st_mtime_ns, st.st_size, st.st_ino)
+            break
+        try:
+            st = os.stat(self.journal_path(class_id))
+            journal = (st.st_size, st.st_ino)
+        except FileNotFoundError:
+            journal = None
+        if snapshot is None and journal is None:
+            return None
+        return (snapshot, journal)
+
+    def read_header(self, class_id):
+        """
+        Read a class sidecar without touching the matrix
+
+        Returns:
+            dict: Sidecar contents, or None if the class is not migrated
+        """
+        try:
+            with open(self.sidecar_path(class_id), 'r') as f:
+                header = json.load(f)
+        except FileNotFoundError:
+            return None
+        if header.get('schema_version') != SCHEMA_VERSION:
+            raise ValueError(f"Unsupported gallery schema version {header.get('schema_version')} for {class_id}")
+        return header
+
+    def load(self, class_id):
+        """
+        Load a class gallery, replaying any journaled changes
+
+        Args:
+            class_id: Class identifier
+
+        Returns:
+            Tuple of (encodings, metadata) where encodings is a read-only
+            (n, d) float32 memmap when the journal is empty (a merged copy
+            otherwise), or (None, None) if the class has no gallery
+
+        Raises:
+            ModuleNotFoundError, ImportError, ValueError: if a legacy pickle
+            cannot be read with the installed numpy version
+        """
+        # A compaction between the two reads would pair the old snapshot with
+        # the emptied journal; retry while the generation moves, then lock
+        for _ in range(_LOAD_ATTEMPTS):
+            generation = self._generation(class_id)
+            encodings, metadata = self._load_snapshot(class_id)
+            records = self._read_journal(class_id)
+            if self._generation(class_id) == generation:
+                break
+        else:
+            with self._locked(class_id):
+                encodings, metadata = self._load_snapshot(class_id)
+                records = self._read_journal(class_id)
+        if not records:
+            return encodings, metadata
+        if metadata is None:
+            encodings, metadata = np.zeros((0, 0), dtype=np.float32), []
+        return self._apply_journal(encodings, metadata, records)
+
+    def _generation(self, class_id):
+        header = self.read_header(class_id)
+        return header.get('generation') if header is not None else None
+
+    def _load_snapshot(self, class_id):
+        for attempt in range(2):
+            header = self.read_header(class_id)
+            if header is None:
+                if os.path.exists(self.legacy_path(class_id)):
+                    return self._load_legacy(class_id)
+                return None, None
+
+            metadata = header.get('metadata', [])
+            if not metadata:
+                return np.zeros((0, header.get('dim', 0)), dtype=np.float32), []
+            matrix_path = os.path.join(self.split_dir, header['matrix'])
+            try:
+                encodings = np.load(matrix_path, mmap_mode='r', allow_pickle=False)
+                break
+            except FileNotFoundError:
+                # A concurrent save replaced the sidecar and dropped this matrix; re-read it
+                if attempt:
+                    raise
+        if encodings.shape[0] != len(metadata):
+            raise ValueError(f"Gallery {class_id} has {encodings.shape[0]} rows but {len(metadata)} metadata entries")
+        return encodings, metadata
+
+    def _load_legacy(self, class_id):
+        with open(self.legacy_path(class_id), 'rb') as f:
+            data = pickle.load(f)
+        encodings = data.get('encodings', [])
+        metadata = data.get('metadata', [])
+        if len(encodings) == 0:
+            return np.zeros((0, 0), dtype=np.float32), list(metadata)
+        return np.asarray(encodings, dtype=np.float32), list(metadata)
+
+    def save(self, class_id, encodings, metadata):
+        """
+        Atomically replace a class gallery, discarding its journal
+
+        Args:
+            class_id: Class identifier
+            encodings: Sequence or (n, d) matrix of face encodings
+            metadata: List of metadata dicts, one per encoding
+
+        Returns:
+            int: Generation number of the written gallery
+        """
+        with self._locked(class_id):
+            generation = self._write_snapshot(class_id, encodings, metadata)
+            self._reset_journal(class_id)
+        return generation
+
+    def upsert(self, class_id, encoding, metadata):
+        """
+        Add or replace one student's encoding without rewriting the gallery
+
+        Args:
+            class_id: Class identifier
+            encoding: Face encoding of the student
+            metadata: Student metadata dict (keyed by roll_no, else name)
+        """
+        vector = np.ascontiguousarray(np.asarray(encoding, dtype=np.float32).ravel())
+        self._append(class_id, {
+            'op': 'upsert',
+            'key': entry_key(metadata),
+            'metadata': metadata,
+            'embedding': base64.b64encode(vector.tobytes()).decode('ascii')
+        })
+
+    def tombstone(self, class_id, key):
+        """
+        Remove one student from a gallery without rewriting it
+
+        Args:
+            class_id: Class identifier
+            key: Roll number (or name for roll-less legacy rows) to remove
+        """
+        self._append(class_id, {'op': 'delete', 'key': key})
+
+    def compact(self, class_id):
+        """
+        Fold a class journal into a new base snapshot
+
+        Args:
+            class_id: Class identifier
+
+        Returns:
+            int: Number of journal records folded, 0 if there was nothing to do
+        """
+        with self._locked(class_id):
+            records = self._read_journal(class_id)
+            if not records:
+                return 0
+            encodings, metadata = self._load_snapshot(class_id)
+            if metadata is None:
+                encodings, metadata = np.zeros((0, 0), dtype=np.float32), []
+            encodings, metadata = self._apply_journal(encodings, metadata, records)
+            # Readers that see the new snapshot with the old journal replay
+            # idempotent records; load() retries on the generation change when
+            # it read the old snapshot and then the emptied journal
+            self._write_snapshot(class_id, encodings, metadata)
+            self._reset_journal(class_id)
+        return len(records)
+
+    def journal_length(self, class_id):
+        """Number of committed records waiting in a class journal"""
+        return len(self._read_journal(class_id))
+
+    def _write_snapshot(self, class_id, encodings, metadata):
+        os.makedirs(self.split_dir, exist_ok=True)
+        metadata = list(metadata)
+        if len(encodings) != len(metadata):
+            raise ValueError(f"Got {len(encodings)} encodings but {len(metadata)} metadata entries")
+        matrix = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32)) if len(encodings) else None
+
+        try:
+            previous = self.read_header(class_id)
+        except (ValueError, json.JSONDecodeError):
+            previous = None
+        generation = (previous or {}).get('generation', 0) + 1
+
+        header = {
+            'schema_version': SCHEMA_VERSION,
+            'class_id': class_id,
+            'generation': generation,
+            'count': len(metadata),
+            'dim': int(matrix.shape[1]) if matrix is not None else 0,
+            'matrix': None,
+            'metadata': metadata
+        }
+        if matrix is not None:
+            header['matrix'] = f"{class_id}.{generation}.npy"
+            self._atomic_write(header['matrix'], lambda f: np.save(f, matrix, allow_pickle=False))
+        self._atomic_write(os.path.basename(self.sidecar_path(class_id)),
+                           lambda f: f.write(json.dumps(header, default=_json_default).encode('utf-8')))
+
+        # The sidecar is the commit point; older matrices and the legacy pickle are now stale
+        self._remove_stale(class_id, header['matrix'])
+        return generation
+
+    def _append(self, class_id, record):
+        os.makedirs(self.split_dir, exist_ok=True)
+        line = (json.dumps(record, default=_json_default) + '\n').encode('utf-8')
+        with self._locked(class_id):
+            fd = os.open(self.journal_path(class_id), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        if self.compact_threshold and self.journal_length(class_id) >= self.compact_threshold:
+            self._compact_in_background(class_id)
+
+    def _read_journal(self, class_id):
+        try:
+            with open(self.journal_path(class_id), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return []
+        records = []
+        # A line without its newline is an append still in flight; skip it
+        for line in data.split(b'\n')[:-1]:
+            if line.strip():
+                records.append(json.loads(line))
+        return records
+
+    def _apply_journal(self, encodings, metadata, records):
+        rows = {}
+        for i, meta in enumerate(metadata):
+            key = entry_key(meta)
+            rows[key if key is not None else ('#row', i)] = (encodings[i], meta)
+        for record in records:
+            if record['op'] == 'upsert':
+                vector = np.frombuffer(base64.b64decode(record['embedding']), dtype=np.float32)
+                rows[record['key']] = (vector, record['metadata'])
+            elif record['op'] == 'delete':
+                rows.pop(record['key'], None)
+        if not rows:
+            return np.zeros((0, encodings.shape[1] if encodings.ndim == 2 else 0), dtype=np.float32), []
+        merged = np.stack([np.asarray(vector, dtype=np.float32) for vector, _ in rows.values()])
+        return merged, [meta for _, meta in rows.values()]
+
+    def _reset_journal(self, class_id):
+        if os.path.exists(self.journal_path(class_id)):
+            self._atomic_write(os.path.basename(self.journal_path(class_id)), lambda f: None)
+
+    def _compact_in_background(self, class_id):
+        job = (os.path.abspath(self.split_dir), class_id)
+        with _compacting_guard:
+            if job in _compacting:
+                return
+            _compacting.add(job)
+
+        def run():
+            try:
+                self.compact(class_id)
+            except Exception as e:
+                print(f"Error compacting gallery journal for {class_id}: {e}")
+            finally:
+                with _compacting_guard:
+                    _compacting.discard(job)
+
+        threading.Thread(target=run, name=f"gallery-compact-{class_id}", daemon=True).start()
+
+    @contextmanager
+    def _locked(self, class_id):
+        """Exclusive per-class lock across threads (and processes where fcntl exists)"""
+        os.makedirs(self.split_dir, exist_ok=True)
+        lock_path = os.path.abspath(os.path.join(self.split_dir, f"{class_id}{LOCK_SUFFIX}"))
+        with _local_locks_guard:
+            local_lock = _local_locks.setdefault(lock_path, threading.Lock())
+        with local_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def delete(self, class_id):
+        """Remove every file belonging to a class gallery"""
+        for path in [self.sidecar_path(class_id), self.legacy_path(class_id),
+                     self.journal_path(class_id)] + self._matrix_files(class_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _matrix_files(self, class_id):
+        pattern = os.path.join(glob.escape(self.split_dir), f"{glob.escape(class_id)}.*.npy")
+        return [p for p in glob.glob(pattern)
+                if os.path.basename(p)[len(class_id) + 1:-len('.npy')].isdigit()]
+
+    def _remove_stale(self, class_id, current_matrix):
+        for path in self._matrix_files(class_id) + [self.legacy_path(class_id)]:
+            if os.path.basename(path) == current_matrix:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _atomic_write(self, filename, write):
+        fd, tmp_path = tempfile.mkstemp(dir=self.split_dir, prefix=f".{filename}.", suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, os.path.join(self.split_dir, filename))
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+def migrate_pickles(split_dir, keep_backup=True):
+    """
+    One-shot migration of legacy ``{class_id}.pickle`` galleries into the store
+
+    Args:
+        split_dir: Directory holding the per-class gallery files
+        keep_backup: Rename migrated pickles to ``.pickle.bak`` instead of deleting them
+
+    Returns:
+        list: (class_id, status, detail) tuples, one per legacy pickle
+    """
+    store = EmbeddingStore(split_dir)
+    report = []
+    if not os.path.isdir(split_dir):
+        return report
+
+    for filename in sorted(os.listdir(split_dir)):
+        if not filename.endswith(LEGACY_SUFFIX):
+            continue
+        class_id = filename[:-len(LEGACY_SUFFIX)]
+        legacy_path = store.legacy_path(class_id)
+        # Journaled upserts and tombstones made over the pickle are folded into
+        # the new snapshot, under the lock so no append lands in between
+        with store._locked(class_id):
+            try:
+                encodings, metadata = store._load_snapshot(class_id)
+                records = store._read_journal(class_id)
+                if records:
+                    encodings, metadata = store._apply_journal(encodings, metadata, records)
+            except Exception as e:
+                report.append((class_id, 'failed', str(e)))
+                continue
+
+            if keep_backup:
+                # The pickle is deleted once the new gallery is committed
+                shutil.copy2(legacy_path, legacy_path + '.bak')
+            store._write_snapshot(class_id, encodings, metadata)
+            store._reset_journal(class_id)
+        report.append((class_id, 'migrated', f"{len(metadata)} encodings"))
+    return report
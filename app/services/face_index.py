@@ -0,0 +1,245 @@
+import os
+import threading
+import time
+import numpy as np
+from .embedding_store import EmbeddingStore, entry_key
+from .face_matcher import squared_norms
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+class _ClassBlock:
+    """Encodings of one class inside the global index"""
+
+    def __init__(self, encodings, metadata, signature=None):
+        if len(metadata) == 0:
+            encodings = np.zeros((0, encodings.shape[1] if getattr(encodings, 'ndim', 0) == 2 else 0),
+                                 dtype=np.float32)
+        self.encodings = np.asarray(encodings, dtype=np.float32)
+        self.sq_norms = squared_norms(self.encodings)
+        self.metadata = list(metadata)
+        self.signature = signature
+
+
+class FaceIndex:
+    """
+    Institution-wide exact nearest-neighbour index over every class gallery
+
+    The index keeps one block per class and answers queries with one GEMM
+    per block, so duplicate checks at registration cost a few milliseconds
+    instead of unpickling every gallery. Blocks are reconciled with the
+    embedding store by signature at most every ``refresh_interval`` seconds,
+    reloading only the classes that changed; ``insert`` and ``remove``
+    apply this process's own writes immediately.
+    """
+
+    def __init__(self, split_dir, refresh_interval=None):
+        """
+        Args:
+            split_dir: Directory holding the per-class gallery files
+            refresh_interval: Seconds between store reconciliations (uses env var if None)
+        """
+        if refresh_interval is None:
+            refresh_interval = float(os.environ.get('FACE_INDEX_REFRESH_SECONDS', 2.0))
+        self.store = EmbeddingStore(split_dir)
+        self.refresh_interval = refresh_interval
+        self._blocks = {}
+        self._lock = threading.RLock()
+        self._refreshed_at = None
+        self.reloads = 0
+
+    def refresh(self, force=False):
+        """
+        Reload classes whose gallery changed on disk and drop deleted ones
+
+        Args:
+            force: Reconcile even if the refresh interval hasn't elapsed
+        """
+        now = time.monotonic()
+        with self._lock:
+            if not force and self._refreshed_at is not None and now - self._refreshed_at < self.refresh_interval:
+                return
+            class_ids = set(self.store.list_classes())
+            for class_id in list(self._blocks):
+                if class_id not in class_ids:
+                    del self._blocks[class_id]
+            for class_id in class_ids:
+                signature = self.store.signature(class_id)
+                block = self._blocks.get(class_id)
+                if block is not None and block.signature == signature:
+                    continue
+                try:
+                    encodings, metadata = self.store.load(class_id)
+                except Exception as e:
+                    print(f"Warning: Skipping gallery {class_id} in face index: {e}")
+                    self._blocks.pop(class_id, None)
+                    continue
+                if metadata is None:
+                    self._blocks.pop(class_id, None)
+                    continue
+                self._blocks[class_id] = _ClassBlock(encodings, metadata, signature)
+                self.reloads += 1
+            self._refreshed_at = now
+
+    def nearest(self, embedding, tolerance=None):
+        """
+        Find the registered face closest to an embedding across all classes
+
+        Args:
+            embedding: Face encoding to look up
+            tolerance: Only return a match closer than this distance (None = any)
+
+        Returns:
+            dict: ``class_id``, ``metadata``, ``index`` and ``distance`` of the
+            nearest registered face, or None
+        """
+        results = self.search([embedding], k=1)
+        if not results or not results[0]:
+            return None
+        best = results[0][0]
+        if tolerance is not None and best['distance'] >= tolerance:
+            return None
+        return best
+
+    def search(self, embeddings, k=1):
+        """
+        Exact top-k search for a batch of embeddings
+
+        Args:
+            embeddings: Sequence or (m, d) matrix of face encodings
+            k: Number of nearest registered faces per query
+
+        Returns:
+            list: Per query, up to ``k`` result dicts sorted by distance
+        """
+        self.refresh()
+        queries = np.asarray(embeddings, dtype=np.float32)
+        if queries.ndim == 1:
+            queries = queries[np.newaxis, :]
+        query_sq_norms = squared_norms(queries)
+
+        candidates = [[] for _ in range(len(queries))]
+        with self._lock:
+            blocks = list(self._blocks.items())
+        for class_id, block in blocks:
+            if len(block.metadata) == 0 or block.encodings.shape[1] != queries.shape[1]:
+                continue
+            sq_dists = query_sq_norms[:, np.newaxis] + block.sq_norms[np.newaxis, :] - 2.0 * (queries @ block.encodings.T)
+            np.maximum(sq_dists, 0.0, out=sq_dists)
+            kk = min(k, sq_dists.shape[1])
+            top = np.argpartition(sq_dists, kk - 1, axis=1)[:, :kk]
+            for qi in range(len(queries)):
+                for idx in top[qi]:
+                    candidates[qi].append((float(sq_dists[qi, idx]), class_id, int(idx), block))
+
+        results = []
+        for found in candidates:
+            found.sort(key=lambda c: c[0])
+            results.append([{
+                'class_id': class_id,
+                'index': idx,
+                'metadata': block.metadata[idx],
+                'distance': float(np.sqrt(sq_dist))
+            } for sq_dist, class_id, idx, block in found[:k]])
+        return results
+
+    def insert(self, class_id, encoding, metadata):
+        """
+        Add or replace one registration in the index (mirrors ``EmbeddingStore.upsert``)
+
+        Args:
+            class_id: Class identifier
+            encoding: Face encoding
+            metadata: Student metadata dict
+        """
+        vector = np.asarray(encoding, dtype=np.float32).reshape(1, -1)
+        key = entry_key(metadata)
+        with self._lock:
+            block = self._blocks.get(class_id)
+            if block is None or len(block.metadata) == 0:
+                self._blocks[class_id] = _ClassBlock(vector, [metadata])
+                return
+            keep = [i for i, m in enumerate(block.metadata) if entry_key(m) != key]
+            encodings = np.concatenate([block.encodings[keep], vector])
+            self._blocks[class_id] = _ClassBlock(encodings, [block.metadata[i] for i in keep] + [metadata],
+                                                 block.signature)
+
+    def remove(self, class_id, key):
+        """
+        Remove one registration from the index (mirrors ``EmbeddingStore.tombstone``)
+
+        Args:
+            class_id: Class identifier
+            key: Roll number (or name for roll-less rows)
+        """
+        with self._lock:
+            block = self._blocks.get(class_id)
+            if block is None:
+                return
+            keep = [i for i, m in enumerate(block.metadata) if entry_key(m) != key]
+            if len(keep) != len(block.metadata):
+                self._blocks[class_id] = _ClassBlock(block.encodings[keep], [block.metadata[i] for i in keep],
+                                                     block.signature)
+
+    def find_key(self, key):
+        """
+        Find every class a student is registered in
+
+        Args:
+            key: Roll number
+
+        Returns:
+            list: (class_id, metadata) tuples
+        """
+        self.refresh()
+        with self._lock:
+            return [(class_id, meta)
+                    for class_id, block in sorted(self._blocks.items())
+                    for meta in block.metadata if entry_key(meta) == key]
+
+    def entries(self):
+        """
+        List every registration in the index
+
+        Returns:
+            list: (class_id, row_index, metadata) tuples ordered by class
+        """
+        self.refresh()
+        with self._lock:
+            return [(class_id, i, meta)
+                    for class_id, block in sorted(self._blocks.items())
+                    for i, meta in enumerate(block.metadata)]
+
+    def stats(self):
+        """
+        Get index size counters
+
+        Returns:
+            dict: Class and registration counts and block reloads
+        """
+        with self._lock:
+            return {
+                'classes': len(self._blocks),
+                'registrations': sum(len(b.metadata) for b in self._blocks.values()),
+                'reloads': self.reloads
+            }
+
+
+def get_face_index(split_dir):
+    """
+    Get the process-wide face index for an encodings directory
+
+    Args:
+        split_dir: Directory holding the per-class gallery files
+
+    Returns:
+        FaceIndex: Shared index instance
+    """
+    key = os.path.abspath(split_dir)
+    with _indexes_lock:
+        index = _indexes.get(key)
+        if index is None:
+            index = FaceIndex(split_dir)
+            _indexes[key] = index
+        return index
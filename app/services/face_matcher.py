@@ -0,0 +1,104 @@
+import os
+import numpy as np
+
+
+def _default_tolerance():
+    return float(os.environ.get('FACE_RECOGNITION_TOLERANCE', 0.85))
+
+
+def _default_top_k():
+    return int(os.environ.get('FACE_MATCH_TOP_K', 1))
+
+
+def squared_norms(encodings):
+    """
+    Squared L2 norm of every row of an encoding matrix
+
+    Args:
+        encodings: (n, d) matrix of face encodings
+
+    Returns:
+        numpy array: (n,) float32 squared norms
+    """
+    encodings = np.asarray(encodings, dtype=np.float32)
+    if encodings.ndim != 2 or len(encodings) == 0:
+        return np.zeros(len(encodings), dtype=np.float32)
+    return np.einsum('ij,ij->i', encodings, encodings)
+
+
+def match_embeddings(face_encodings, known_encodings, known_metadata=None, tolerance=None,
+                     top_k=None, known_sq_norms=None):
+    """
+    Match every face of a frame against a gallery with one matrix multiply
+
+    Distances are the same L2 distances the per-face loop used to compute,
+    expanded as ``|q|^2 + |g|^2 - 2 q.g`` so the whole frame is scored by a
+    single ``Q @ G.T``. Gallery rows are class averages and are not unit
+    length, so the expansion keeps decisions identical to the old
+    ``np.linalg.norm(known - q) < tolerance`` check. Cosine similarity is
+    reported alongside for diagnostics.
+
+    Args:
+        face_encodings: Sequence or (m, d) matrix of embeddings from one frame
+        known_encodings: (n, d) gallery matrix
+        known_metadata: List of metadata corresponding to known encodings
+        tolerance: Distance threshold for matching (uses env var if None)
+        top_k: Number of nearest gallery entries to report per face (uses env var if None)
+        known_sq_norms: Precomputed squared norms of the gallery rows
+
+    Returns:
+        list: One dict per face with ``index``/``metadata`` of the best match
+        (None when above tolerance), its ``distance`` and ``similarity``, and
+        ``top_k`` as a list of ``(index, distance)`` pairs sorted by distance
+    """
+    if tolerance is None:
+        tolerance = _default_tolerance()
+    if top_k is None:
+        top_k = _default_top_k()
+
+    if face_encodings is None or len(face_encodings) == 0:
+        return []
+    queries = np.asarray(face_encodings, dtype=np.float32)
+    if queries.ndim == 1:
+        queries = queries[np.newaxis, :]
+
+    if known_encodings is None or len(known_encodings) == 0:
+        return [{'index': None, 'metadata': None, 'distance': None,
+                 'similarity': None, 'top_k': []} for _ in range(len(queries))]
+
+    gallery = np.asarray(known_encodings, dtype=np.float32)
+    if known_sq_norms is None:
+        known_sq_norms = squared_norms(gallery)
+    query_sq_norms = squared_norms(queries)
+
+    dots = queries @ gallery.T
+    sq_dists = query_sq_norms[:, np.newaxis] + known_sq_norms[np.newaxis, :] - 2.0 * dots
+    np.maximum(sq_dists, 0.0, out=sq_dists)
+
+    rows = np.arange(len(queries))
+    best_idx = np.argmin(sq_dists, axis=1)
+    best_dist = np.sqrt(sq_dists[rows, best_idx])
+    denom = np.sqrt(query_sq_norms * known_sq_norms[best_idx])
+    best_sim = np.divide(dots[rows, best_idx], denom, out=np.zeros_like(denom), where=denom > 0)
+
+    k = max(1, min(top_k, gallery.shape[0]))
+    if k == 1:
+        top_idx = best_idx[:, np.newaxis]
+    else:
+        top_idx = np.argpartition(sq_dists, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(sq_dists, top_idx, axis=1), axis=1)
+        top_idx = np.take_along_axis(top_idx, order, axis=1)
+    top_dist = np.sqrt(np.take_along_axis(sq_dists, top_idx, axis=1))
+
+    results = []
+    for i in range(len(queries)):
+        idx = int(best_idx[i])
+        matched = best_dist[i] < tolerance
+        results.append({
+            'index': idx if matched else None,
+            'metadata': (known_metadata[idx] if known_metadata is not None else None) if matched else None,
+            'distance': float(best_dist[i]),
+            'similarity': float(best_sim[i]),
+            'top_k': [(int(j), float(d)) for j, d in zip(top_idx[i], top_dist[i])]
+        })
+    return results
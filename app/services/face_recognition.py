@@ -1,27 +1,108 @@
 from insightface.app import FaceAnalysis
+from insightface.app.common import Face
+from insightface.utils import face_align
 import numpy as np
+import onnxruntime
 import cv2
 import os
+import threading
+import time
+from .face_matcher import match_embeddings
+
+# Process-wide service registry: every route in a worker shares one loaded model
+_service = None
+_service_lock = threading.Lock()
+
 
 class FaceRecognitionService:
     """Service for face detection and recognition using InsightFace"""
     
-    def __init__(self):
-        """Initialize the face recognition service"""
+    def __init__(self, threads=None):
+        """
+        Initialize the face recognition service
+        
+        Args:
+            threads: Intra-op threads per model (uses env var if None; 0 = runtime default)
+        """
         self.face_app = None
-        self._initialize_face_app()
+        self.model_name = None
+        self.load_time = None
+        self.loaded_at = None
+        self.warmed_up = False
+        self.warmup_time = None
+        self.threads = None
+        self._initialize_face_app(threads)
     
-    def _initialize_face_app(self):
+    def _initialize_face_app(self, threads=None):
         """Initialize the InsightFace application"""
         try:
             # Get model name from environment variable
             model_name = os.environ.get('FACE_RECOGNITION_MODEL', "buffalo_l")
+            started = time.perf_counter()
             self.face_app = FaceAnalysis(name=model_name, providers=["CPUExecutionProvider"])
             self.face_app.prepare(ctx_id=0)
+            if threads is None:
+                threads = int(os.environ.get('FACE_RECOGNITION_THREADS', 0))
+            if threads > 0:
+                self._limit_threads(threads)
+            self.model_name = model_name
+            self.load_time = time.perf_counter() - started
+            self.loaded_at = time.time()
         except Exception as e:
             print(f"Error initializing face recognition: {e}")
             raise
     
+    def _limit_threads(self, threads):
+        """Recreate every model's ONNX session with a fixed intra-op thread count"""
+        options = onnxruntime.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        for model in self.face_app.models.values():
+            model.session = onnxruntime.InferenceSession(model.model_file, sess_options=options,
+                                                         providers=["CPUExecutionProvider"])
+        self.threads = threads
+    
+    def warmup(self):
+        """
+        Run one throwaway inference through every model so the first real
+        request does not pay for ONNX Runtime's lazy graph initialization
+        
+        Returns:
+            float: Warmup duration in seconds
+        """
+        if self.face_app is None:
+            self._initialize_face_app()
+        
+        started = time.perf_counter()
+        # A blank image only exercises the detector, so feed the recognition
+        # model a dummy aligned crop as well
+        self.face_app.get(np.zeros((640, 640, 3), dtype=np.uint8))
+        rec_model = self.face_app.models.get('recognition')
+        if rec_model is not None:
+            width, height = rec_model.input_size
+            rec_model.get_feat(np.zeros((height, width, 3), dtype=np.uint8))
+        self.warmup_time = time.perf_counter() - started
+        self.warmed_up = True
+        return self.warmup_time
+    
+    def status(self):
+        """
+        Report model load and warmup state
+        
+        Returns:
+            dict: Model name, load/warmup timings and readiness flags
+        """
+        return {
+            'model': self.model_name,
+            'loaded': self.face_app is not None,
+            'load_time': self.load_time,
+            'loaded_at': self.loaded_at,
+            'warmed_up': self.warmed_up,
+            'warmup_time': self.warmup_time,
+            'threads': self.threads,
+            'pid': os.getpid()
+        }
+    
     def get_faces(self, image):
         """
         Detect faces in an image and return face embeddings
@@ -42,6 +123,97 @@ class FaceRecognitionService:
             print(f"Error detecting faces: {e}")
             return []
     
+    def get_faces_batch(self, images, max_batch=None):
+        """
+        Detect faces in several images, then embed every aligned face crop
+        in one recognition call
+        
+        Only detection and recognition run, so the returned faces carry
+        bbox, kps, det_score and embedding (not age/gender/landmarks).
+        
+        Args:
+            images: List of RGB numpy arrays
+            max_batch: Largest number of crops per recognition call (uses env var if None)
+            
+        Returns:
+            List with one list of detected faces per input image
+        """
+        try:
+            per_image = [self.detect_faces(image, raise_errors=True) for image in images]
+            self.embed_faces([(image, face) for image, faces in zip(images, per_image) for face in faces],
+                             max_batch, raise_errors=True)
+            return per_image
+        except Exception as e:
+            print(f"Error detecting faces in batch: {e}")
+            return [[] for _ in images]
+    
+    def detect_faces(self, image, raise_errors=False):
+        """
+        Run only the face detector on an image
+        
+        Args:
+            image: RGB numpy array of the image
+            raise_errors: Raise detector errors instead of returning no faces
+            
+        Returns:
+            List of detected faces carrying bbox, kps and det_score (no embedding)
+        """
+        if self.face_app is None:
+            self._initialize_face_app()
+        
+        try:
+            bboxes, kpss = self.face_app.det_model.detect(image, max_num=0, metric='default')
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error detecting faces: {e}")
+            return []
+        if kpss is None:
+            return []
+        return [Face(bbox=bboxes[i, 0:4], kps=kpss[i], det_score=bboxes[i, 4]) for i in range(bboxes.shape[0])]
+    
+    def embed_faces(self, items, max_batch=None, raise_errors=False):
+        """
+        Compute embeddings for detected faces with batched recognition calls
+        
+        Args:
+            items: List of (RGB image, face) pairs; faces come from ``detect_faces``
+            max_batch: Largest number of crops per recognition call (uses env var if None)
+            raise_errors: Raise recognition errors instead of leaving faces without embeddings
+            
+        Returns:
+            The faces, with ``embedding`` set (so ``normed_embedding`` works)
+        """
+        if self.face_app is None:
+            self._initialize_face_app()
+        
+        rec_model = self.face_app.models.get('recognition')
+        if rec_model is None or not items:
+            return [face for _, face in items]
+        try:
+            crops = [face_align.norm_crop(image, landmark=face.kps, image_size=rec_model.input_size[0])
+                     for image, face in items]
+            for (_, face), feat in zip(items, self._embed_crops(rec_model, crops, max_batch)):
+                face.embedding = feat.flatten()
+        except Exception as e:
+            if raise_errors:
+                raise
+            print(f"Error computing face embeddings: {e}")
+        return [face for _, face in items]
+    
+    def _embed_crops(self, rec_model, crops, max_batch=None):
+        """Run the recognition model over aligned crops in as few calls as possible"""
+        if max_batch is None:
+            max_batch = int(os.environ.get('FACE_RECOGNITION_MAX_BATCH', 32))
+        # Some exported models pin the batch axis to 1
+        if isinstance(rec_model.input_shape[0], int) and rec_model.input_shape[0] == 1:
+            max_batch = 1
+        max_batch = max(1, max_batch)
+        feats = []
+        for start in range(0, len(crops), max_batch):
+            feats.extend(rec_model.get_feat(crops[start:start + max_batch]))
+        return feats
+    
     def get_face_embedding(self, image):
         """
         Get face embedding from an image
@@ -100,12 +272,59 @@ class FaceRecognitionService:
         if tolerance is None:
             tolerance = float(os.environ.get('FACE_RECOGNITION_TOLERANCE', 0.85))
         
-        known_encodings = np.array(known_encodings)
-        distances = np.linalg.norm(known_encodings - face_encoding, axis=1)
-        min_idx = np.argmin(distances)
-        min_distance = distances[min_idx]
+        match = match_embeddings([face_encoding], known_encodings, known_metadata, tolerance, top_k=1)[0]
+        if match['index'] is not None:
+            return match['metadata'], match['distance']
         
-        if min_distance < tolerance:
-            return known_metadata[min_idx], min_distance
+        return None, None
+    
+    def find_matching_faces(self, known_encodings, known_metadata, face_encodings, tolerance=None,
+                            top_k=None, known_sq_norms=None):
+        """
+        Find the best matching face for every embedding of a frame at once
         
-        return None, None 
\ No newline at end of file
+        Args:
+            known_encodings: (n, d) matrix of known face encodings
+            known_metadata: List of metadata corresponding to known encodings
+            face_encodings: Embeddings of all faces detected in the frame
+            tolerance: Distance threshold for matching (uses env var if None)
+            top_k: Number of nearest candidates to report per face (uses env var if None)
+            known_sq_norms: Precomputed squared norms of the known encodings
+            
+        Returns:
+            List of match dicts, one per face (see face_matcher.match_embeddings)
+        """
+        return match_embeddings(face_encodings, known_encodings, known_metadata, tolerance,
+                                top_k=top_k, known_sq_norms=known_sq_norms)
+
+
+def get_face_service():
+    """
+    Get the process-wide face recognition service, loading and warming up
+    the model on first use
+    
+    Returns:
+        FaceRecognitionService: Shared service instance for this process
+    """
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                service = FaceRecognitionService()
+                if os.environ.get('FACE_RECOGNITION_WARMUP', '1') == '1':
+                    service.warmup()
+                _service = service
+    return _service
+
+
+def get_face_service_status():
+    """
+    Report the state of the shared service without triggering a model load
+    
+    Returns:
+        dict: Service status, or a not-loaded placeholder
+    """
+    service = _service
+    if service is None:
+        return {'loaded': False, 'warmed_up': False, 'pid': os.getpid()}
+    return service.status()
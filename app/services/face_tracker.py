@@ -0,0 +1,259 @@
+import os
+import threading
+from collections import Counter
+import numpy as np
+from .face_matcher import match_embeddings
+
+
+def iou_matrix(boxes_a, boxes_b):
+    """
+    Intersection over union of every pair of boxes
+
+    Args:
+        boxes_a: (n, 4) boxes as x1, y1, x2, y2
+        boxes_b: (m, 4) boxes as x1, y1, x2, y2
+
+    Returns:
+        numpy array: (n, m) IoU values
+    """
+    a = np.asarray(boxes_a, dtype=np.float32).reshape(-1, 4)
+    b = np.asarray(boxes_b, dtype=np.float32).reshape(-1, 4)
+    x1 = np.maximum(a[:, None, 0], b[None, :, 0])
+    y1 = np.maximum(a[:, None, 1], b[None, :, 1])
+    x2 = np.minimum(a[:, None, 2], b[None, :, 2])
+    y2 = np.minimum(a[:, None, 3], b[None, :, 3])
+    inter = np.clip(x2 - x1, 0, None) * np.clip(y2 - y1, 0, None)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class FaceTrack:
+    """One face followed across frames"""
+
+    def __init__(self, track_id, bbox, timestamp):
+        self.track_id = track_id
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        self.first_seen = timestamp
+        self.last_seen = timestamp
+        self.last_recognized = None
+        self.hits = 1
+        self.votes = Counter()
+        self.recognitions = 0
+
+    def identity(self, min_votes=1):
+        """
+        Track-level vote over the recognition results of this track
+
+        Args:
+            min_votes: Votes the winning identity needs
+
+        Returns:
+            The most voted identity, or None if no identity has enough votes
+        """
+        if not self.votes:
+            return None
+        label, count = self.votes.most_common(1)[0]
+        return label if count >= min_votes else None
+
+
+class FaceTracker:
+    """
+    Link face detections across frames by bounding-box IoU
+
+    Detections are matched greedily to live tracks by IoU. A detection that
+    starts a new track needs recognition; existing tracks are re-verified
+    every ``reverify_interval`` seconds (every ``retry_interval`` while they
+    have no identity yet), and in between carry their voted identity. Tracks
+    not seen for ``max_age`` seconds end; their identity is kept for
+    ``identities``.
+    """
+
+    def __init__(self, iou_threshold=None, max_age=None, reverify_interval=None, retry_interval=None,
+                 min_votes=None):
+        """
+        Args:
+            iou_threshold: Minimum IoU to continue a track (uses env var if None)
+            max_age: Seconds a track survives without detections (uses env var if None)
+            reverify_interval: Seconds between recognitions of an identified track,
+                0 to recognize every detection (uses env var if None)
+            retry_interval: Seconds between recognitions of an unidentified track (uses env var if None)
+            min_votes: Votes an identity needs to count for attendance (uses env var if None)
+        """
+        if iou_threshold is None:
+            iou_threshold = float(os.environ.get('FACE_TRACK_IOU', 0.3))
+        if max_age is None:
+            max_age = float(os.environ.get('FACE_TRACK_MAX_AGE_SECONDS', 2.0))
+        if reverify_interval is None:
+            reverify_interval = float(os.environ.get('FACE_TRACK_REVERIFY_SECONDS', 5.0))
+        if retry_interval is None:
+            retry_interval = float(os.environ.get('FACE_TRACK_RETRY_SECONDS', 1.0))
+        if min_votes is None:
+            min_votes = int(os.environ.get('FACE_TRACK_MIN_VOTES', 1))
+
+        self.iou_threshold = iou_threshold
+        self.max_age = max_age
+        self.reverify_interval = reverify_interval
+        self.retry_interval = min(retry_interval, reverify_interval)
+        self.min_votes = min_votes
+        self.tracks = []
+        self._ended = set()
+        self._next_id = 1
+        self._lock = threading.RLock()
+        self.detections = 0
+        self.recognitions = 0
+        self.tracks_started = 0
+
+    def update(self, bboxes, timestamp):
+        """
+        Assign the detections of one frame to tracks
+
+        Args:
+            bboxes: Detected face boxes (x1, y1, x2, y2) of the frame
+            timestamp: Frame time in seconds
+
+        Returns:
+            list: One ``(track, needs_recognition)`` pair per box, in order
+        """
+        with self._lock:
+            self._expire(timestamp)
+            boxes = np.asarray(bboxes, dtype=np.float32).reshape(-1, 4)
+            self.detections += len(boxes)
+            assigned = [None] * len(boxes)
+
+            if self.tracks and len(boxes):
+                ious = iou_matrix([t.bbox for t in self.tracks], boxes)
+                while True:
+                    ti, di = np.unravel_index(np.argmax(ious), ious.shape)
+                    if ious[ti, di] < self.iou_threshold:
+                        break
+                    assigned[di] = self.tracks[ti]
+                    ious[ti, :] = -1
+                    ious[:, di] = -1
+
+            result = []
+            for box, track in zip(boxes, assigned):
+                if track is None:
+                    track = FaceTrack(self._next_id, box, timestamp)
+                    self._next_id += 1
+                    self.tracks.append(track)
+                    self.tracks_started += 1
+                else:
+                    track.bbox = box
+                    track.last_seen = timestamp
+                    track.hits += 1
+                result.append((track, self._due(track, timestamp)))
+            for track, needs in result:
+                if needs:
+                    track.last_recognized = timestamp
+                    track.recognitions += 1
+                    self.recognitions += 1
+            return result
+
+    def carry_forward(self, timestamp):
+        """
+        Treat every live track as seen again, for frames skipped as unchanged
+
+        Args:
+            timestamp: Time of the skipped frame in seconds
+        """
+        with self._lock:
+            for track in self.tracks:
+                track.last_seen = max(track.last_seen, timestamp)
+
+    def vote(self, track, identity):
+        """
+        Record one recognition result for a track
+
+        Args:
+            track: Track returned by ``update``
+            identity: Recognized student identifier, or None if unknown
+        """
+        if identity is None:
+            return
+        with self._lock:
+            track.votes[identity] += 1
+
+    def identities(self):
+        """
+        Identities voted for by current and ended tracks
+
+        Returns:
+            set: Student identifiers
+        """
+        with self._lock:
+            current = {t.identity(self.min_votes) for t in self.tracks}
+            current.discard(None)
+            return self._ended | current
+
+    def stats(self):
+        """
+        Get tracking counters
+
+        Returns:
+            dict: Detections, recognitions, tracks and the share of detections recognized
+        """
+        with self._lock:
+            return {
+                'detections': self.detections,
+                'recognitions': self.recognitions,
+                'tracks_started': self.tracks_started,
+                'active_tracks': len(self.tracks),
+                'recognition_ratio': round(self.recognitions / self.detections, 4) if self.detections else None
+            }
+
+    def _due(self, track, timestamp):
+        if track.last_recognized is None or self.reverify_interval <= 0:
+            return True
+        interval = self.reverify_interval if track.identity(self.min_votes) else self.retry_interval
+        return timestamp - track.last_recognized >= interval
+
+    def _expire(self, timestamp):
+        live = []
+        for track in self.tracks:
+            if timestamp - track.last_seen > self.max_age:
+                identity = track.identity(self.min_votes)
+                if identity is not None:
+                    self._ended.add(identity)
+            else:
+                live.append(track)
+        self.tracks = live
+
+
+def track_and_recognize(face_service, tracker, frames, timestamps, gallery, tolerance, label):
+    """
+    Detect faces in frames, and recognize only the tracks that are due
+
+    Detection runs on every frame; the recognition model runs once, batched,
+    for the new or re-verified tracks of all frames, and each result is a
+    vote for its track.
+
+    Args:
+        face_service: FaceRecognitionService instance
+        tracker: FaceTracker holding the tracks of this video or session
+        frames: RGB frames in time order
+        timestamps: Frame times in seconds
+        gallery: Gallery to match against
+        tolerance: Distance threshold for matching
+        label: Callable turning gallery metadata into the identity to vote for
+
+    Returns:
+        list: Per frame, the tracks of the faces detected in it
+    """
+    per_frame = []
+    due = []
+    for frame, timestamp in zip(frames, timestamps):
+        faces = face_service.detect_faces(frame)
+        assignments = tracker.update([face.bbox for face in faces], timestamp)
+        per_frame.append([track for track, _ in assignments])
+        due.extend((frame, face, track) for face, (track, needs) in zip(faces, assignments) if needs)
+
+    if due:
+        face_service.embed_faces([(frame, face) for frame, face, _ in due])
+        embedded = [(face, track) for _, face, track in due if face.embedding is not None]
+        matches = match_embeddings([face.normed_embedding for face, _ in embedded], gallery.encodings,
+                                   gallery.metadata, tolerance, known_sq_norms=gallery.sq_norms)
+        for (_, track), match in zip(embedded, matches):
+            tracker.vote(track, label(match['metadata']) if match['metadata'] is not None else None)
+    return per_frame
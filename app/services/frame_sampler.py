@@ -0,0 +1,165 @@
+import math
+import os
+import time
+import cv2
+
+SEEK_MODES = ('auto', 'seek', 'grab')
+DEFAULT_FPS = 30.0
+
+
+class FrameSampler:
+    """
+    Pick the frames of a video worth running face recognition on
+
+    Frames are sampled on a fixed time stride (``sample_fps`` frames per
+    second of video), widened if needed so no more than ``max_frames`` are
+    returned. Frames between samples are skipped without being converted:
+    short strides advance with ``grab()``, long strides seek straight to
+    the next sample with ``CAP_PROP_POS_MSEC`` so the decoder restarts
+    from the nearest keyframe instead of decoding every frame in between.
+    """
+
+    def __init__(self, sample_fps=None, max_frames=None, seek_mode=None, seek_min_stride=None):
+        """
+        Args:
+            sample_fps: Frames to sample per second of video, 0 for every frame (uses env var if None)
+            max_frames: Upper bound on sampled frames per video, 0 for no bound (uses env var if None)
+            seek_mode: 'grab', 'seek' or 'auto' (uses env var if None)
+            seek_min_stride: Stride in seconds from which 'auto' seeks instead of grabbing (uses env var if None)
+        """
+        if sample_fps is None:
+            sample_fps = float(os.environ.get('VIDEO_SAMPLE_FPS', 2))
+        if max_frames is None:
+            max_frames = int(os.environ.get('VIDEO_MAX_FRAMES', 1800))
+        if seek_mode is None:
+            seek_mode = os.environ.get('VIDEO_SEEK_MODE', 'auto')
+        if seek_min_stride is None:
+            seek_min_stride = float(os.environ.get('VIDEO_SEEK_MIN_STRIDE_SECONDS', 1.0))
+        if seek_mode not in SEEK_MODES:
+            raise ValueError(f"seek_mode must be one of {SEEK_MODES}, got {seek_mode!r}")
+
+        self.sample_fps = sample_fps
+        self.max_frames = max_frames
+        self.seek_mode = seek_mode
+        self.seek_min_stride = seek_min_stride
+        self.stats = None
+
+    def plan(self, fps, frame_count):
+        """
+        Work out the sampling stride for a video
+
+        Args:
+            fps: Frame rate reported by the container (<= 0 if unknown)
+            frame_count: Frame count reported by the container (<= 0 if unknown)
+
+        Returns:
+            tuple: (stride in frames, whether to seek, expected sampled frames or None)
+        """
+        if not fps or fps <= 0 or math.isnan(fps):
+            fps = DEFAULT_FPS
+        stride = 1
+        if self.sample_fps and self.sample_fps > 0:
+            stride = max(1, int(round(fps / self.sample_fps)))
+        if self.max_frames and frame_count and frame_count > 0:
+            stride = max(stride, int(math.ceil(frame_count / self.max_frames)))
+
+        if self.seek_mode == 'auto':
+            use_seek = stride > 1 and stride / fps >= self.seek_min_stride
+        else:
+            use_seek = self.seek_mode == 'seek' and stride > 1
+
+        expected = None
+        if frame_count and frame_count > 0:
+            expected = int(math.ceil(frame_count / stride))
+            if self.max_frames:
+                expected = min(expected, self.max_frames)
+        return stride, use_seek, expected
+
+    def frames(self, capture, start_frame=0, end_frame=None):
+        """
+        Yield the sampled frames of an opened video
+
+        Samples sit on the same stride grid whatever the range, so splitting
+        a video into ranges yields exactly the frames of one full pass.
+        Sampling counters are available in ``stats`` while and after iterating.
+
+        Args:
+            capture: Opened ``cv2.VideoCapture``
+            start_frame: First frame of the range to sample
+            end_frame: Frame index the range stops before (None for the end of the video)
+
+        Yields:
+            tuple: (frame index, timestamp in ms, BGR frame)
+        """
+        fps = capture.get(cv2.CAP_PROP_FPS)
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        stride, use_seek, expected = self.plan(fps, frame_count)
+        if not fps or fps <= 0 or math.isnan(fps):
+            fps = DEFAULT_FPS
+
+        stats = {
+            'video_fps': fps,
+            'frame_count': frame_count if frame_count > 0 else None,
+            'stride_frames': stride,
+            'seek': use_seek,
+            'frames_expected': expected,
+            'frames_sampled': 0,
+            'frames_grabbed': 0,
+            'seeks': 0,
+            'decode_seconds': 0.0,
+            'last_frame_index': None
+        }
+        self.stats = stats
+
+        position = 0  # index of the next frame the capture will return
+        target = int(math.ceil(start_frame / stride)) * stride
+        while not self.max_frames or stats['frames_sampled'] < self.max_frames:
+            if frame_count > 0 and target >= frame_count:
+                break
+            if end_frame is not None and target >= end_frame:
+                break
+            start = time.perf_counter()
+            # Always seek to the start of a range; grabbing up to it would decode everything before it
+            if target > position and (use_seek or position == 0):
+                if capture.set(cv2.CAP_PROP_POS_MSEC, target * 1000.0 / fps):
+                    stats['seeks'] += 1
+                    position = target
+                elif use_seek:
+                    # Backend can't seek; fall back to grabbing for the rest of the video
+                    use_seek = False
+                    stats['seek'] = False
+            ok = True
+            while ok and position < target:
+                ok = capture.grab()
+                position += 1
+                stats['frames_grabbed'] += 1
+            if ok:
+                ok, frame = capture.read()
+            stats['decode_seconds'] += time.perf_counter() - start
+            if not ok:
+                break
+            position += 1
+            stats['frames_sampled'] += 1
+            stats['last_frame_index'] = target
+            yield target, target * 1000.0 / fps, frame
+            target += stride
+
+    def report(self):
+        """
+        Summarize the last sampling run
+
+        Returns:
+            dict: Sampling counters plus the achieved sampling rate and the
+            decode cost per sampled frame
+        """
+        if self.stats is None:
+            return None
+        stats = dict(self.stats)
+        sampled = stats['frames_sampled']
+        covered = stats['frame_count'] or ((stats['last_frame_index'] or 0) + 1)
+        duration = covered / stats['video_fps']
+        stats['duration_seconds'] = round(duration, 3)
+        stats['sample_fps_achieved'] = round(sampled / duration, 3) if duration > 0 else None
+        stats['decode_ms_per_sample'] = round(stats['decode_seconds'] * 1000 / sampled, 3) if sampled else None
+        stats['decode_seconds'] = round(stats['decode_seconds'], 4)
+        return stats
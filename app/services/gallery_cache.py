@@ -0,0 +1,186 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+from .face_matcher import squared_norms
+from .embedding_store import EmbeddingStore
+
+EMBEDDING_DIM = 512
+
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+class Gallery:
+    """Known face encodings and metadata for one class, ready for matching"""
+
+    def __init__(self, class_id, encodings, metadata, signature=None):
+        """
+        Args:
+            class_id: Class identifier (``{branch}_{semester}``)
+            encodings: Sequence or matrix of face encodings
+            metadata: List of metadata dicts, one per encoding
+            signature: File signature the gallery was loaded from
+        """
+        self.class_id = class_id
+        if len(encodings) == 0:
+            self.encodings = np.zeros((0, EMBEDDING_DIM), dtype=np.float32)
+        else:
+            self.encodings = np.ascontiguousarray(np.asarray(encodings, dtype=np.float32))
+        self.metadata = list(metadata)
+        self.signature = signature
+        self.sq_norms = squared_norms(self.encodings)
+        self.nbytes = self.encodings.nbytes + self.sq_norms.nbytes
+
+    def __len__(self):
+        return len(self.metadata)
+
+
+class GalleryCache:
+    """
+    Per-process LRU cache of class galleries
+
+    Entries are revalidated against the store's sidecar signature at most
+    once every ``revalidate_interval`` seconds, so a live session only touches
+    the disk when the gallery actually changes. Writers in this process should
+    call ``invalidate`` so their own changes are picked up immediately.
+    """
+
+    def __init__(self, split_dir, max_bytes=None, revalidate_interval=None):
+        """
+        Args:
+            split_dir: Directory holding the per-class encoding files
+            max_bytes: Memory budget for cached encodings (uses env var if None)
+            revalidate_interval: Seconds between file checks (uses env var if None)
+        """
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get('GALLERY_CACHE_MAX_MB', 256)) * 1024 * 1024)
+        if revalidate_interval is None:
+            revalidate_interval = float(os.environ.get('GALLERY_CACHE_REVALIDATE_SECONDS', 2.0))
+
+        self.split_dir = split_dir
+        self.store = EmbeddingStore(split_dir)
+        self.max_bytes = max_bytes
+        self.revalidate_interval = revalidate_interval
+        self._entries = OrderedDict()  # class_id -> (gallery, last_checked)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _load(self, class_id, signature):
+        encodings, metadata = self.store.load(class_id)
+        if metadata is None:
+            return None
+        return Gallery(class_id, encodings, metadata, signature)
+
+    def get(self, class_id):
+        """
+        Get the gallery for a class, loading it on a miss
+
+        Args:
+            class_id: Class identifier
+
+        Returns:
+            Gallery or None if the class has no encoding file
+
+        Raises:
+            ModuleNotFoundError, ImportError, ValueError: if a legacy pickle
+            cannot be read with the installed numpy version
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(class_id)
+            if entry is not None and now - entry[1] < self.revalidate_interval:
+                self._entries.move_to_end(class_id)
+                self.hits += 1
+                return entry[0]
+
+        signature = self.store.signature(class_id)
+        with self._lock:
+            entry = self._entries.get(class_id)
+            if entry is not None and signature is not None and entry[0].signature == signature:
+                self._entries[class_id] = (entry[0], now)
+                self._entries.move_to_end(class_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            if entry is not None:
+                self._remove(class_id)
+
+        if signature is None:
+            return None
+
+        gallery = self._load(class_id, signature)
+        if gallery is None:
+            return None
+        with self._lock:
+            if class_id in self._entries:
+                self._remove(class_id)
+            self._entries[class_id] = (gallery, now)
+            self._bytes += gallery.nbytes
+            self._evict()
+        return gallery
+
+    def invalidate(self, class_id=None):
+        """
+        Drop a cached gallery so the next ``get`` reloads it
+
+        Args:
+            class_id: Class to drop, or None to clear the whole cache
+        """
+        with self._lock:
+            if class_id is None:
+                self._entries.clear()
+                self._bytes = 0
+            elif class_id in self._entries:
+                self._remove(class_id)
+
+    def stats(self):
+        """
+        Get cache counters
+
+        Returns:
+            dict: Hits, misses, evictions, entry count and cached bytes
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes
+            }
+
+    def _remove(self, class_id):
+        gallery, _ = self._entries.pop(class_id)
+        self._bytes -= gallery.nbytes
+
+    def _evict(self):
+        # Always keep the most recently used entry, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            class_id = next(iter(self._entries))
+            self._remove(class_id)
+            self.evictions += 1
+
+
+def get_gallery_cache(split_dir):
+    """
+    Get the process-wide gallery cache for an encodings directory
+
+    Args:
+        split_dir: Directory holding the per-class encoding files
+
+    Returns:
+        GalleryCache: Shared cache instance
+    """
+    key = os.path.abspath(split_dir)
+    with _caches_lock:
+        cache = _caches.get(key)
+        if cache is None:
+            cache = GalleryCache(split_dir)
+            _caches[key] = cache
+        return cache
@@ -0,0 +1,102 @@
+import os
+import threading
+
+
+class LiveFrameChannel:
+    """
+    Latest-frame buffer between a WebSocket and the frame processing loop
+
+    A reader thread receives messages from the socket as fast as the client
+    sends them and keeps only the newest binary frame in a single slot.
+    The processing loop takes frames with ``next_frame``; a frame that is
+    replaced before it was taken is dropped, so a slow model never builds a
+    backlog and results always describe the latest view of the classroom.
+    A text message ``stop`` closes the channel.
+    """
+
+    def __init__(self, ws, idle_timeout=None):
+        """
+        Args:
+            ws: WebSocket with ``receive(timeout)`` (e.g. a flask-sock connection)
+            idle_timeout: Seconds without a frame before the channel closes (uses env var if None)
+        """
+        if idle_timeout is None:
+            idle_timeout = float(os.environ.get('LIVE_WS_IDLE_SECONDS', 60))
+        self.ws = ws
+        self.idle_timeout = idle_timeout
+        self._frame = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = None
+        self.received = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def start(self):
+        """Start the reader thread"""
+        self._thread = threading.Thread(target=self._read, name='live-ws-reader', daemon=True)
+        self._thread.start()
+
+    def put(self, data):
+        """
+        Offer a frame, replacing one that was not taken yet
+
+        Args:
+            data: Encoded frame bytes
+        """
+        with self._cond:
+            self.received += 1
+            if self._frame is not None:
+                self.dropped += 1
+            self._frame = data
+            self._cond.notify()
+
+    def next_frame(self):
+        """
+        Wait for the newest frame
+
+        Returns:
+            bytes: Encoded frame, or None once the channel is closed or idle
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._frame is not None or self._closed, self.idle_timeout):
+                self._closed = True
+            if self._frame is None:
+                return None
+            data, self._frame = self._frame, None
+            self.processed += 1
+            return data
+
+    def close(self):
+        """Close the channel and wake the processing loop"""
+        with self._cond:
+            self._closed = True
+            self._frame = None
+            self._cond.notify_all()
+
+    def stats(self):
+        """
+        Get channel counters
+
+        Returns:
+            dict: Frames received, processed and dropped
+        """
+        with self._cond:
+            return {'received': self.received, 'processed': self.processed, 'dropped': self.dropped}
+
+    def _read(self):
+        try:
+            while not self._closed:
+                message = self.ws.receive(timeout=1)
+                if message is None:
+                    continue
+                if isinstance(message, str):
+                    if message.strip().lower() == 'stop':
+                        break
+                    continue
+                self.put(message)
+        except Exception:
+            # Connection closed by the client or the network
+            pass
+        finally:
+            self.close()
@@ -0,0 +1,132 @@
+import json
+import os
+import threading
+from collections import deque
+
+
+class SessionEvents:
+    """
+    Change log of one live session, for Server-Sent Events streams
+
+    Every change (new students, model verified, session end) is appended
+    with an increasing id. Streams wait on the log's own condition rather
+    than the global session lock, and a reconnecting client resumes from
+    its ``Last-Event-ID``. Only the newest ``max_events`` are kept; a client
+    that fell further behind gets a snapshot instead.
+    """
+
+    def __init__(self, max_events=None):
+        """
+        Args:
+            max_events: Events kept for resuming streams (uses env var if None)
+        """
+        if max_events is None:
+            max_events = int(os.environ.get('LIVE_EVENTS_BUFFER', 256))
+        self._events = deque(maxlen=max(1, max_events))
+        self._last_id = 0
+        self._closed = False
+        self._cond = threading.Condition()
+
+    @property
+    def last_id(self):
+        with self._cond:
+            return self._last_id
+
+    @property
+    def closed(self):
+        with self._cond:
+            return self._closed
+
+    def publish(self, event, data):
+        """
+        Append an event and wake waiting streams
+
+        Args:
+            event: Event name
+            data: JSON-serializable payload
+
+        Returns:
+            int: Id of the new event
+        """
+        with self._cond:
+            self._last_id += 1
+            self._events.append((self._last_id, event, data))
+            self._cond.notify_all()
+            return self._last_id
+
+    def close(self, data=None):
+        """
+        Publish the final ``end`` event; streams stop after sending it
+
+        Args:
+            data: JSON-serializable payload of the end event
+        """
+        with self._cond:
+            if self._closed:
+                return
+            self.publish('end', data or {})
+            self._closed = True
+
+    def since(self, last_id):
+        """
+        Events after an id
+
+        Args:
+            last_id: Id of the last event the client has seen
+
+        Returns:
+            list: ``(id, event, data)`` tuples, or None if the client cannot
+            resume from ``last_id`` (events were dropped or the id is unknown)
+        """
+        with self._cond:
+            return events_since(self._events, self._last_id, last_id)
+
+    def wait(self, last_id, timeout):
+        """
+        Wait for events after an id
+
+        Args:
+            last_id: Id of the last event the client has seen
+            timeout: Seconds to wait
+
+        Returns:
+            list: New events (empty on timeout), or None as for ``since``
+        """
+        with self._cond:
+            self._cond.wait_for(lambda: self._last_id != last_id or self._closed, timeout)
+            return self.since(last_id)
+
+
+def events_since(events, newest_id, last_id):
+    """
+    Select the events a client has not seen from a retained window
+
+    Args:
+        events: Retained ``(id, event, data)`` tuples, oldest first
+        newest_id: Id of the newest event ever published
+        last_id: Id of the last event the client has seen
+
+    Returns:
+        list: Events after ``last_id``, or None if the client cannot resume
+        (events it missed were dropped, or the id is unknown)
+    """
+    if last_id > newest_id:
+        return None
+    if last_id < newest_id and (not events or events[0][0] > last_id + 1):
+        return None
+    return [item for item in events if item[0] > last_id]
+
+
+def format_sse(event_id, event, data):
+    """
+    Encode one Server-Sent Event
+
+    Args:
+        event_id: Event id, sent back by the browser as ``Last-Event-ID``
+        event: Event name
+        data: JSON-serializable payload
+
+    Returns:
+        str: The event in ``text/event-stream`` format
+    """
+    return f"id: {event_id}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
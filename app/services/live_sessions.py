@@ -0,0 +1,700 @@
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from .live_events import SessionEvents, events_since
+
+
+def _gating(frames, skipped):
+    return {
+        'frames': frames,
+        'skipped': skipped,
+        'skip_ratio': round(skipped / frames, 4) if frames else None
+    }
+
+
+def _frame_result(known, recognized, was_verified, skipped, frames, skipped_count):
+    new_students = set(recognized) - known
+    return {
+        'new_students': new_students,
+        'total_recognized': len(known) + len(new_students),
+        'model_verified': was_verified or not skipped,
+        'newly_verified': not was_verified and not skipped,
+        'gating': _gating(frames, skipped_count)
+    }
+
+
+class TimingWindow:
+    """Durations of the most recent runs of one operation"""
+
+    def __init__(self, size=1024):
+        self._durations = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def add(self, seconds):
+        """Record one duration in seconds"""
+        with self._lock:
+            self._durations.append(seconds)
+            self.count += 1
+
+    def stats(self):
+        """
+        Summarize the recorded durations
+
+        Returns:
+            dict: Total count, and mean, 95th percentile and max in milliseconds
+            over the recent window (None while nothing was recorded)
+        """
+        with self._lock:
+            durations = sorted(self._durations)
+            count = self.count
+        if not durations:
+            return {'count': count, 'mean_ms': None, 'p95_ms': None, 'max_ms': None}
+        return {
+            'count': count,
+            'mean_ms': round(sum(durations) / len(durations) * 1000, 3),
+            'p95_ms': round(durations[min(len(durations) - 1, int(len(durations) * 0.95))] * 1000, 3),
+            'max_ms': round(durations[-1] * 1000, 3)
+        }
+
+
+class SessionStore:
+    """
+    Base class of live attendance session backends
+
+    A session's shared state (owner, class, recognized students, counters)
+    lives in the backend. Objects that only make sense inside one process,
+    such as the face tracker and change detector, are kept per process in
+    ``runtime``, guarded by a per-session lock.
+    """
+
+    def __init__(self):
+        self._runtime = {}
+        self._runtime_lock = threading.Lock()
+
+    def runtime(self, session_id):
+        """
+        Get this process's working objects for a session
+
+        Args:
+            session_id: Live session identifier
+
+        Returns:
+            dict: Per-process state, with a ``lock`` serializing its use
+        """
+        with self._runtime_lock:
+            state = self._runtime.get(session_id)
+            if state is None:
+                state = {'lock': threading.Lock()}
+                self._runtime[session_id] = state
+            return state
+
+    def drop_runtime(self, session_id):
+        """Forget this process's working objects for a session"""
+        with self._runtime_lock:
+            self._runtime.pop(session_id, None)
+
+    def prune_runtime(self):
+        """
+        Forget working objects of sessions that ended, possibly in another process
+
+        Returns:
+            int: Number of sessions whose working objects were dropped
+        """
+        with self._runtime_lock:
+            session_ids = list(self._runtime)
+        ended = [sid for sid in session_ids if not (self.get(sid) or {}).get('is_active')]
+        for session_id in ended:
+            self.drop_runtime(session_id)
+        return len(ended)
+
+    def _new_session(self, session_id, faculty_email, class_id, lecture):
+        now = time.time()
+        return {
+            'session_id': session_id,
+            'faculty_email': faculty_email,
+            'class_id': class_id,
+            'lecture': lecture,
+            'recognized_students': set(),
+            'is_active': True,
+            'start_time': now,
+            'last_activity': now,
+            'model_verified': False,
+            'frames': 0,
+            'skipped': 0
+        }
+
+
+class _MemorySession:
+    def __init__(self, data, max_events):
+        self.data = data
+        self.lock = threading.Lock()
+        self.events = SessionEvents(max_events)
+
+
+class MemorySessionStore(SessionStore):
+    """
+    Sessions in a dict of this process
+
+    Fine for development and single-worker deployments; with several
+    gunicorn workers a request can reach a worker that never saw the session.
+    Each session has its own lock, so frames of one classroom never wait for
+    another.
+    """
+
+    def __init__(self, max_events=None):
+        """
+        Args:
+            max_events: Events kept per session for resuming streams (uses env var if None)
+        """
+        super().__init__()
+        self.max_events = max_events
+        self._sessions = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def create(self, session_id, faculty_email, class_id, lecture=None):
+        """
+        Start tracking a session
+
+        Args:
+            session_id: Live session identifier
+            faculty_email: Faculty owning the session
+            class_id: Class the session takes attendance for
+            lecture: Date, subject, section and classroom the attendance is saved under
+
+        Returns:
+            dict: The new session
+        """
+        entry = _MemorySession(self._new_session(session_id, faculty_email, class_id, lecture), self.max_events)
+        with self._lock:
+            self._sessions[session_id] = entry
+        return self.get(session_id)
+
+    def get(self, session_id):
+        """
+        Get a copy of a session
+
+        Args:
+            session_id: Live session identifier
+
+        Returns:
+            dict: Session fields including ``gating`` counters, or None if
+            there is no such session
+        """
+        entry = self._entry(session_id)
+        if entry is None:
+            return None
+        with entry.lock:
+            data = dict(entry.data)
+            data['recognized_students'] = set(data['recognized_students'])
+        data['gating'] = _gating(data['frames'], data['skipped'])
+        return data
+
+    def record_frame(self, session_id, recognized, skipped):
+        """
+        Add a frame's recognitions to a session in one atomic step
+
+        Args:
+            session_id: Live session identifier
+            recognized: Student identifiers recognized in the frame
+            skipped: Whether the frame was skipped by change gating
+
+        Returns:
+            dict: ``new_students``, ``total_recognized``, ``model_verified``,
+            ``newly_verified`` and ``gating`` counters, or None if the session
+            is missing or no longer active
+        """
+        entry = self._entry(session_id)
+        if entry is None:
+            return None
+        with entry.lock:
+            data = entry.data
+            if not data['is_active']:
+                return None
+            result = _frame_result(data['recognized_students'], recognized, data['model_verified'], skipped,
+                                   data['frames'] + 1, data['skipped'] + int(skipped))
+            data['recognized_students'].update(result['new_students'])
+            data['model_verified'] = result['model_verified']
+            data['frames'] += 1
+            data['skipped'] += int(skipped)
+            data['last_activity'] = time.time()
+            return result
+
+    def deactivate(self, session_id):
+        """
+        Mark a session inactive, once
+
+        Args:
+            session_id: Live session identifier
+
+        Returns:
+            dict: The session as it was, or None if it is missing or already inactive
+        """
+        entry = self._entry(session_id)
+        if entry is None:
+            return None
+        with entry.lock:
+            if not entry.data['is_active']:
+                return None
+            data = dict(entry.data)
+            data['recognized_students'] = set(data['recognized_students'])
+            entry.data['is_active'] = False
+        data['gating'] = _gating(data['frames'], data['skipped'])
+        return data
+
+    def delete(self, session_id):
+        """Remove a session"""
+        with self._lock:
+            self._sessions.pop(session_id, None)
+        self.drop_runtime(session_id)
+
+    def events(self, session_id):
+        """
+        Get the change log of a session
+
+        Args:
+            session_id: Live session identifier
+
+        Returns:
+            SessionEvents: Event log, or None if there is no such session
+        """
+        entry = self._entry(session_id)
+        return entry.events if entry is not None else None
+
+    def count(self):
+        """
+        Returns:
+            int: Number of active sessions
+        """
+        with self._lock:
+            entries = list(self._sessions.values())
+        return sum(1 for entry in entries if entry.data['is_active'])
+
+    def expired(self, idle_seconds, max_seconds, now=None):
+        """
+        Find active sessions past their idle or absolute lifetime
+
+        Args:
+            idle_seconds: Seconds without frames after which a session expires
+            max_seconds: Seconds after its start at which a session expires
+            now: Current time as returned by ``time.time()`` (defaults to now)
+
+        Returns:
+            list: Identifiers of expired sessions
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entries = list(self._sessions.items())
+        result = []
+        for session_id, entry in entries:
+            with entry.lock:
+                data = entry.data
+                if data['is_active'] and (now - data['last_activity'] > idle_seconds
+                                          or now - data['start_time'] > max_seconds):
+                    result.append(session_id)
+        return result
+
+
+class MongoSessionEvents:
+    """
+    Change log of one live session kept in its MongoDB document
+
+    Same interface as ``SessionEvents``. Events are appended with an
+    aggregation-pipeline update, so ids stay ordered across workers;
+    ``wait`` polls the document every ``poll_interval`` seconds.
+    """
+
+    def __init__(self, collection, session_id, poll_interval, max_events):
+        self.collection = collection
+        self.session_id = session_id
+        self.poll_interval = poll_interval
+        self.max_events = max_events
+
+    def _load(self):
+        return self.collection.find_one({'_id': self.session_id},
+                                        {'last_event_id': 1, 'events': 1, 'events_closed': 1})
+
+    @property
+    def last_id(self):
+        doc = self._load()
+        return doc.get('last_event_id', 0) if doc else 0
+
+    @property
+    def closed(self):
+        doc = self._load()
+        return doc is None or doc.get('events_closed', False)
+
+    def _append(self, event, data, extra=None):
+        stages = [
+            {'$set': {'last_event_id': {'$add': [{'$ifNull': ['$last_event_id', 0]}, 1]}}},
+            {'$set': {'events': {'$slice': [
+                {'$concatArrays': [{'$ifNull': ['$events', []]}, [
+                    {'id': '$last_event_id', 'event': {'$literal': event}, 'data': {'$literal': data}}
+                ]]},
+                -self.max_events
+            ]}}}
+        ]
+        if extra:
+            stages.append({'$set': extra})
+        doc = self.collection.find_one_and_update({'_id': self.session_id, 'events_closed': {'$ne': True}},
+                                                  stages, projection={'last_event_id': 1},
+                                                  return_document=ReturnDocument.AFTER)
+        return doc['last_event_id'] if doc else None
+
+    def publish(self, event, data):
+        """
+        Append an event
+
+        Args:
+            event: Event name
+            data: JSON-serializable payload
+
+        Returns:
+            int: Id of the new event, or None if the log is closed
+        """
+        return self._append(event, data)
+
+    def close(self, data=None):
+        """Publish the final ``end`` event"""
+        self._append('end', data or {}, {'events_closed': True})
+
+    def _since(self, doc, last_id):
+        if doc is None:
+            return []
+        events = [(item['id'], item['event'], item['data']) for item in doc.get('events', [])]
+        return events_since(events, doc.get('last_event_id', 0), last_id)
+
+    def since(self, last_id):
+        """Events after an id; see ``SessionEvents.since``"""
+        return self._since(self._load(), last_id)
+
+    def wait(self, last_id, timeout):
+        """Wait for events after an id; see ``SessionEvents.wait``"""
+        deadline = time.monotonic() + timeout
+        while True:
+            doc = self._load()
+            pending = self._since(doc, last_id)
+            remaining = deadline - time.monotonic()
+            if pending is None or pending or doc is None or doc.get('events_closed') or remaining <= 0:
+                return pending
+            time.sleep(min(self.poll_interval, remaining))
+
+
+class MongoSessionStore(SessionStore):
+    """
+    Sessions shared by all workers and nodes through a MongoDB collection
+
+    Each session is one document. Recognized students are merged with
+    ``$addToSet``/``$each`` and counters with ``$inc`` in a single
+    ``find_one_and_update`` per frame, so concurrent frames on different
+    workers never lose updates and no cross-process lock is needed. Deleted
+    sessions linger for ``grace_seconds`` (removed by the TTL index in
+    ``db/indexes.py``) so event streams on other workers can still deliver
+    the final ``end`` event.
+    """
+
+    def __init__(self, collection, poll_interval=None, max_events=None, grace_seconds=None):
+        """
+        Args:
+            collection: pymongo collection holding the sessions
+            poll_interval: Seconds between event-log checks of waiting streams (uses env var if None)
+            max_events: Events kept per session for resuming streams (uses env var if None)
+            grace_seconds: Seconds a deleted session is kept for event streams (uses env var if None)
+        """
+        super().__init__()
+        if poll_interval is None:
+            poll_interval = float(os.environ.get('LIVE_SESSION_POLL_SECONDS', 0.5))
+        if max_events is None:
+            max_events = int(os.environ.get('LIVE_EVENTS_BUFFER', 256))
+        if grace_seconds is None:
+            grace_seconds = float(os.environ.get('LIVE_SESSION_GRACE_SECONDS', 60))
+        self.collection = collection
+        self.poll_interval = poll_interval
+        self.max_events = max(1, max_events)
+        self.grace_seconds = grace_seconds
+
+    def _to_session(self, doc):
+        if doc is None:
+            return None
+        return {
+            'session_id': doc['_id'],
+            'faculty_email': doc['faculty_email'],
+            'class_id': doc['class_id'],
+            'lecture': doc.get('lecture'),
+            'recognized_students': set(doc.get('recognized_students', [])),
+            'is_active': doc['is_active'],
+            'start_time': doc['start_time'],
+            'last_activity': doc.get('last_activity', doc['start_time']),
+            'model_verified': doc.get('model_verified', False),
+            'frames': doc.get('frames', 0),
+            'skipped': doc.get('skipped', 0),
+            'gating': _gating(doc.get('frames', 0), doc.get('skipped', 0))
+        }
+
+    def create(self, session_id, faculty_email, class_id, lecture=None):
+        """Start tracking a session; see ``MemorySessionStore.create``"""
+        doc = self._new_session(session_id, faculty_email, class_id, lecture)
+        doc['_id'] = doc.pop('session_id')
+        doc['recognized_students'] = []
+        doc.update({'last_event_id': 0, 'events': [], 'events_closed': False})
+        self.collection.insert_one(doc)
+        return self._to_session(doc)
+
+    def get(self, session_id):
+        """Get a session; see ``MemorySessionStore.get``"""
+        return self._to_session(self.collection.find_one({'_id': session_id, 'expires_at': {'$exists': False}},
+                                                         {'events': 0}))
+
+    def record_frame(self, session_id, recognized, skipped):
+        """Add a frame's recognitions atomically; see ``MemorySessionStore.record_frame``"""
+        update = {'$inc': {'frames': 1, 'skipped': int(skipped)}, '$set': {'last_activity': time.time()}}
+        if recognized:
+            update['$addToSet'] = {'recognized_students': {'$each': sorted(recognized)}}
+        if not skipped:
+            update['$set']['model_verified'] = True
+        before = self.collection.find_one_and_update(
+            {'_id': session_id, 'is_active': True}, update,
+            projection={'recognized_students': 1, 'model_verified': 1, 'frames': 1, 'skipped': 1},
+            return_document=ReturnDocument.BEFORE)
+        if before is None:
+            return None
+        return _frame_result(set(before.get('recognized_students', [])), recognized,
+                             before.get('model_verified', False), skipped,
+                             before.get('frames', 0) + 1, before.get('skipped', 0) + int(skipped))
+
+    def deactivate(self, session_id):
+        """Mark a session inactive, once; see ``MemorySessionStore.deactivate``"""
+        return self._to_session(self.collection.find_one_and_update(
+            {'_id': session_id, 'is_active': True}, {'$set': {'is_active': False}},
+            projection={'events': 0}, return_document=ReturnDocument.BEFORE))
+
+    def delete(self, session_id):
+        """Remove a session after the grace period"""
+        expires_at = datetime.utcnow() + timedelta(seconds=self.grace_seconds)
+        self.collection.update_one({'_id': session_id}, {'$set': {'is_active': False, 'expires_at': expires_at}})
+        self.drop_runtime(session_id)
+
+    def events(self, session_id):
+        """Get the change log of a session; see ``MemorySessionStore.events``"""
+        return MongoSessionEvents(self.collection, session_id, self.poll_interval, self.max_events)
+
+    def count(self):
+        """
+        Returns:
+            int: Number of active sessions
+        """
+        return self.collection.count_documents({'is_active': True})
+
+    def expired(self, idle_seconds, max_seconds, now=None):
+        """Find active sessions past their lifetime; see ``MemorySessionStore.expired``"""
+        now = time.time() if now is None else now
+        cursor = self.collection.find({
+            'is_active': True,
+            '$or': [{'last_activity': {'$lt': now - idle_seconds}}, {'start_time': {'$lt': now - max_seconds}}]
+        }, {'_id': 1})
+        return [doc['_id'] for doc in cursor]
+
+
+class SessionReaper:
+    """
+    Background expiry of live sessions that were never stopped
+
+    A session expires when no frame arrived for ``idle_seconds`` (the tab
+    was closed or the camera stopped) or ``max_seconds`` after it started.
+    Every ``interval`` seconds expired sessions are claimed with
+    ``deactivate``, so with several workers each one is handled exactly
+    once, then saved through ``commit`` or dropped depending on ``policy``.
+    The sweep also drops this worker's tracker and change detector for
+    sessions that ended elsewhere.
+    """
+
+    POLICIES = ('commit', 'discard')
+
+    def __init__(self, store, commit, idle_seconds=None, max_seconds=None, interval=None, policy=None):
+        """
+        Args:
+            store: SessionStore to sweep
+            commit: Callable saving an expired session's attendance, given the
+                session data; raises if it cannot be saved
+            idle_seconds: Seconds without frames before a session expires (uses env var if None)
+            max_seconds: Longest lifetime of a session in seconds (uses env var if None)
+            interval: Seconds between sweeps (uses env var if None)
+            policy: ``commit`` to save expired sessions' attendance or ``discard``
+                to drop it (uses env var if None)
+        """
+        if idle_seconds is None:
+            idle_seconds = float(os.environ.get('LIVE_SESSION_IDLE_SECONDS', 600))
+        if max_seconds is None:
+            max_seconds = float(os.environ.get('LIVE_SESSION_MAX_SECONDS', 4 * 3600))
+        if interval is None:
+            interval = float(os.environ.get('LIVE_SESSION_REAP_SECONDS', 30))
+        if policy is None:
+            policy = os.environ.get('LIVE_SESSION_EXPIRY_POLICY', 'commit').lower()
+        if policy not in self.POLICIES:
+            raise ValueError(f"Unknown LIVE_SESSION_EXPIRY_POLICY: {policy}")
+
+        self.store = store
+        self.commit = commit
+        self.idle_seconds = idle_seconds
+        self.max_seconds = max_seconds
+        self.interval = interval
+        self.policy = policy
+        self.expired = 0
+        self.committed = 0
+        self.discarded = 0
+        self.commit_failed = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Start sweeping in a daemon thread, once"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='live-session-reaper', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        """Stop the sweeping thread"""
+        self._stop.set()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.reap()
+            except Exception as e:
+                print(f"Live session sweep failed: {e}")
+
+    def reap(self, now=None):
+        """
+        Expire the sessions past their lifetime, and prune ended sessions' working objects
+
+        Args:
+            now: Current time as returned by ``time.time()`` (defaults to now)
+
+        Returns:
+            list: Identifiers of the sessions this call expired
+        """
+        now = time.time() if now is None else now
+        reaped = []
+        for session_id in self.store.expired(self.idle_seconds, self.max_seconds, now):
+            session_data = self.store.deactivate(session_id)
+            if session_data is None:
+                continue  # stopped meanwhile, or claimed by another worker
+            reason = 'idle' if now - session_data['last_activity'] > self.idle_seconds else 'max_age'
+            saved = False
+            if self.policy == 'commit':
+                try:
+                    self.commit(session_data)
+                    saved = True
+                except Exception as e:
+                    print(f"Error saving expired live session {session_id}: {e}")
+            events = self.store.events(session_id)
+            if events is not None:
+                events.close({'saved': saved, 'count': len(session_data['recognized_students']),
+                              'expired': reason})
+            self.store.delete(session_id)
+            if saved:
+                outcome = 'committed'
+            else:
+                outcome = 'commit_failed' if self.policy == 'commit' else 'discarded'
+            with self._lock:
+                self.expired += 1
+                setattr(self, outcome, getattr(self, outcome) + 1)
+            print(f"Expired live session {session_id} ({reason}): {outcome.replace('_', ' ')}")
+            reaped.append(session_id)
+        self.store.prune_runtime()
+        return reaped
+
+    def stats(self):
+        """
+        Get session counters
+
+        Returns:
+            dict: Active sessions, and sessions this worker expired, committed,
+            discarded or failed to commit
+        """
+        with self._lock:
+            return {
+                'active': self.store.count(),
+                'expired': self.expired,
+                'committed': self.committed,
+                'discarded': self.discarded,
+                'commit_failed': self.commit_failed,
+                'policy': self.policy,
+                'idle_seconds': self.idle_seconds,
+                'max_seconds': self.max_seconds
+            }
+
+
+_store = None
+_store_lock = threading.Lock()
+_reaper = None
+
+
+def _configured_workers():
+    """Number of server worker processes the launch scripts configured"""
+    try:
+        return int(os.environ.get('GUNICORN_WORKERS') or os.environ.get('WEB_CONCURRENCY') or 1)
+    except ValueError:
+        return 1
+
+
+def get_session_store():
+    """
+    Get the process-wide live session store
+
+    ``LIVE_SESSION_STORE`` selects the backend: ``memory`` or ``mongo``,
+    which keeps sessions in the ``live_sessions`` collection so every worker
+    and node sees them. It defaults to ``mongo`` when ``GUNICORN_WORKERS``
+    (or ``WEB_CONCURRENCY``) asks for more than one worker, ``memory`` otherwise.
+
+    Returns:
+        SessionStore: Shared store instance
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            workers = _configured_workers()
+            default = 'mongo' if workers > 1 else 'memory'
+            backend = os.environ.get('LIVE_SESSION_STORE', default).lower()
+            if backend == 'mongo':
+                from ..db.mongo_client import get_collections
+                _store = MongoSessionStore(get_collections()['live_sessions'])
+            elif backend == 'memory':
+                if workers > 1:
+                    print(f"Warning: live sessions are kept in memory with {workers} workers; frames and "
+                          f"stop requests reaching another worker will not find the session. "
+                          f"Set LIVE_SESSION_STORE=mongo.")
+                _store = MemorySessionStore()
+            else:
+                raise ValueError(f"Unknown LIVE_SESSION_STORE backend: {backend}")
+        return _store
+
+
+def get_session_reaper(commit=None):
+    """
+    Get the process-wide session reaper of the shared store
+
+    Args:
+        commit: Callable saving an expired session's attendance; required
+            the first time
+
+    Returns:
+        SessionReaper: Shared reaper instance (not started)
+    """
+    global _reaper
+    store = get_session_store()
+    with _store_lock:
+        if _reaper is None:
+            if commit is None:
+                raise ValueError("The session reaper needs a commit callable")
+            _reaper = SessionReaper(store, commit)
+        return _reaper
@@ -0,0 +1,492 @@
+import math
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import contextmanager
+import cv2
+from .face_recognition import FaceRecognitionService, get_face_service
+from .change_detector import ChangeDetector
+from .face_tracker import FaceTracker, track_and_recognize
+from .frame_sampler import DEFAULT_FPS, FrameSampler
+from .gallery_cache import get_gallery_cache
+from .video_pipeline import FramePipeline
+
+try:
+    import fcntl
+except ImportError:  # Windows dev machines: fall back to in-process locking only
+    fcntl = None
+
+_budget_lock = threading.Lock()
+_video_service = None
+_video_service_lock = threading.Lock()
+
+
+def _student_label(metadata):
+    return metadata.get('roll_no') or metadata.get('name')
+
+
+class EarlyStopPolicy:
+    """
+    Decide when processing a video can stop before its end
+
+    Processing stops once every student on the roster has been recognized,
+    or once ``idle_seconds`` of video have passed without a new identity
+    after at least ``min_coverage`` of the video was processed.
+    """
+
+    def __init__(self, roster, idle_seconds=None, min_coverage=None, enabled=None):
+        """
+        Args:
+            roster: Identifiers of every student in the class gallery
+            idle_seconds: Seconds of video without a new identity before stopping, 0 to
+                disable the idle rule (uses env var if None)
+            min_coverage: Fraction of the video to process before the idle rule applies (uses env var if None)
+            enabled: Whether to stop early at all (uses env var if None)
+        """
+        if idle_seconds is None:
+            idle_seconds = float(os.environ.get('VIDEO_EARLY_STOP_IDLE_SECONDS', 120))
+        if min_coverage is None:
+            min_coverage = float(os.environ.get('VIDEO_EARLY_STOP_MIN_COVERAGE', 0.3))
+        if enabled is None:
+            enabled = os.environ.get('VIDEO_EARLY_STOP', '1') == '1'
+        self.roster = set(roster)
+        self.idle_seconds = idle_seconds
+        self.min_coverage = min_coverage
+        self.enabled = enabled
+        self._seen = 0
+        self._last_new = None
+
+    @classmethod
+    def for_gallery(cls, gallery, **kwargs):
+        """Build a policy whose roster is every student of a class gallery"""
+        return cls({_student_label(m) for m in gallery.metadata}, **kwargs)
+
+    def check(self, recognized, position, start, end):
+        """
+        Check whether processing can stop
+
+        Args:
+            recognized: Identities recognized so far
+            position: Video time reached, in seconds
+            start: Video time processing started from, in seconds
+            end: Video time processing would end at, in seconds (None if unknown)
+
+        Returns:
+            str: ``'roster_complete'`` or ``'idle'``, or None to keep going
+        """
+        if len(recognized) > self._seen or self._last_new is None:
+            if len(recognized) > self._seen:
+                self._seen = len(recognized)
+                self._last_new = position
+            else:
+                self._last_new = start
+        if not self.enabled:
+            return None
+        if self.roster and self.roster <= set(recognized):
+            return 'roster_complete'
+        if self.idle_seconds > 0 and end and end > start:
+            coverage = (position - start) / (end - start)
+            if coverage >= self.min_coverage and position - self._last_new >= self.idle_seconds:
+                return 'idle'
+        return None
+
+
+def process_video(video_path, face_service, gallery, tolerance=0.85, batch_size=None, progress=None,
+                  sampler=None, queue_size=None, start_frame=0, end_frame=None, tracker=None,
+                  early_stop=None, change_detector=None):
+    """
+    Recognize the students that appear in a recorded lecture video
+
+    Frames picked by the sampler are decoded, downscaled to a quarter and
+    converted to RGB on a decoder thread (see ``FramePipeline``) while this
+    thread runs detection on them ``batch_size`` frames at a time; frames a
+    ``ChangeDetector`` finds unchanged skip detection and keep the current
+    tracks. Faces are
+    followed across frames by a ``FaceTracker``; only new and re-verified
+    tracks go through the recognition model, and a student counts as
+    recognized when a track votes for them. After every batch the
+    ``EarlyStopPolicy`` may end processing before the end of the video.
+
+    Args:
+        video_path: Path of the video file
+        face_service: FaceRecognitionService instance
+        gallery: Gallery of the class (see ``GalleryCache.get``)
+        tolerance: Distance threshold for matching
+        batch_size: Frames per inference call (uses env var if None)
+        progress: Optional callable ``progress(frames_done, frames_total, recognized)``
+            invoked after every batch
+        sampler: FrameSampler deciding which frames to process (default from env vars)
+        queue_size: Frames buffered between decoding and inference (uses env var if None)
+        start_frame: First frame of the range to process
+        end_frame: Frame index the range stops before (None for the end of the video)
+        tracker: FaceTracker to use (default from env vars)
+        early_stop: EarlyStopPolicy to apply (default: the gallery roster and env vars)
+        change_detector: ChangeDetector gating unchanged frames (default from env vars)
+
+    Returns:
+        dict: ``recognized`` (sorted roll numbers/names), ``frames_done``,
+        ``frames_total`` (sampled frames), ``sampling`` (see ``FrameSampler.report``),
+        ``timings`` (seconds per pipeline stage and the ``bottleneck`` stage),
+        ``tracking`` (see ``FaceTracker.stats``), ``gating`` (see
+        ``ChangeDetector.stats``) and ``early_stop`` (stop ``reason`` and
+        ``fraction_processed`` of the range)
+
+    Raises:
+        IOError: if the video cannot be opened
+    """
+    if batch_size is None:
+        batch_size = int(os.environ.get('VIDEO_BATCH_SIZE', 8))
+    batch_size = max(1, batch_size)
+    if sampler is None:
+        sampler = FrameSampler()
+
+    video_capture = cv2.VideoCapture(video_path)
+    if not video_capture.isOpened():
+        raise IOError(f"Failed to open video file: {video_path}")
+
+    fps = video_capture.get(cv2.CAP_PROP_FPS)
+    frame_count = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    stride, _, frames_total = sampler.plan(fps, frame_count)
+    end = None
+    if frame_count > 0:
+        end = frame_count if end_frame is None else min(end_frame, frame_count)
+    if frames_total is not None and (start_frame or end_frame is not None):
+        frames_total = max(0, math.ceil(end / stride) - math.ceil(start_frame / stride))
+    if not fps or fps <= 0 or math.isnan(fps):
+        fps = DEFAULT_FPS
+    if tracker is None:
+        tracker = FaceTracker()
+    if early_stop is None:
+        early_stop = EarlyStopPolicy.for_gallery(gallery)
+    if change_detector is None:
+        change_detector = ChangeDetector()
+    range_start = start_frame / fps
+    range_end = end / fps if end is not None else None
+    position = range_start
+    stop_reason = None
+    frames_done = 0
+    batch = []
+    timings = {'inference_seconds': 0.0}
+
+    def recognize_batch(items):
+        start = time.perf_counter()
+        try:
+            track_and_recognize(face_service, tracker, [frame for _, frame in items],
+                                [timestamp / 1000.0 for timestamp, _ in items], gallery, tolerance,
+                                _student_label)
+        except Exception as e:
+            print(f"Error processing frames {frames_done - len(items) + 1}-{frames_done}: {e}")
+        finally:
+            timings['inference_seconds'] += time.perf_counter() - start
+
+    pipeline = FramePipeline(video_capture, sampler, queue_size=queue_size,
+                             start_frame=start_frame, end_frame=end_frame)
+    started = time.perf_counter()
+    try:
+        for _, timestamp, frame in pipeline:
+            frames_done += 1
+            if change_detector.changed(frame, timestamp / 1000.0):
+                batch.append((timestamp, frame))
+                if len(batch) < batch_size:
+                    continue
+                recognize_batch(batch)
+                batch = []
+            else:
+                # Recognize earlier changed frames first so tracker time only moves forward
+                # and early stop sees every student recognized so far
+                if batch:
+                    recognize_batch(batch)
+                    batch = []
+                # Nothing moved: the current tracks stay, and time still counts for early stop
+                tracker.carry_forward(timestamp / 1000.0)
+            position = (timestamp / 1000.0) + 1.0 / fps
+            recognized = tracker.identities()
+            if progress is not None:
+                progress(frames_done, frames_total, recognized)
+            stop_reason = early_stop.check(recognized, position, range_start, range_end)
+            if stop_reason is not None:
+                break
+        if batch:
+            recognize_batch(batch)
+    finally:
+        pipeline.close()
+        video_capture.release()
+
+    timings.update(pipeline.stats())
+    timings['wall_seconds'] = time.perf_counter() - started
+    decoder_busy = timings['decode_seconds'] + timings['preprocess_seconds']
+    timings['bottleneck'] = 'decode' if decoder_busy > timings['inference_seconds'] else 'inference'
+    for key in ('inference_seconds', 'wall_seconds'):
+        timings[key] = round(timings[key], 4)
+
+    recognized = tracker.identities()
+    if stop_reason is None:
+        position = range_end
+    fraction = 1.0
+    if stop_reason is not None and range_end and range_end > range_start:
+        fraction = min(1.0, (position - range_start) / (range_end - range_start))
+    if progress is not None:
+        progress(frames_done, frames_done, recognized)
+    return {
+        'recognized': sorted(recognized),
+        'frames_done': frames_done,
+        'frames_total': frames_done,
+        'sampling': sampler.report(),
+        'timings': timings,
+        'tracking': tracker.stats(),
+        'gating': change_detector.stats(),
+        'early_stop': {
+            'reason': stop_reason or 'end_of_video',
+            'fraction_processed': round(fraction, 4),
+            'stopped_at_seconds': round(position, 3) if position is not None else None
+        }
+    }
+
+
+def cpu_budget():
+    """
+    Cores one video job may use
+
+    Returns:
+        int: ``VIDEO_CPU_BUDGET`` if set, otherwise half the machine's cores so
+        live sessions keep the rest
+    """
+    budget = int(os.environ.get('VIDEO_CPU_BUDGET', 0))
+    if budget <= 0:
+        budget = (os.cpu_count() or 2) // 2
+    return max(1, budget)
+
+
+@contextmanager
+def cpu_budget_lock():
+    """
+    Hold the machine-wide video CPU budget for the duration of a ``with`` block
+
+    Every gunicorn worker takes the same lock file (``VIDEO_CPU_LOCK_FILE``),
+    so video jobs run one at a time on the machine and together never use
+    more than ``cpu_budget()`` cores, however many workers accept uploads.
+
+    Yields:
+        float: Seconds spent waiting for the budget
+    """
+    lock_path = os.environ.get('VIDEO_CPU_LOCK_FILE',
+                               os.path.join(tempfile.gettempdir(), 'faceapp-video-cpu.lock'))
+    started = time.perf_counter()
+    with _budget_lock:
+        if fcntl is None:
+            yield time.perf_counter() - started
+            return
+        with open(lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            try:
+                yield time.perf_counter() - started
+            finally:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _get_video_service(threads):
+    """
+    Get the model reserved for in-process video jobs
+
+    Separate from the shared live model, so a video job never changes the
+    thread count the live sessions run with. Loaded on first use and kept
+    for later jobs; rebuilt only if the budget changes.
+
+    Args:
+        threads: Intra-op threads the model may use
+
+    Returns:
+        FaceRecognitionService: Video job service instance for this process
+    """
+    global _video_service
+    with _video_service_lock:
+        if _video_service is None or _video_service.threads != threads:
+            _video_service = FaceRecognitionService(threads=threads)
+        return _video_service
+
+
+def plan_segments(frame_count, stride, segments):
+    """
+    Split a video into frame ranges that start on the sampling grid
+
+    Args:
+        frame_count: Frames in the video
+        stride: Sampling stride in frames
+        segments: Number of ranges wanted
+
+    Returns:
+        list: (start_frame, end_frame) tuples covering the video in order
+    """
+    samples = int(math.ceil(frame_count / stride))
+    segments = max(1, min(segments, samples))
+    bounds = [round(i * samples / segments) * stride for i in range(segments)] + [frame_count]
+    return [(bounds[i], bounds[i + 1]) for i in range(segments) if bounds[i] < bounds[i + 1]]
+
+
+def _init_segment_worker(threads):
+    # Each worker holds its own model, limited to its share of the CPU budget
+    os.environ['FACE_RECOGNITION_THREADS'] = str(threads)
+    os.environ['FACE_RECOGNITION_WARMUP'] = '0'
+    get_face_service()
+
+
+def _process_segment(video_path, split_dir, class_id, tolerance, sampler_config, start_frame, end_frame):
+    gallery = get_gallery_cache(split_dir).get(class_id)
+    # A segment alone can't judge idleness of the whole video; only stop once it has seen the whole roster
+    return process_video(video_path, get_face_service(), gallery, tolerance,
+                         sampler=FrameSampler(**sampler_config), start_frame=start_frame, end_frame=end_frame,
+                         early_stop=EarlyStopPolicy.for_gallery(gallery, idle_seconds=0))
+
+
+def _merge_outcomes(outcomes, sampler, wall_seconds, frames_processed, frame_count, stop_reason):
+    recognized = set()
+    sampling = None
+    timings = {}
+    for outcome in outcomes:
+        recognized.update(outcome['recognized'])
+        if sampling is None:
+            sampling = dict(outcome['sampling'])
+        else:
+            for key in ('frames_sampled', 'frames_grabbed', 'seeks', 'decode_seconds'):
+                sampling[key] += outcome['sampling'][key]
+            sampling['seek'] = sampling['seek'] and outcome['sampling']['seek']
+        for key, value in outcome['timings'].items():
+            if key.endswith('_seconds'):
+                timings[key] = timings.get(key, 0.0) + value
+    frames_done = sum(outcome['frames_done'] for outcome in outcomes)
+    tracking = {}
+    for key in ('detections', 'recognitions', 'tracks_started'):
+        tracking[key] = sum(outcome['tracking'][key] for outcome in outcomes)
+    tracking['active_tracks'] = 0
+    gating = {key: sum(outcome['gating'][key] for outcome in outcomes) for key in ('frames', 'skipped')}
+    gating['skip_ratio'] = round(gating['skipped'] / gating['frames'], 4) if gating['frames'] else None
+    tracking['recognition_ratio'] = (round(tracking['recognitions'] / tracking['detections'], 4)
+                                     if tracking['detections'] else None)
+
+    sampler.stats = {key: sampling[key] for key in ('video_fps', 'frame_count', 'stride_frames', 'seek',
+                                                     'frames_expected', 'frames_sampled', 'frames_grabbed',
+                                                     'seeks', 'decode_seconds')}
+    sampler.stats['last_frame_index'] = max(o['sampling']['last_frame_index'] or 0 for o in outcomes)
+    timings = {key: round(value, 4) for key, value in timings.items()}
+    timings['wall_seconds'] = round(wall_seconds, 4)
+    decoder_busy = timings.get('decode_seconds', 0) + timings.get('preprocess_seconds', 0)
+    timings['bottleneck'] = 'decode' if decoder_busy > timings.get('inference_seconds', 0) else 'inference'
+    return {
+        'recognized': sorted(recognized),
+        'frames_done': frames_done,
+        'frames_total': frames_done,
+        'sampling': sampler.report(),
+        'timings': timings,
+        'tracking': tracking,
+        'gating': gating,
+        'early_stop': {
+            'reason': stop_reason,
+            'fraction_processed': round(min(1.0, frames_processed / frame_count), 4) if frame_count else 1.0,
+            'stopped_at_seconds': None
+        }
+    }
+
+
+def recognize_video(video_path, split_dir, class_id, tolerance=0.85, progress=None, workers=None,
+                    sampler=None):
+    """
+    Recognize the students in a lecture video, splitting long videos across processes
+
+    Videos of at least ``VIDEO_PARALLEL_MIN_SECONDS`` are cut into
+    ``VIDEO_SEGMENT_SECONDS`` segments on the sampling grid and processed by
+    a pool of worker processes, each seeking its own capture and holding
+    its own model limited to its share of the CPU budget. Per-segment
+    recognition sets are merged at the end, and segments not started yet
+    are cancelled once the whole roster has been recognized. Shorter
+    videos, or a budget of one core, run through ``process_video`` in this
+    process on a model of their own, limited to the same budget; the shared
+    live model is left untouched. Either way the job holds
+    ``cpu_budget_lock()`` while it runs, so the budget holds across every
+    worker process on the machine.
+
+    Args:
+        video_path: Path of the video file
+        split_dir: Directory holding the per-class gallery files
+        class_id: Class identifier
+        tolerance: Distance threshold for matching
+        progress: Optional callable ``progress(frames_done, frames_total, recognized)``
+        workers: Worker processes (uses ``cpu_budget()`` if None)
+        sampler: FrameSampler deciding which frames to process (default from env vars)
+
+    Returns:
+        dict: Same keys as ``process_video`` plus ``segments``, ``workers``
+        and ``cpu_wait_seconds``
+
+    Raises:
+        IOError: if the video cannot be opened
+        ValueError: if the class has no gallery
+    """
+    if sampler is None:
+        sampler = FrameSampler()
+    budget = cpu_budget()
+    if workers is None:
+        workers = budget
+    gallery = get_gallery_cache(split_dir).get(class_id)
+    if gallery is None:
+        raise ValueError(f"Encoding file not found for class {class_id}")
+
+    video_capture = cv2.VideoCapture(video_path)
+    if not video_capture.isOpened():
+        raise IOError(f"Failed to open video file: {video_path}")
+    fps = video_capture.get(cv2.CAP_PROP_FPS)
+    frame_count = int(video_capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    video_capture.release()
+    stride, _, frames_total = sampler.plan(fps, frame_count)
+
+    min_seconds = float(os.environ.get('VIDEO_PARALLEL_MIN_SECONDS', 300))
+    segment_seconds = float(os.environ.get('VIDEO_SEGMENT_SECONDS', 60))
+    duration = frame_count / fps if fps and fps > 0 and frame_count > 0 else 0
+    if workers <= 1 or duration < min_seconds:
+        with cpu_budget_lock() as waited:
+            outcome = process_video(video_path, _get_video_service(budget), gallery, tolerance,
+                                    progress=progress, sampler=sampler)
+        outcome.update(segments=1, workers=1, cpu_wait_seconds=round(waited, 4))
+        return outcome
+
+    segments = plan_segments(frame_count, stride, max(workers, int(math.ceil(duration / segment_seconds))))
+    workers = min(workers, len(segments))
+    sampler_config = {'sample_fps': sampler.sample_fps, 'max_frames': sampler.max_frames,
+                      'seek_mode': sampler.seek_mode, 'seek_min_stride': sampler.seek_min_stride}
+    outcomes = []
+    recognized = set()
+    frames_processed = 0
+    stop_reason = 'end_of_video'
+    roster = {_student_label(m) for m in gallery.metadata}
+    early_stop = os.environ.get('VIDEO_EARLY_STOP', '1') == '1'
+    with cpu_budget_lock() as waited:
+        started = time.perf_counter()
+        # Spawn rather than fork: the parent holds ONNX Runtime and server threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=_init_segment_worker,
+                                 initargs=(max(1, budget // workers),)) as pool:
+            futures = {pool.submit(_process_segment, video_path, split_dir, class_id, tolerance,
+                                   sampler_config, start, end): (start, end) for start, end in segments}
+            for future in as_completed(futures):
+                if future.cancelled():
+                    continue
+                outcome = future.result()
+                outcomes.append(outcome)
+                start, end = futures[future]
+                frames_processed += (end - start) * outcome['early_stop']['fraction_processed']
+                recognized.update(outcome['recognized'])
+                if progress is not None:
+                    progress(sum(o['frames_done'] for o in outcomes), frames_total, recognized)
+                if early_stop and roster and roster <= recognized and stop_reason != 'roster_complete':
+                    stop_reason = 'roster_complete'
+                    for pending in futures:
+                        pending.cancel()
+
+    outcome = _merge_outcomes(outcomes, sampler, time.perf_counter() - started, frames_processed,
+                              frame_count, stop_reason)
+    outcome.update(segments=len(segments), workers=workers, cpu_wait_seconds=round(waited, 4))
+    if progress is not None:
+        progress(outcome['frames_done'], outcome['frames_done'], recognized)
+    return outcome
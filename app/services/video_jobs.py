@@ -0,0 +1,236 @@
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+JOB_SUFFIX = '.json'
+ACTIVE_STATES = ('queued', 'running')
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def _owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _owner_alive(owner):
+    """Whether the process that accepted a job still exists (only checkable on this host)"""
+    host, _, pid = (owner or '').rpartition(':')
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class VideoJob:
+    """Handle a running job uses to publish its progress"""
+
+    def __init__(self, queue, job_id, payload):
+        self.queue = queue
+        self.job_id = job_id
+        self.payload = payload
+        self.started = None
+        self._last_write = 0.0
+
+    def update(self, force=False, **fields):
+        """
+        Merge fields into the job's status file
+
+        Writes are throttled to one per ``progress_interval`` seconds unless
+        ``force`` is set.
+
+        Args:
+            force: Write even if the last write was very recent
+            **fields: Status fields to set
+        """
+        now = time.monotonic()
+        if not force and now - self._last_write < self.queue.progress_interval:
+            return
+        self._last_write = now
+        self.queue._update(self.job_id, **fields)
+
+    def progress(self, frames_done, frames_total, recognized):
+        """
+        Publish frame progress, an ETA and the students recognized so far
+
+        Args:
+            frames_done: Frames processed
+            frames_total: Total frames (None if unknown)
+            recognized: Roll numbers/names recognized so far
+        """
+        eta = None
+        if self.started is not None and frames_done and frames_total:
+            elapsed = time.time() - self.started
+            eta = round(elapsed / frames_done * max(frames_total - frames_done, 0), 1)
+        self.update(frames_done=frames_done, frames_total=frames_total,
+                    eta_seconds=eta, recognized=sorted(recognized))
+
+
+class VideoJobQueue:
+    """
+    In-process background queue for video attendance jobs
+
+    Jobs run on a local thread pool, so no broker is needed. Each job's
+    status lives in ``{jobs_dir}/{job_id}.json`` and is replaced atomically,
+    which lets any gunicorn worker answer status requests for jobs accepted
+    by another worker.
+    """
+
+    def __init__(self, jobs_dir, max_workers=None, progress_interval=None, retention_hours=None):
+        """
+        Args:
+            jobs_dir: Directory for job status files
+            max_workers: Concurrent jobs per process (uses env var if None)
+            progress_interval: Minimum seconds between progress writes (uses env var if None)
+            retention_hours: Age after which finished job files are pruned (uses env var if None)
+        """
+        if max_workers is None:
+            max_workers = int(os.environ.get('VIDEO_JOB_WORKERS', 1))
+        if progress_interval is None:
+            progress_interval = float(os.environ.get('VIDEO_JOB_PROGRESS_SECONDS', 1.0))
+        if retention_hours is None:
+            retention_hours = float(os.environ.get('VIDEO_JOB_RETENTION_HOURS', 24))
+
+        self.jobs_dir = jobs_dir
+        self.progress_interval = progress_interval
+        self.retention_seconds = retention_hours * 3600
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_workers),
+                                            thread_name_prefix='video-job')
+        self._lock = threading.Lock()
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def path_for(self, job_id):
+        return os.path.join(self.jobs_dir, f"{job_id}{JOB_SUFFIX}")
+
+    def submit(self, target, payload, **fields):
+        """
+        Queue a job
+
+        Args:
+            target: Callable ``target(job)`` doing the work; its return
+                value is stored as the job's ``result``
+            payload: JSON-serializable job input, available as ``job.payload``
+            **fields: Extra status fields recorded with the job
+
+        Returns:
+            str: Job id
+        """
+        self.prune()
+        job_id = uuid.uuid4().hex
+        record = dict(fields)
+        record.update({
+            'job_id': job_id,
+            'status': 'queued',
+            'owner': _owner(),
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None,
+            'frames_done': 0,
+            'frames_total': None,
+            'eta_seconds': None,
+            'recognized': [],
+            'result': None,
+            'error': None,
+            'payload': payload
+        })
+        self._write(job_id, record)
+        self._executor.submit(self._run, target, VideoJob(self, job_id, payload))
+        return job_id
+
+    def get(self, job_id):
+        """
+        Read a job's status
+
+        Jobs still marked queued/running whose accepting process has exited
+        are reported as failed.
+
+        Args:
+            job_id: Job id
+
+        Returns:
+            dict or None if the job does not exist
+        """
+        if not job_id or not all(c in '0123456789abcdef' for c in job_id):
+            return None
+        try:
+            with open(self.path_for(job_id), 'r') as f:
+                record = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if record.get('status') in ACTIVE_STATES and not _owner_alive(record.get('owner')):
+            record['status'] = 'failed'
+            record['error'] = 'The worker processing this job exited'
+        return record
+
+    def prune(self):
+        """Delete status files of jobs that finished more than ``retention_hours`` ago"""
+        cutoff = time.time() - self.retention_seconds
+        try:
+            names = os.listdir(self.jobs_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith(JOB_SUFFIX):
+                continue
+            path = os.path.join(self.jobs_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+
+    def _run(self, target, job):
+        job.started = time.time()
+        job.update(force=True, status='running', started_at=job.started)
+        try:
+            result = target(job)
+        except Exception as e:
+            print(f"Error in video job {job.job_id}: {e}")
+            job.update(force=True, status='failed', error=str(e), finished_at=time.time())
+            return
+        job.update(force=True, status='done', result=result, eta_seconds=0, finished_at=time.time())
+
+    def _update(self, job_id, **fields):
+        with self._lock:
+            try:
+                with open(self.path_for(job_id), 'r') as f:
+                    record = json.load(f)
+            except (FileNotFoundError, ValueError):
+                return
+            record.update(fields)
+            self._write(job_id, record)
+
+    def _write(self, job_id, record):
+        path = self.path_for(job_id)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(record, f, default=str)
+        os.replace(tmp_path, path)
+
+
+def get_video_job_queue(jobs_dir):
+    """
+    Get the process-wide video job queue for a status directory
+
+    Args:
+        jobs_dir: Directory for job status files
+
+    Returns:
+        VideoJobQueue: Shared queue instance
+    """
+    key = os.path.abspath(jobs_dir)
+    with _queues_lock:
+        queue = _queues.get(key)
+        if queue is None:
+            queue = VideoJobQueue(jobs_dir)
+            _queues[key] = queue
+        return queue
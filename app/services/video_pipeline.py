@@ -0,0 +1,130 @@
+import os
+import queue
+import threading
+import time
+import cv2
+from .frame_sampler import FrameSampler
+
+_DONE = object()
+
+
+class FramePipeline:
+    """
+    Decode and preprocess video frames on a background thread
+
+    A decoder thread pulls sampled frames from the capture, downscales them
+    and converts them to RGB, and hands them to the consumer through a
+    bounded queue. When inference falls behind, the decoder blocks on the
+    full queue, so at most ``queue_size`` preprocessed frames are held in
+    memory whatever the video length. Iterate the pipeline to consume
+    frames; ``stats`` reports where each side spent its time.
+    """
+
+    def __init__(self, capture, sampler=None, scale_factor=0.25, queue_size=None, start_frame=0, end_frame=None):
+        """
+        Args:
+            capture: Opened ``cv2.VideoCapture`` (released by the caller)
+            sampler: FrameSampler choosing the frames (default from env vars)
+            scale_factor: Resize factor applied before color conversion
+            queue_size: Preprocessed frames buffered between the stages (uses env var if None)
+            start_frame: First frame of the range to process
+            end_frame: Frame index the range stops before (None for the end of the video)
+        """
+        if queue_size is None:
+            queue_size = int(os.environ.get('VIDEO_PIPELINE_QUEUE_SIZE', 16))
+        self.capture = capture
+        self.sampler = sampler if sampler is not None else FrameSampler()
+        self.scale_factor = scale_factor
+        self.start_frame = start_frame
+        self.end_frame = end_frame
+        self.queue_size = max(1, queue_size)
+        self._queue = queue.Queue(maxsize=self.queue_size)
+        self._stop = threading.Event()
+        self._error = None
+        self._thread = None
+        self.preprocess_seconds = 0.0
+        self.decoder_blocked_seconds = 0.0
+        self.consumer_wait_seconds = 0.0
+        self.max_queue_depth = 0
+
+    def __iter__(self):
+        """
+        Yields:
+            tuple: (frame index, timestamp in ms, downscaled RGB frame)
+
+        Raises:
+            Exception: whatever the decoder thread raised
+        """
+        self._thread = threading.Thread(target=self._produce, name='video-decoder', daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                start = time.perf_counter()
+                item = self._queue.get()
+                self.consumer_wait_seconds += time.perf_counter() - start
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            self.close()
+        if self._error is not None:
+            raise self._error
+
+    def close(self):
+        """Stop the decoder thread and drop any buffered frames"""
+        self._stop.set()
+        if self._thread is None:
+            return
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.05)
+            except queue.Empty:
+                pass
+        self._thread.join()
+
+    def _produce(self):
+        try:
+            for index, timestamp, frame in self.sampler.frames(self.capture, self.start_frame, self.end_frame):
+                if self._stop.is_set():
+                    break
+                start = time.perf_counter()
+                if self.scale_factor != 1:
+                    frame = cv2.resize(frame, (0, 0), fx=self.scale_factor, fy=self.scale_factor)
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                self.preprocess_seconds += time.perf_counter() - start
+                if not self._put((index, timestamp, frame)):
+                    return
+                self.max_queue_depth = max(self.max_queue_depth, self._queue.qsize())
+        except Exception as e:
+            self._error = e
+        self._put(_DONE)
+
+    def _put(self, item):
+        start = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+        finally:
+            self.decoder_blocked_seconds += time.perf_counter() - start
+
+    def stats(self):
+        """
+        Get per-stage timings
+
+        Returns:
+            dict: Decode, preprocess and queue wait seconds for both sides
+        """
+        sampling = self.sampler.stats or {}
+        return {
+            'decode_seconds': round(sampling.get('decode_seconds', 0.0), 4),
+            'preprocess_seconds': round(self.preprocess_seconds, 4),
+            'decoder_blocked_seconds': round(self.decoder_blocked_seconds, 4),
+            'consumer_wait_seconds': round(self.consumer_wait_seconds, 4),
+            'queue_size': self.queue_size,
+            'max_queue_depth': self.max_queue_depth
+        }
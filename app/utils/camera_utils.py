@@ -2,36 +2,15 @@ import cv2
 import numpy as np
 from PIL import Image
 import io
+import os
 import base64
 
-def extract_frames_from_video(video_path, max_frames=None):
-    """
-    Extract frames from a video file
-    
-    Args:
-        video_path: Path to the video file
-        max_frames: Maximum number of frames to extract (None for all)
-        
-    Returns:
-        list: List of frames as numpy arrays
-    """
-    frames = []
-    cap = cv2.VideoCapture(video_path)
-    
-    frame_count = 0
-    while True:
-        ret, frame = cap.read()
-        if not ret:
-            break
-            
-        if max_frames and frame_count >= max_frames:
-            break
-            
-        frames.append(frame)
-        frame_count += 1
-    
-    cap.release()
-    return frames
+# OpenCV flags decoding a JPEG at 1/2, 1/4 or 1/8 size by DCT scaling
+_REDUCED_READ_FLAGS = {
+    2: cv2.IMREAD_REDUCED_COLOR_2,
+    4: cv2.IMREAD_REDUCED_COLOR_4,
+    8: cv2.IMREAD_REDUCED_COLOR_8
+}
 
 def resize_frame(frame, scale_factor=0.25):
     """
@@ -58,12 +37,91 @@ def frame_to_rgb(frame):
     """
     return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
 
-def base64_to_frame(base64_string):
+def jpeg_scale(width, height, max_side):
+    """
+    Pick the JPEG DCT scale factor for decoding near a working size
+    
+    Args:
+        width: Full image width
+        height: Full image height
+        max_side: Longest side wanted after decoding, 0 or None for full size
+        
+    Returns:
+        int: 1, 2, 4 or 8; the largest reduction that keeps the longest
+        side at or above ``max_side``, so small images are never upscaled
+    """
+    if not max_side:
+        return 1
+    for scale in (8, 4, 2):
+        if max(width, height) // scale >= max_side:
+            return scale
+    return 1
+
+def decode_scale(image_bytes, max_side=None):
+    """
+    DCT scale factor to decode encoded image bytes with
+    
+    Only the image header is parsed. Formats other than JPEG decode at
+    full size.
+    
+    Args:
+        image_bytes: Encoded image as bytes, bytearray or memoryview
+        max_side: Longest side wanted after decoding (uses env var if None)
+        
+    Returns:
+        int: 1, 2, 4 or 8
+    """
+    if max_side is None:
+        max_side = int(os.environ.get('FRAME_DECODE_MAX_SIDE', 640))
+    if not max_side:
+        return 1
+    try:
+        with Image.open(io.BytesIO(image_bytes)) as img:
+            if img.format != 'JPEG':
+                return 1
+            width, height = img.size
+    except Exception:
+        return 1
+    return jpeg_scale(width, height, max_side)
+
+def bytes_to_frame(image_bytes, max_side=None):
+    """
+    Decode encoded image bytes (JPEG, PNG, ...) to an RGB numpy array
+    
+    The bytes are decoded by OpenCV straight into a numpy array and the
+    channels are swapped in place, so no intermediate image objects or
+    copies are made. Large JPEGs are decoded at a reduced scale (see
+    ``jpeg_scale``) so they come out near the detector's working size
+    instead of being decoded in full and resized afterwards.
+    
+    Args:
+        image_bytes: Encoded image as bytes, bytearray or memoryview
+        max_side: Longest side wanted after decoding, 0 for full size
+            (uses env var if None)
+        
+    Returns:
+        numpy array: RGB image, or None if the bytes are not a valid image
+    """
+    try:
+        buffer = np.frombuffer(image_bytes, dtype=np.uint8)
+        if buffer.size == 0:
+            return None
+        scale = decode_scale(buffer, max_side)
+        frame = cv2.imdecode(buffer, _REDUCED_READ_FLAGS.get(scale, cv2.IMREAD_COLOR))
+        if frame is None:
+            return None
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+    except Exception as e:
+        print(f"Error converting bytes to frame: {e}")
+        return None
+
+def base64_to_frame(base64_string, max_side=None):
     """
     Convert base64 image string to numpy array
     
     Args:
         base64_string: Base64 encoded image string
+        max_side: Longest side wanted after decoding (see ``bytes_to_frame``)
         
     Returns:
         numpy array: Image as numpy array
@@ -73,9 +131,7 @@ def base64_to_frame(base64_string):
         if ',' in base64_string:
             base64_string = base64_string.split(',')[1]
         
-        img_bytes = base64.b64decode(base64_string)
-        img = Image.open(io.BytesIO(img_bytes)).convert('RGB')
-        return np.array(img)
+        return bytes_to_frame(base64.b64decode(base64_string), max_side)
     except Exception as e:
         print(f"Error converting base64 to frame: {e}")
         return None
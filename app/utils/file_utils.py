@@ -1,33 +1,34 @@
 import os
-import pickle
 import glob
 import numpy as np
 from werkzeug.utils import secure_filename
+from ..services.embedding_store import EmbeddingStore
 
 def ensure_directory(directory_path):
     """Ensure a directory exists, create if it doesn't"""
     os.makedirs(directory_path, exist_ok=True)
 
+def _class_location(file_path):
+    """Split a gallery path into (split_dir, class_id), ignoring any extension"""
+    split_dir = os.path.dirname(file_path) or '.'
+    class_id = os.path.splitext(os.path.basename(file_path))[0]
+    return split_dir, class_id
+
 def save_encodings(encodings, metadata, file_path):
-    """Save face encodings and metadata to a pickle file"""
+    """Save face encodings and metadata to the versioned embedding store"""
     try:
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        data = {'encodings': encodings, 'metadata': metadata}
-        with open(file_path, 'wb') as f:
-            pickle.dump(data, f)
+        split_dir, class_id = _class_location(file_path)
+        EmbeddingStore(split_dir).save(class_id, encodings, metadata)
         return True
     except Exception as e:
         print(f"Error saving encodings: {e}")
         return False
 
 def load_encodings(file_path):
-    """Load face encodings and metadata from a pickle file"""
+    """Load face encodings and metadata from the versioned embedding store"""
     try:
-        if not os.path.exists(file_path):
-            return None, None
-        with open(file_path, 'rb') as f:
-            data = pickle.load(f)
-        return data.get('encodings', []), data.get('metadata', [])
+        split_dir, class_id = _class_location(file_path)
+        return EmbeddingStore(split_dir).load(class_id)
     except (ModuleNotFoundError, ImportError, ValueError) as e:
         print(f"Error loading encodings due to numpy version incompatibility: {e}")
         return None, None
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-frame face inference against batched recognition
+
+Frames are built by tiling the registration photos in dataset/ so every
+frame contains several real faces. Requires the buffalo_l model.
+
+Usage: python benchmarks/bench_batch_inference.py [--frames 64] [--faces-per-frame 4]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.face_recognition import get_face_service
+
+BATCH_SIZES = [1, 4, 8, 16]
+TILE = 160
+
+
+def build_frames(image_dir, count, faces_per_frame):
+    paths = sorted(glob.glob(os.path.join(image_dir, '*.jpg')))
+    if not paths:
+        raise SystemExit(f"No .jpg images found in {image_dir}")
+    tiles = []
+    for path in paths:
+        image = cv2.imread(path)
+        if image is not None:
+            tiles.append(cv2.cvtColor(cv2.resize(image, (TILE, TILE)), cv2.COLOR_BGR2RGB))
+    frames = []
+    for i in range(count):
+        row = [tiles[(i * faces_per_frame + j) % len(tiles)] for j in range(faces_per_frame)]
+        frames.append(np.ascontiguousarray(np.hstack(row)))
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', default=os.path.join(os.path.dirname(__file__), '..', 'dataset'))
+    parser.add_argument('--frames', type=int, default=64)
+    parser.add_argument('--faces-per-frame', type=int, default=4)
+    args = parser.parse_args()
+
+    service = get_face_service()
+    service.warmup()
+    frames = build_frames(args.images, args.frames, args.faces_per_frame)
+
+    start = time.perf_counter()
+    baseline_faces = sum(len(service.get_faces(frame)) for frame in frames)
+    baseline = time.perf_counter() - start
+    print(f"{'mode':>12} {'faces':>6} {'total ms':>10} {'ms/frame':>9} {'speedup':>8}")
+    print(f"{'get_faces':>12} {baseline_faces:>6} {baseline * 1000:>10.1f} "
+          f"{baseline * 1000 / len(frames):>9.2f} {'1.0x':>8}")
+
+    for batch_size in BATCH_SIZES:
+        start = time.perf_counter()
+        found = 0
+        for i in range(0, len(frames), batch_size):
+            found += sum(len(faces) for faces in service.get_faces_batch(frames[i:i + batch_size]))
+        elapsed = time.perf_counter() - start
+        print(f"{'batch=' + str(batch_size):>12} {found:>6} {elapsed * 1000:>10.1f} "
+              f"{elapsed * 1000 / len(frames):>9.2f} {baseline / elapsed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Benchmark full JPEG decoding against reduced-scale (DCT scaling) decoding
+
+JPEGs are built at common webcam and phone resolutions from the
+registration photos in dataset/ (or a synthetic pattern if there are
+none). For each resolution the full decode followed by a resize to the
+working size is compared with ``bytes_to_frame`` decoding near it
+directly. Memory is the peak traced by tracemalloc during one decode.
+
+Usage: python benchmarks/bench_frame_decode.py [--max-side 640] [--repeat 20]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from utils.camera_utils import bytes_to_frame, decode_scale
+
+RESOLUTIONS = [(640, 480), (1280, 720), (1920, 1080), (3264, 2448), (4000, 3000)]
+
+
+def build_jpeg(image_dir, width, height):
+    paths = sorted(glob.glob(os.path.join(image_dir, '*.jpg')))
+    image = cv2.imread(paths[0]) if paths else None
+    if image is None:
+        y, x = np.mgrid[0:height, 0:width]
+        image = np.dstack([(x * 255 // width), (y * 255 // height), ((x + y) % 256)]).astype(np.uint8)
+    image = cv2.resize(image, (width, height), interpolation=cv2.INTER_CUBIC)
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def full_decode(data, max_side):
+    frame = bytes_to_frame(data, max_side=0)
+    scale = max_side / max(frame.shape[:2])
+    if scale < 1:
+        frame = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return frame
+
+
+def measure(decode, data, max_side, repeat):
+    decode(data, max_side)  # warm up decoder plugins outside the traced call
+    tracemalloc.start()
+    frame = decode(data, max_side)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        decode(data, max_side)
+    return frame, (time.perf_counter() - start) * 1000 / repeat, peak / 2 ** 20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', default=os.path.join(os.path.dirname(__file__), '..', 'dataset'))
+    parser.add_argument('--max-side', type=int, default=640)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'source':>10} {'scale':>6} {'decoded':>10} {'full ms':>8} {'reduced ms':>11} "
+          f"{'speedup':>8} {'full MB':>8} {'reduced MB':>11}")
+    for width, height in RESOLUTIONS:
+        data = build_jpeg(args.images, width, height)
+        _, full_ms, full_mb = measure(full_decode, data, args.max_side, args.repeat)
+        frame, reduced_ms, reduced_mb = measure(bytes_to_frame, data, args.max_side, args.repeat)
+        decoded = f"{frame.shape[1]}x{frame.shape[0]}"
+        print(f"{width}x{height:<5} {'1/' + str(decode_scale(data, args.max_side)):>6} {decoded:>10} "
+              f"{full_ms:>8.2f} {reduced_ms:>11.2f} {full_ms / reduced_ms:>7.2f}x "
+              f"{full_mb:>8.1f} {reduced_mb:>11.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-face L2 matching against the batched GEMM matcher
+
+Usage: python benchmarks/bench_matcher.py [--faces 30] [--repeat 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.face_matcher import match_embeddings, squared_norms
+
+GALLERY_SIZES = [60, 250, 1000, 4000, 10000]
+
+
+def unit(v):
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def loop_match(faces, gallery, tolerance):
+    """The per-face loop the routes used before"""
+    decisions = []
+    for embedding in faces:
+        dists = np.linalg.norm(gallery - embedding, axis=1)
+        min_dist = np.min(dists)
+        min_idx = np.argmin(dists)
+        decisions.append(int(min_idx) if min_dist < tolerance else None)
+    return decisions
+
+
+def timed(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--faces', type=int, default=30, help='faces per frame')
+    parser.add_argument('--repeat', type=int, default=20, help='timing repetitions (best of)')
+    parser.add_argument('--tolerance', type=float, default=0.85)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    print(f"{'gallery':>8} {'loop ms':>10} {'gemm ms':>10} {'speedup':>8} {'same':>6}")
+    for size in GALLERY_SIZES:
+        # Registration stores the mean of three normalized embeddings per student
+        gallery = np.mean(unit(rng.normal(size=(size, 3, 512))), axis=1).astype(np.float32)
+        sq_norms = squared_norms(gallery)
+        picks = rng.choice(size, size=min(args.faces, size), replace=False)
+        faces = unit(gallery[picks] + rng.normal(scale=0.03, size=(len(picks), 512))).astype(np.float32)
+        # Mix in a few strangers so both decisions are exercised
+        faces[::5] = unit(rng.normal(size=(len(faces[::5]), 512)))
+
+        loop_time, expected = timed(lambda: loop_match(faces, gallery, args.tolerance), args.repeat)
+        gemm_time, matches = timed(
+            lambda: match_embeddings(faces, gallery, tolerance=args.tolerance, known_sq_norms=sq_norms),
+            args.repeat)
+        same = expected == [m['index'] for m in matches]
+        print(f"{size:>8} {loop_time * 1000:>10.2f} {gemm_time * 1000:>10.2f} "
+              f"{loop_time / gemm_time:>7.1f}x {str(same):>6}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Count the MongoDB commands behind the student pages, per-subject queries against one aggregation
+
+Seeds a scratch database with one student's attendance, then runs the old
+per-subject query pattern of the dashboard and attendance pages next to the
+student stats aggregation, counting commands with the client's QueryCounter.
+Requires a MongoDB server; the scratch database is dropped afterwards.
+
+Usage: python benchmarks/bench_student_stats.py [--uri mongodb://localhost:27017] [--records 2000]
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pymongo import MongoClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from db.indexes import ensure_indexes
+from db.query_counter import get_query_counter
+from services.attendance_stats import student_stats, student_stats_pipeline
+
+ROLL_NO = '21CE001'
+
+
+def seed(collection, subjects, records):
+    today = datetime.now()
+    rng = random.Random(42)
+    docs = []
+    for i in range(records):
+        docs.append({
+            'date': (today - timedelta(days=i // len(subjects))).strftime('%Y-%m-%d'),
+            'subject': subjects[i % len(subjects)],
+            'faculty_email': 'faculty@example.com',
+            'branch': 'CE', 'semester': 3, 'section': 'A',
+            'student': {'roll_no': ROLL_NO, 'name': 'asha', 'status': rng.choice(['Present', 'Absent'])}
+        })
+    collection.insert_many(docs)
+
+
+def legacy_pages(collection, week_start):
+    """The dashboard and attendance page queries before the stats aggregation"""
+    subjects = {doc['subject'] for doc in collection.find({'student.roll_no': ROLL_NO}) if doc.get('subject')}
+    for subj in subjects:
+        collection.count_documents({'student.roll_no': ROLL_NO, 'subject': subj})
+        collection.count_documents({'student.roll_no': ROLL_NO, 'subject': subj, 'student.status': 'Present'})
+        list(collection.find({'student.roll_no': ROLL_NO, 'subject': subj, 'date': {'$gte': week_start}}))
+    list(collection.find({'student.roll_no': ROLL_NO}).sort('_id', -1).limit(10))
+    for subj in collection.distinct('subject', {'student.roll_no': ROLL_NO}):
+        collection.count_documents({'student.roll_no': ROLL_NO, 'subject': subj})
+        collection.count_documents({'student.roll_no': ROLL_NO, 'subject': subj, 'student.status': 'Present'})
+        list(collection.find({'student.roll_no': ROLL_NO, 'subject': subj}).sort('_id', -1).limit(20))
+
+
+def aggregated_pages(collection, week_start):
+    """The same pages on the student stats aggregation"""
+    for subject_records, facets in ((0, None), (20, ['subjects'])):
+        pipeline = student_stats_pipeline(ROLL_NO, week_start, subject_records=subject_records, facets=facets)
+        student_stats(next(collection.aggregate(pipeline), None))
+
+
+def measure(fn, *args):
+    counter = get_query_counter()
+    start = time.perf_counter()
+    with counter.counting() as counts:
+        fn(*args)
+    return sum(counts.values()), time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--uri', default=os.environ.get('MONGO_URI', 'mongodb://localhost:27017'))
+    parser.add_argument('--records', type=int, default=2000, help='attendance records of the student')
+    args = parser.parse_args()
+
+    client = MongoClient(args.uri, event_listeners=[get_query_counter()])
+    db = client['bench_student_stats']
+    try:
+        ensure_indexes(db, collections=['attendance'])
+        week_start = (datetime.now() - timedelta(days=7)).strftime('%Y-%m-%d')
+        print(f"{'subjects':>8} {'legacy cmds':>12} {'legacy ms':>10} {'agg cmds':>9} {'agg ms':>8}")
+        for count in (4, 8, 16):
+            db['attendance'].delete_many({})
+            seed(db['attendance'], [f"SUBJ{i}" for i in range(count)], args.records)
+            legacy_cmds, legacy_time = measure(legacy_pages, db['attendance'], week_start)
+            agg_cmds, agg_time = measure(aggregated_pages, db['attendance'], week_start)
+            print(f"{count:>8} {legacy_cmds:>12} {legacy_time * 1000:>10.1f} {agg_cmds:>9} {agg_time * 1000:>8.1f}")
+    finally:
+        client.drop_database('bench_student_stats')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Benchmark segment-parallel video processing against a single process
+
+A synthetic lecture video is written by tiling the registration photos in
+dataset/ so every sampled frame contains real faces. Requires the
+buffalo_l model.
+
+Usage: python benchmarks/bench_video_parallel.py [--minutes 10] [--workers 1,2,4]
+"""
+
+import argparse
+import glob
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.embedding_store import EmbeddingStore
+from services.face_recognition import get_face_service
+from services.frame_sampler import FrameSampler
+from services.video_attendance import cpu_budget, recognize_video
+
+TILE = 160
+FPS = 30
+
+
+def write_video(path, image_dir, minutes, faces_per_frame=4):
+    tiles = []
+    for image_path in sorted(glob.glob(os.path.join(image_dir, '*.jpg'))):
+        image = cv2.imread(image_path)
+        if image is not None:
+            tiles.append(cv2.resize(image, (TILE, TILE)))
+    if not tiles:
+        raise SystemExit(f"No .jpg images found in {image_dir}")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), FPS, (TILE * faces_per_frame * 2, TILE * 2))
+    for i in range(int(minutes * 60 * FPS)):
+        # Shift the row of faces every second so frames differ
+        first = (i // FPS) * faces_per_frame
+        row = np.hstack([tiles[(first + j) % len(tiles)] for j in range(faces_per_frame)])
+        # Faces are processed at a quarter of the frame size, so upscale 2x
+        writer.write(cv2.resize(row, (0, 0), fx=2, fy=2))
+    writer.release()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--images', default=os.path.join(os.path.dirname(__file__), '..', 'dataset'))
+    parser.add_argument('--minutes', type=float, default=10)
+    parser.add_argument('--workers', default=None, help='comma-separated worker counts (default 1..cpu budget)')
+    args = parser.parse_args()
+
+    budget = cpu_budget()
+    counts = sorted(int(w) for w in args.workers.split(',')) if args.workers else sorted({1, 2, 4, budget} & set(range(1, budget + 1)))
+    os.environ['VIDEO_PARALLEL_MIN_SECONDS'] = '0'
+    os.environ.setdefault('VIDEO_CPU_BUDGET', str(max(counts)))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        video_path = os.path.join(tmp_dir, 'lecture.avi')
+        print(f"Writing {args.minutes:g} min synthetic video...")
+        write_video(video_path, args.images, args.minutes)
+        split_dir = os.path.join(tmp_dir, 'split')
+        rng = np.random.default_rng(0)
+        gallery = rng.normal(size=(60, 512))
+        EmbeddingStore(split_dir).save('BENCH_1', list(gallery), [{'roll_no': str(i)} for i in range(60)])
+
+        # Load the in-process model up front; pool runs include their workers' model loads
+        get_face_service()
+        print(f"CPU budget: {cpu_budget()} cores")
+        print(f"{'workers':>8} {'segments':>9} {'frames':>7} {'wall s':>8} {'speedup':>8} {'efficiency':>11}")
+        baseline = None
+        for workers in counts:
+            start = time.perf_counter()
+            outcome = recognize_video(video_path, split_dir, 'BENCH_1', workers=workers,
+                                      sampler=FrameSampler(sample_fps=2, max_frames=0))
+            elapsed = time.perf_counter() - start
+            if baseline is None:
+                baseline = elapsed
+            speedup = baseline / elapsed
+            print(f"{outcome['workers']:>8} {outcome['segments']:>9} {outcome['frames_done']:>7} "
+                  f"{elapsed:>8.1f} {speedup:>7.2f}x {speedup / outcome['workers']:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
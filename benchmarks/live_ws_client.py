@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Scripted client for the live attendance WebSocket channel
+
+Logs in as a faculty member, starts a live session, streams JPEG frames
+from a video file (or the registration photos in dataset/) over
+/attendance/live_ws at a fixed rate and prints the recognition deltas as
+they arrive, then a summary of frames sent, processed and dropped by the
+server's latest-frame buffer. Requires a running server and flask-sock.
+
+Usage: python benchmarks/live_ws_client.py --email FACULTY --password PASS --class-id CE_1
+           [--url http://127.0.0.1:8000] [--video lecture.mp4] [--fps 3] [--seconds 30] [--save]
+"""
+
+import argparse
+import glob
+import http.cookiejar
+import json
+import os
+import threading
+import time
+import urllib.parse
+import urllib.request
+import cv2
+from simple_websocket import Client, ConnectionClosed
+
+
+def frame_source(video, image_dir):
+    if video:
+        capture = cv2.VideoCapture(video)
+        while True:
+            ok, frame = capture.read()
+            if not ok:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ok, frame = capture.read()
+                if not ok:
+                    raise SystemExit(f"Could not read {video}")
+            yield frame
+    images = [cv2.imread(path) for path in sorted(glob.glob(os.path.join(image_dir, '*.jpg')))]
+    images = [image for image in images if image is not None]
+    if not images:
+        raise SystemExit(f"No .jpg images found in {image_dir}")
+    while True:
+        for image in images:
+            # Hold each photo for a while, like a mostly static classroom camera
+            for _ in range(10):
+                yield image
+
+
+def post(opener, url, fields):
+    body = urllib.parse.urlencode(fields).encode()
+    with opener.open(urllib.request.Request(url, data=body)) as response:
+        return response.read()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', required=True)
+    parser.add_argument('--class-id', required=True)
+    parser.add_argument('--video')
+    parser.add_argument('--images', default=os.path.join(os.path.dirname(__file__), '..', 'dataset'))
+    parser.add_argument('--fps', type=float, default=3)
+    parser.add_argument('--seconds', type=float, default=30)
+    parser.add_argument('--save', action='store_true', help='stop the session and save attendance at the end')
+    args = parser.parse_args()
+
+    jar = http.cookiejar.CookieJar()
+    opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(jar))
+    post(opener, f"{args.url}/login", {'faculty_email': args.email, 'password': args.password})
+    started = json.loads(post(opener, f"{args.url}/attendance/start_session", {'class_id': args.class_id}))
+    if not started.get('success'):
+        raise SystemExit(f"Could not start session: {started}")
+    session_id = started['session_id']
+    print(f"Session {session_id}")
+
+    cookie = '; '.join(f"{c.name}={c.value}" for c in jar)
+    ws_url = args.url.replace('http', 'ws', 1) + '/attendance/live_ws?' + urllib.parse.urlencode({'session_id': session_id})
+    ws = Client.connect(ws_url, headers={'Cookie': cookie})
+
+    results = []
+
+    def read():
+        try:
+            while True:
+                message = json.loads(ws.receive())
+                results.append((time.perf_counter(), message))
+                if message.get('type') == 'error':
+                    print(f"error: {message['error']}")
+                elif message.get('new_students'):
+                    print(f"+ {', '.join(message['new_students'])} (total {message['total_recognized']})")
+        except ConnectionClosed:
+            pass
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+
+    sent = 0
+    start = time.perf_counter()
+    try:
+        for frame in frame_source(args.video, args.images):
+            elapsed = time.perf_counter() - start
+            if elapsed >= args.seconds:
+                break
+            ws.send(cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1].tobytes())
+            sent += 1
+            time.sleep(max(0.0, sent / args.fps - (time.perf_counter() - start)))
+    except ConnectionClosed:
+        print("Server closed the channel")
+    finally:
+        time.sleep(1)
+        try:
+            ws.send('stop')
+            ws.close()
+        except ConnectionClosed:
+            pass
+
+    processed = [message for _, message in results if message.get('type') == 'result']
+    last = processed[-1] if processed else {}
+    gaps = [b - a for (a, _), (b, _) in zip(results, results[1:])]
+    print(f"sent {sent} frames in {time.perf_counter() - start:.1f} s, "
+          f"{len(processed)} results, {last.get('dropped', 0)} dropped by the server")
+    if gaps:
+        print(f"mean result interval {sum(gaps) / len(gaps) * 1000:.0f} ms")
+    if last:
+        print(f"recognized {last['total_recognized']}, skip ratio {last['gating']['skip_ratio']}")
+
+    if args.save:
+        stopped = json.loads(post(opener, f"{args.url}/attendance/stop_session", {'session_id': session_id}))
+        print(f"Saved: {stopped.get('count')} present")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Script to remove duplicate attendance records and create the unique attendance key
+Before attendance writes became upserts, resubmitting a form inserted the
+same student's record for the same lecture again; the unique index cannot
+be built while such duplicates exist. The latest record of each is kept
+
+Usage: python dedupe_attendance.py [--dry-run]
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from app.db.indexes import ensure_indexes
+from app.services.attendance_writer import remove_duplicate_attendance
+
+if __name__ == "__main__":
+    load_dotenv()
+    print("Attendance De-duplication Tool")
+    print("=" * 40)
+    dry_run = '--dry-run' in sys.argv[1:]
+    client = MongoClient(os.environ['MONGO_URI'])
+    collection = client[os.environ.get('MONGODB_DB', 'attendance_db')]['attendance']
+    
+    count = remove_duplicate_attendance(collection, dry_run=dry_run)
+    print(f"{'Found' if dry_run else 'Removed'} {count} duplicate attendance records")
+    if not dry_run:
+        for _, name, error in ensure_indexes(collection.database, collections=['attendance']):
+            print(f"  {'✗' if error else '✓'} attendance.{name}{': ' + error if error else ''}")
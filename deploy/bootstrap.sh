@@ -41,6 +41,7 @@ FLASK_ENV=production
 SECRET_KEY=$(openssl rand -hex 16)
 FACE_RECOGNITION_MODEL=buffalo_l
 FACE_RECOGNITION_TOLERANCE=0.85
+LIVE_SESSION_STORE=mongo
 # Set your Mongo URI (Atlas recommended)
 MONGODB_URI=
 EOF
@@ -57,8 +58,10 @@ After=network.target
 User=faceapp
 Group=faceapp
 WorkingDirectory=/opt/faceapp
+# Three workers: live sessions must live in MongoDB (.env may override)
+Environment=LIVE_SESSION_STORE=mongo
 EnvironmentFile=/opt/faceapp/.env
-ExecStart=/opt/faceapp/venv/bin/gunicorn --workers 3 --timeout 120 --bind 127.0.0.1:8000 run:app
+ExecStart=/opt/faceapp/venv/bin/gunicorn --workers 3 --worker-class gthread --threads 8 --timeout 120 --bind 127.0.0.1:8000 run:app
 Restart=always
 RestartSec=3
 LimitNOFILE=65535
@@ -85,11 +88,24 @@ server {
         expires 30d;
     }
 
+    location /attendance/live_ws {
+        proxy_http_version 1.1;
+        proxy_set_header Upgrade \$http_upgrade;
+        proxy_set_header Connection "upgrade";
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto \$scheme;
+        proxy_read_timeout 3600;
+        proxy_send_timeout 3600;
+        proxy_pass http://127.0.0.1:8000;
+    }
+
     location / {
-        proxy_set_header Host $host;
-        proxy_set_header X-Real-IP $remote_addr;
-        proxy_set_header X-Forwarded-For $proxy_add_x_forwarded_for;
-        proxy_set_header X-Forwarded-Proto $scheme;
+        proxy_set_header Host \$host;
+        proxy_set_header X-Real-IP \$remote_addr;
+        proxy_set_header X-Forwarded-For \$proxy_add_x_forwarded_for;
+        proxy_set_header X-Forwarded-Proto \$scheme;
         proxy_read_timeout 180;
         proxy_connect_timeout 180;
         proxy_pass http://127.0.0.1:8000;
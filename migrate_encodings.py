@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Script to migrate legacy pickle encoding files to the versioned embedding store
+Pickled galleries break across numpy versions; the store keeps a float32 .npy
+matrix plus a JSON sidecar instead
+
+Usage: python migrate_encodings.py [--no-backup] [--compact]
+"""
+
+import os
+import sys
+from app.services.embedding_store import EmbeddingStore, migrate_pickles
+
+def migrate_encodings(split_dir, keep_backup=True):
+    """Migrate every <class>.pickle in split_dir to the embedding store"""
+    
+    if not os.path.exists(split_dir):
+        print(f"Directory {split_dir} not found. Nothing to migrate.")
+        return
+    
+    report = migrate_pickles(split_dir, keep_backup=keep_backup)
+    
+    if not report:
+        print("No pickle files found to migrate.")
+        return
+    
+    print(f"Found {len(report)} pickle files to migrate:")
+    for class_id, status, detail in report:
+        if status == 'migrated':
+            print(f"  ✓ {class_id}: {detail}")
+        else:
+            print(f"  ✗ {class_id}: {detail}")
+            print(f"    This file was left in place. You may need to re-register students for this class.")
+    
+    print(f"\nMigration complete!")
+
+def compact_journals(split_dir):
+    """Fold every class journal back into its base snapshot"""
+    store = EmbeddingStore(split_dir)
+    for class_id in store.list_classes():
+        folded = store.compact(class_id)
+        if folded:
+            print(f"  ✓ {class_id}: folded {folded} journal records")
+
+if __name__ == "__main__":
+    print("Face Encoding Migration Tool")
+    print("=" * 40)
+    split_dir = os.environ.get('SPLIT_DIR', "split_encodings")
+    migrate_encodings(split_dir, keep_backup='--no-backup' not in sys.argv[1:])
+    if '--compact' in sys.argv[1:]:
+        print("\nCompacting gallery journals...")
+        compact_journals(split_dir)
@@ -0,0 +1,39 @@
+#!/usr/bin/env python3
+"""
+Script to create the MongoDB indexes the app relies on and verify its query plans
+Indexes come from the registry in app/db/indexes.py and are created only if
+missing. Every canonical query is then explained; a query planned as a
+collection scan is reported and makes the script exit with status 1
+
+Usage: python mongo_indexes.py [--check-only]
+"""
+
+import os
+import sys
+from dotenv import load_dotenv
+from pymongo import MongoClient
+from app.db.indexes import check_query_plans, ensure_indexes
+
+if __name__ == "__main__":
+    load_dotenv()
+    print("MongoDB Index Tool")
+    print("=" * 40)
+    client = MongoClient(os.environ['MONGO_URI'])
+    db = client[os.environ.get('MONGODB_DB', 'attendance_db')]
+    
+    failed = False
+    if '--check-only' not in sys.argv[1:]:
+        for collection, name, error in ensure_indexes(db):
+            if error:
+                failed = True
+                print(f"  ✗ {collection}.{name}: {error}")
+            else:
+                print(f"  ✓ {collection}.{name}")
+    
+    print("\nChecking query plans...")
+    problems = check_query_plans(db)
+    for query, stages in problems:
+        print(f"  ✗ {query}: {' <- '.join(stages)}")
+    if not problems:
+        print("  ✓ every canonical query uses an index")
+    sys.exit(1 if failed or problems else 0)
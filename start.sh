@@ -9,6 +9,12 @@ fi
 
 # Gunicorn settings
 GUNICORN_WORKERS=${GUNICORN_WORKERS:-3}
+# Threads per worker; each open live-attendance WebSocket holds one
+GUNICORN_THREADS=${GUNICORN_THREADS:-8}
 PORT=${PORT:-8000}
+# More than one worker: live sessions must be shared through MongoDB
+if [ "$GUNICORN_WORKERS" -gt 1 ]; then
+  export LIVE_SESSION_STORE=${LIVE_SESSION_STORE:-mongo}
+fi
 
-exec gunicorn --workers "$GUNICORN_WORKERS" --timeout 120 --bind 0.0.0.0:"$PORT" run:app
+exec gunicorn --workers "$GUNICORN_WORKERS" --worker-class gthread --threads "$GUNICORN_THREADS" --timeout 120 --bind 0.0.0.0:"$PORT" run:app
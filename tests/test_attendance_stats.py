@@ -0,0 +1,96 @@
+import unittest
+import os
+import sys
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.attendance_stats import (faculty_dashboard_pipeline, faculty_dashboard_stats, student_stats,
+                                      student_stats_pipeline)
+
+class TestFacultyDashboardStats(unittest.TestCase):
+    """Test cases for the faculty dashboard aggregation"""
+
+    def test_single_match_then_facet(self):
+        """Test that the faculty is matched once and every chart is a facet"""
+        pipeline = faculty_dashboard_pipeline('f@example.com', '2024-01-15')
+        self.assertEqual(pipeline[0], {'$match': {'faculty_email': 'f@example.com',
+                                                  'date': {'$gte': '2023-12-17', '$lte': '2024-01-15'}}})
+        self.assertEqual(set(pipeline[1]['$facet']), {'trend', 'matrix', 'classes', 'today'})
+        trend = pipeline[1]['$facet']['trend'][0]['$match']
+        self.assertEqual(trend['date'], {'$gte': '2023-12-17', '$lte': '2024-01-15'})
+
+    def test_history_bounded(self):
+        """Test that every facet and the initial match read a bounded window of dates"""
+        pipeline = faculty_dashboard_pipeline('f@example.com', '2024-01-15', facets=['trend'])
+        self.assertEqual(set(pipeline[1]['$facet']), {'trend'})
+        self.assertEqual(pipeline[0]['$match']['date'], {'$gte': '2023-12-17', '$lte': '2024-01-15'})
+        pipeline = faculty_dashboard_pipeline('f@example.com', '2024-01-15', days=7, matrix_days=90)
+        self.assertEqual(pipeline[0]['$match']['date']['$gte'], '2023-10-18')
+        matrix = pipeline[1]['$facet']['matrix'][0]['$match']
+        self.assertEqual(matrix['date'], {'$gte': '2023-10-18', '$lte': '2024-01-15'})
+        pipeline = faculty_dashboard_pipeline('f@example.com', '2024-01-15', days=7, facets=['matrix'])
+        self.assertEqual(pipeline[0]['$match']['date'], {'$gte': '2024-01-09', '$lte': '2024-01-15'})
+        pipeline = faculty_dashboard_pipeline('f@example.com', '2024-01-15', facets=['today'])
+        self.assertEqual(pipeline[0]['$match']['date'], {'$gte': '2024-01-15', '$lte': '2024-01-15'})
+
+    def test_result_shaped(self):
+        """Test that facet rows become the dictionaries the dashboard renders"""
+        stats = faculty_dashboard_stats({
+            'trend': [{'_id': '2024-01-14', 'count': 3}, {'_id': '2024-01-15', 'count': 5}],
+            'matrix': [{'_id': {'subject': 'DBMS', 'classroom': 'class_1'}, 'count': 8}],
+            'classes': [{'_id': {'subject': 'DBMS', 'branch': 'CE', 'semester': 3, 'section': 'A'}, 'count': 5}],
+            'today': [{'_id': 'Present', 'count': 5}, {'_id': 'Absent', 'count': 2}, {'_id': 'Late', 'count': 1}]
+        })
+        self.assertEqual(dict(stats['trend']), {'2024-01-14': 3, '2024-01-15': 5})
+        self.assertEqual(stats['matrix']['DBMS']['class_1'], 8)
+        self.assertEqual(stats['matrix']['DBMS']['class_2'], 0)
+        self.assertEqual(stats['classes'], {('DBMS', 'CE', 3, 'A'): 5})
+        self.assertEqual(stats['today'], {'Present': 5, 'Absent': 2})
+
+    def test_empty_result(self):
+        """Test that a faculty without attendance gets zero counts"""
+        stats = faculty_dashboard_stats(None)
+        self.assertEqual(stats['today'], {'Present': 0, 'Absent': 0})
+        self.assertEqual(stats['trend']['2024-01-15'], 0)
+        self.assertEqual(stats['classes'], {})
+
+class TestStudentStats(unittest.TestCase):
+    """Test cases for the student stats aggregation"""
+
+    def test_single_match_then_facet(self):
+        """Test that the student is matched once and each page section is a facet"""
+        pipeline = student_stats_pipeline('21CE001', '2024-01-08')
+        self.assertEqual(pipeline[0], {'$match': {'student.roll_no': '21CE001'}})
+        self.assertEqual(set(pipeline[1]['$facet']), {'subjects', 'weekly', 'recent'})
+        self.assertEqual(pipeline[1]['$facet']['weekly'][0]['$match']['date'], {'$gte': '2024-01-08'})
+
+    def test_subject_records_optional(self):
+        """Test that per-subject records are only collected when asked for"""
+        pipeline = student_stats_pipeline('21CE001', '2024-01-08', subject_records=0, facets=['subjects'])
+        self.assertEqual(set(pipeline[1]['$facet']), {'subjects'})
+        self.assertNotIn('records', pipeline[1]['$facet']['subjects'][-1]['$group'])
+
+    def test_result_shaped(self):
+        """Test that facet rows become per-subject, weekly and recent statistics"""
+        stats = student_stats({
+            'subjects': [
+                {'_id': 'OS', 'total': 3, 'present': 1, 'records': [
+                    {'date': '2024-01-15', 'status': 'Absent', 'faculty_email': 'f@example.com'}]},
+                {'_id': 'DBMS', 'total': 4, 'present': 3}
+            ],
+            'weekly': [{'_id': 'OS', 'total': 2, 'present': 1}],
+            'recent': [{'subject': 'OS', 'date': '2024-01-15', 'status': 'Absent'}]
+        })
+        self.assertEqual(list(stats['subjects']), ['DBMS', 'OS'])
+        self.assertEqual(stats['subjects']['DBMS']['percentage'], 75)
+        self.assertEqual(stats['subjects']['OS']['records'][0]['faculty_email'], 'f@example.com')
+        self.assertEqual(stats['weekly'], {'OS': {'present': 1, 'absent': 1, 'total': 2}})
+        self.assertEqual(stats['recent'], [{'subject': 'OS', 'date': '2024-01-15', 'status': 'Absent'}])
+
+    def test_empty_result(self):
+        """Test that a student without attendance gets empty statistics"""
+        self.assertEqual(student_stats(None), {'subjects': {}, 'weekly': {}, 'recent': []})
+
+if __name__ == '__main__':
+    unittest.main()
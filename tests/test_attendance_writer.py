@@ -0,0 +1,133 @@
+import unittest
+import os
+import sys
+import threading
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from pymongo.errors import BulkWriteError
+from services.attendance_writer import AttendanceWriter, attendance_key, attendance_upsert, bulk_upsert
+
+class BulkResult:
+    def __init__(self, upserted_count=0, modified_count=0):
+        self.upserted_count = upserted_count
+        self.modified_count = modified_count
+
+class FakeCollection:
+    """Records bulk writes; can hold them back until released"""
+
+    def __init__(self, blocked=False):
+        self.batches = []
+        self.release = threading.Event()
+        if not blocked:
+            self.release.set()
+
+    def bulk_write(self, operations, ordered=True):
+        self.release.wait(5)
+        self.batches.append(list(operations))
+        return BulkResult(upserted_count=len(operations))
+
+def record(roll_no='21CE001', name='asha', status='Present'):
+    student = {'roll_no': roll_no, 'name': name, 'status': status} if roll_no else {'name': name, 'status': status}
+    return {'date': '2024-01-15', 'subject': 'DBMS', 'faculty_email': 'f@example.com', 'classroom': 'class_1',
+            'branch': 'CE', 'semester': 3, 'section': 'A', 'student': student}
+
+class TestAttendanceUpsert(unittest.TestCase):
+    """Test cases for idempotent attendance writes"""
+
+    def test_key_on_lecture_and_roll_no(self):
+        """Test that a record is keyed on its lecture and roll number only"""
+        self.assertEqual(attendance_key(record()), {
+            'date': '2024-01-15', 'subject': 'DBMS', 'branch': 'CE', 'semester': 3, 'section': 'A',
+            'student.roll_no': '21CE001'
+        })
+
+    def test_name_only_record_keyed_on_name(self):
+        """Test that records without a roll number are told apart by name"""
+        key = attendance_key(record(roll_no=None))
+        self.assertEqual(key['student.name'], 'asha')
+        self.assertEqual(key['student.roll_no'], {'$exists': False})
+
+    def test_upsert_sets_remaining_fields(self):
+        """Test that Present overwrites while Absent only fills in missing records"""
+        present = attendance_upsert(record())._doc
+        self.assertEqual(present['$set'], {'faculty_email': 'f@example.com', 'classroom': 'class_1',
+                                           'student.name': 'asha', 'student.status': 'Present'})
+        absent = attendance_upsert(record(status='Absent'), overwrite=False)._doc
+        self.assertEqual(absent['$setOnInsert']['student.status'], 'Absent')
+
+    def test_batches_and_counts(self):
+        """Test that writes are split into unordered batches and counts summed"""
+        collection = FakeCollection()
+        counts = bulk_upsert(collection, [attendance_upsert(record(roll_no=str(i))) for i in range(5)],
+                             batch_size=2)
+        self.assertEqual([len(batch) for batch in collection.batches], [2, 2, 1])
+        self.assertEqual(counts, {'inserted': 5, 'updated': 0})
+
+    def test_duplicate_key_race_retried(self):
+        """Test that an upsert losing an insert race is retried as an update"""
+        class Racing:
+            def __init__(self):
+                self.calls = []
+
+            def bulk_write(self, operations, ordered=True):
+                self.calls.append(list(operations))
+                if len(self.calls) == 1:
+                    raise BulkWriteError({'nUpserted': 1, 'nModified': 0,
+                                          'writeErrors': [{'index': 1, 'code': 11000, 'errmsg': 'E11000'}]})
+                return BulkResult(modified_count=len(operations))
+
+        operations = [attendance_upsert(record(roll_no='1')), attendance_upsert(record(roll_no='2'))]
+        collection = Racing()
+        self.assertEqual(bulk_upsert(collection, operations), {'inserted': 1, 'updated': 1})
+        self.assertEqual(collection.calls[1], [operations[1]])
+
+class TestAttendanceWriter(unittest.TestCase):
+    """Test cases for the background attendance writer"""
+
+    def test_flush_waits_for_session_writes(self):
+        """Test that flush returns once the session's writes are applied"""
+        collection = FakeCollection()
+        writer = AttendanceWriter(collection, max_queue=10, batch_size=10)
+        writer.submit('s1', ['a', 'b'])
+        self.assertTrue(writer.flush('s1', timeout=5))
+        self.assertEqual(sorted(op for batch in collection.batches for op in batch), ['a', 'b'])
+        self.assertEqual(writer.stats()['written'], 2)
+
+    def test_flush_times_out_while_blocked(self):
+        """Test that flush gives up when the database does not answer in time"""
+        collection = FakeCollection(blocked=True)
+        writer = AttendanceWriter(collection, max_queue=10, batch_size=10)
+        writer.submit('s1', ['a'])
+        self.assertFalse(writer.flush('s1', timeout=0.05))
+        self.assertTrue(writer.flush('other', timeout=0.05))
+        collection.release.set()
+        self.assertTrue(writer.flush('s1', timeout=5))
+
+    def test_full_queue_writes_inline(self):
+        """Test that a full queue makes the caller write instead of growing"""
+        collection = FakeCollection(blocked=True)
+        writer = AttendanceWriter(collection, max_queue=1, batch_size=1, put_timeout=0.01)
+        writer.submit('s1', ['a'])  # taken by the writer thread, which then blocks
+        threading.Timer(0.2, collection.release.set).start()
+        writer.submit('s1', ['b', 'c', 'd'])
+        self.assertTrue(writer.flush('s1', timeout=5))
+        self.assertGreater(writer.stats()['inline_writes'], 0)
+        self.assertEqual(sorted(op for batch in collection.batches for op in batch), ['a', 'b', 'c', 'd'])
+
+    def test_failed_write_reported(self):
+        """Test that a failing bulk write is counted and makes flush of its session fail"""
+        class Failing:
+            def bulk_write(self, operations, ordered=True):
+                raise RuntimeError('not primary')
+
+        writer = AttendanceWriter(Failing(), max_queue=10, batch_size=10)
+        writer.submit('s1', ['a'])
+        self.assertFalse(writer.flush('s1', timeout=5))
+        self.assertTrue(writer.flush('s2', timeout=5))
+        self.assertTrue(writer.flush('s1', timeout=5))
+        self.assertEqual(writer.stats()['failed'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
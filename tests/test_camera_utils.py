@@ -0,0 +1,78 @@
+import unittest
+import numpy as np
+import os
+import sys
+import base64
+import cv2
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from utils.camera_utils import base64_to_frame, bytes_to_frame, jpeg_scale
+
+def _jpeg(width=64, height=48):
+    """A JPEG whose left half is red and right half is blue"""
+    image = np.zeros((height, width, 3), dtype=np.uint8)
+    image[:, :width // 2] = (0, 0, 255)  # red in BGR
+    image[:, width // 2:] = (255, 0, 0)  # blue in BGR
+    return cv2.imencode('.jpg', image)[1].tobytes()
+
+class TestFrameDecoding(unittest.TestCase):
+    """Test cases for decoding uploaded frames"""
+
+    def test_bytes_to_rgb(self):
+        """Test that raw JPEG bytes decode to an RGB array"""
+        frame = bytes_to_frame(_jpeg())
+        self.assertEqual(frame.shape, (48, 64, 3))
+        self.assertEqual(frame.dtype, np.uint8)
+        self.assertGreater(frame[24, 5, 0], 200)  # red first
+        self.assertGreater(frame[24, 60, 2], 200)  # blue last
+
+    def test_accepts_memoryview(self):
+        """Test that buffers from the request stream decode without a copy to bytes"""
+        self.assertEqual(bytes_to_frame(memoryview(_jpeg())).shape, (48, 64, 3))
+
+    def test_invalid_bytes(self):
+        """Test that garbage and empty bodies return None"""
+        self.assertIsNone(bytes_to_frame(b'not an image'))
+        self.assertIsNone(bytes_to_frame(b''))
+
+    def test_base64_data_url_matches_bytes(self):
+        """Test that the data URL form decodes to the same frame as the raw bytes"""
+        data = _jpeg()
+        data_url = 'data:image/jpeg;base64,' + base64.b64encode(data).decode()
+        np.testing.assert_array_equal(base64_to_frame(data_url), bytes_to_frame(data))
+
+class TestReducedDecode(unittest.TestCase):
+    """Test cases for decoding JPEGs at reduced scale"""
+
+    def test_scale_choice(self):
+        """Test that the largest reduction keeping the working size is picked"""
+        self.assertEqual(jpeg_scale(4000, 3000, 640), 4)
+        self.assertEqual(jpeg_scale(1920, 1080, 640), 2)
+        self.assertEqual(jpeg_scale(1280, 720, 640), 2)
+        self.assertEqual(jpeg_scale(1279, 720, 640), 1)
+        self.assertEqual(jpeg_scale(8000, 6000, 640), 8)
+        self.assertEqual(jpeg_scale(4000, 3000, 0), 1)
+
+    def test_large_jpeg_decoded_reduced(self):
+        """Test that a large JPEG comes out near the working size"""
+        frame = bytes_to_frame(_jpeg(2560, 1440), max_side=640)
+        self.assertEqual(frame.shape, (360, 640, 3))
+        self.assertGreater(frame[180, 10, 0], 200)  # still RGB
+
+    def test_small_input_not_upscaled(self):
+        """Test that images below the working size decode at full size"""
+        self.assertEqual(bytes_to_frame(_jpeg(320, 240), max_side=640).shape, (240, 320, 3))
+
+    def test_full_size_when_disabled(self):
+        """Test that max_side=0 decodes the full image"""
+        self.assertEqual(bytes_to_frame(_jpeg(2560, 1440), max_side=0).shape, (1440, 2560, 3))
+
+    def test_png_decoded_full_size(self):
+        """Test that formats without DCT scaling decode at full size"""
+        png = cv2.imencode('.png', np.zeros((1440, 2560, 3), dtype=np.uint8))[1].tobytes()
+        self.assertEqual(bytes_to_frame(png, max_side=640).shape, (1440, 2560, 3))
+
+if __name__ == '__main__':
+    unittest.main()
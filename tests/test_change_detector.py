@@ -0,0 +1,74 @@
+import unittest
+import numpy as np
+import os
+import sys
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.change_detector import ChangeDetector
+from services.face_tracker import FaceTracker
+
+def _frame(value=100, box=None):
+    frame = np.full((240, 320, 3), value, dtype=np.uint8)
+    if box is not None:
+        x1, y1, x2, y2 = box
+        frame[y1:y2, x1:x2] = 255
+    return frame
+
+class TestChangeDetector(unittest.TestCase):
+    """Test cases for frame change gating"""
+
+    def test_first_frame_processed(self):
+        """Test that the first frame always needs processing"""
+        self.assertTrue(ChangeDetector().changed(_frame(), 0.0))
+
+    def test_static_frames_skipped(self):
+        """Test that identical frames are skipped and counted"""
+        detector = ChangeDetector(max_skip_seconds=60)
+        results = [detector.changed(_frame(), t) for t in range(5)]
+        self.assertEqual(results, [True, False, False, False, False])
+        self.assertEqual(detector.stats(), {'frames': 5, 'skipped': 4, 'skip_ratio': 0.8})
+
+    def test_sensor_noise_ignored(self):
+        """Test that small per-pixel noise does not count as change"""
+        detector = ChangeDetector(max_skip_seconds=60)
+        rng = np.random.default_rng(0)
+        detector.changed(_frame(), 0.0)
+        noisy = np.clip(_frame().astype(np.int16) + rng.integers(-5, 6, (240, 320, 3)), 0, 255).astype(np.uint8)
+        self.assertFalse(detector.changed(noisy, 1.0))
+
+    def test_moving_region_detected(self):
+        """Test that a face-sized region appearing marks the frame changed"""
+        detector = ChangeDetector(max_skip_seconds=60)
+        detector.changed(_frame(), 0.0)
+        self.assertTrue(detector.changed(_frame(box=(100, 80, 140, 130)), 1.0))
+        self.assertFalse(detector.changed(_frame(box=(100, 80, 140, 130)), 2.0))
+
+    def test_max_skip_forces_processing(self):
+        """Test that a long unchanged stretch is processed now and then"""
+        detector = ChangeDetector(max_skip_seconds=2)
+        results = [detector.changed(_frame(), t) for t in (0.0, 1.0, 2.0, 3.0, 4.0)]
+        self.assertEqual(results, [True, False, True, False, True])
+
+    def test_disabled(self):
+        """Test that a disabled detector processes every frame"""
+        detector = ChangeDetector(enabled=False)
+        self.assertTrue(all(detector.changed(_frame(), t) for t in range(3)))
+        self.assertEqual(detector.stats()['skipped'], 0)
+
+class TestCarryForward(unittest.TestCase):
+    """Test cases for keeping tracks alive across skipped frames"""
+
+    def test_tracks_survive_skipped_frames(self):
+        """Test that carried tracks continue instead of restarting"""
+        tracker = FaceTracker(max_age=1, reverify_interval=5)
+        (track, _), = tracker.update([[0, 0, 10, 10]], 0.0)
+        for t in (0.5, 1.0, 1.5, 2.0):
+            tracker.carry_forward(t)
+        (same, _), = tracker.update([[0, 0, 10, 10]], 2.5)
+        self.assertIs(same, track)
+        self.assertEqual(tracker.stats()['tracks_started'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,134 @@
+import unittest
+import numpy as np
+import os
+import sys
+import pickle
+import shutil
+import tempfile
+import threading
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.embedding_store import EmbeddingStore, migrate_pickles
+
+class TestEmbeddingStore(unittest.TestCase):
+    """Test cases for the versioned embedding store"""
+
+    def setUp(self):
+        """Set up a temporary encodings directory"""
+        self.split_dir = tempfile.mkdtemp()
+        self.store = EmbeddingStore(self.split_dir)
+
+    def tearDown(self):
+        shutil.rmtree(self.split_dir)
+
+    def test_round_trip_is_memory_mapped(self):
+        """Test that saved galleries load back as float32 memmaps"""
+        encodings = np.random.rand(3, 512)
+        metadata = [{"roll_no": str(i), "semester": np.int64(5)} for i in range(3)]
+        self.store.save("CE_5", encodings, metadata)
+        loaded, loaded_meta = self.store.load("CE_5")
+        self.assertIsInstance(loaded, np.memmap)
+        self.assertEqual(loaded.dtype, np.float32)
+        np.testing.assert_allclose(loaded, encodings.astype(np.float32))
+        self.assertEqual(loaded_meta[0], {"roll_no": "0", "semester": 5})
+
+    def test_generation_and_stale_cleanup(self):
+        """Test that each save bumps the generation and drops old matrices"""
+        self.assertEqual(self.store.save("CE_5", np.random.rand(1, 512), [{"roll_no": "1"}]), 1)
+        self.assertEqual(self.store.save("CE_5", np.random.rand(2, 512), [{"roll_no": "1"}, {"roll_no": "2"}]), 2)
+        matrices = [f for f in os.listdir(self.split_dir) if f.endswith('.npy')]
+        self.assertEqual(matrices, ["CE_5.2.npy"])
+
+    def test_empty_gallery(self):
+        """Test saving and loading a class with no registrations"""
+        self.store.save("CE_5", [], [])
+        encodings, metadata = self.store.load("CE_5")
+        self.assertEqual(len(encodings), 0)
+        self.assertEqual(metadata, [])
+        self.assertEqual(self.store.load("IT_1"), (None, None))
+
+    def test_migrate_pickles(self):
+        """Test one-shot migration of legacy pickle galleries"""
+        legacy = {'encodings': [np.random.rand(512) for _ in range(2)],
+                  'metadata': [{"roll_no": "1"}, {"roll_no": "2"}]}
+        with open(os.path.join(self.split_dir, "IT_3.pickle"), 'wb') as f:
+            pickle.dump(legacy, f)
+        self.assertEqual(len(self.store.load("IT_3")[1]), 2)
+
+        report = migrate_pickles(self.split_dir)
+        self.assertEqual(report[0][:2], ("IT_3", "migrated"))
+        self.assertFalse(os.path.exists(os.path.join(self.split_dir, "IT_3.pickle")))
+        self.assertTrue(os.path.exists(os.path.join(self.split_dir, "IT_3.pickle.bak")))
+        encodings, metadata = self.store.load("IT_3")
+        np.testing.assert_allclose(encodings, np.array(legacy['encodings'], dtype=np.float32))
+        self.assertEqual(self.store.list_classes(), ["IT_3"])
+
+    def test_migrate_keeps_journaled_changes(self):
+        """Test that changes journaled over a legacy pickle survive the migration"""
+        legacy = {'encodings': [np.ones(512)], 'metadata': [{"roll_no": "1"}]}
+        with open(os.path.join(self.split_dir, "IT_3.pickle"), 'wb') as f:
+            pickle.dump(legacy, f)
+        self.store.upsert("IT_3", np.full(512, 2.0), {"roll_no": "2"})
+
+        migrate_pickles(self.split_dir)
+        encodings, metadata = self.store.load("IT_3")
+        self.assertEqual([m["roll_no"] for m in metadata], ["1", "2"])
+        np.testing.assert_allclose(encodings[:, 0], [1.0, 2.0])
+        self.assertEqual(self.store.journal_length("IT_3"), 0)
+
+    def test_journal_upsert_and_tombstone(self):
+        """Test that journaled changes are merged over the snapshot"""
+        self.store.save("CE_5", np.ones((2, 512)), [{"roll_no": "1"}, {"roll_no": "2"}])
+        self.store.upsert("CE_5", np.full(512, 2.0), {"roll_no": "2", "name": "edited"})
+        self.store.upsert("CE_5", np.full(512, 3.0), {"roll_no": "3"})
+        self.store.tombstone("CE_5", "1")
+        encodings, metadata = self.store.load("CE_5")
+        self.assertEqual([m["roll_no"] for m in metadata], ["2", "3"])
+        self.assertEqual(metadata[0]["name"], "edited")
+        np.testing.assert_allclose(encodings[:, 0], [2.0, 3.0])
+        self.assertEqual(self.store.journal_length("CE_5"), 3)
+
+    def test_compaction_folds_journal(self):
+        """Test that compaction rewrites the snapshot and empties the journal"""
+        self.store.upsert("IT_1", np.ones(512), {"roll_no": "7"})
+        before = self.store.load("IT_1")
+        self.assertEqual(self.store.compact("IT_1"), 1)
+        self.assertEqual(self.store.journal_length("IT_1"), 0)
+        encodings, metadata = self.store.load("IT_1")
+        self.assertIsInstance(encodings, np.memmap)
+        self.assertEqual(metadata, before[1])
+
+    def test_load_during_compaction(self):
+        """Test that a compaction between reading the snapshot and the journal loses nothing"""
+        self.store.save("CE_5", np.ones((1, 512)), [{"roll_no": "1"}])
+        self.store.upsert("CE_5", np.full(512, 2.0), {"roll_no": "2"})
+        compactor = EmbeddingStore(self.split_dir)
+        read_journal = self.store._read_journal
+        calls = []
+
+        def compact_then_read(class_id):
+            if not calls:
+                compactor.compact(class_id)
+            calls.append(class_id)
+            return read_journal(class_id)
+
+        self.store._read_journal = compact_then_read
+        _, metadata = self.store.load("CE_5")
+        self.assertEqual([m["roll_no"] for m in metadata], ["1", "2"])
+        self.assertEqual(len(calls), 2)
+
+    def test_background_compaction(self):
+        """Test that crossing the threshold compacts the journal off-thread"""
+        store = EmbeddingStore(self.split_dir, compact_threshold=3)
+        for i in range(3):
+            store.upsert("IT_2", np.random.rand(512), {"roll_no": str(i)})
+        for thread in threading.enumerate():
+            if thread.name.startswith("gallery-compact-"):
+                thread.join()
+        self.assertEqual(store.journal_length("IT_2"), 0)
+        self.assertEqual(len(store.load("IT_2")[1]), 3)
+
+if __name__ == '__main__':
+    unittest.main()
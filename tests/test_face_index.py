@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+import os
+import sys
+import shutil
+import tempfile
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.embedding_store import EmbeddingStore
+from services.face_index import FaceIndex
+
+def _unit(v):
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+class TestFaceIndex(unittest.TestCase):
+    """Test cases for the institution-wide face index"""
+
+    def setUp(self):
+        """Register a few students across two classes"""
+        self.split_dir = tempfile.mkdtemp()
+        self.store = EmbeddingStore(self.split_dir)
+        rng = np.random.default_rng(1)
+        self.faces = _unit(rng.normal(size=(6, 512))).astype(np.float32)
+        self.store.save("CE_1", self.faces[:3], [{"roll_no": str(i)} for i in range(3)])
+        self.store.save("IT_2", self.faces[3:], [{"roll_no": str(i)} for i in range(3, 6)])
+        self.index = FaceIndex(self.split_dir, refresh_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.split_dir)
+
+    def test_nearest_across_classes(self):
+        """Test that the nearest registered face and its class are found"""
+        match = self.index.nearest(self.faces[4] + 0.01, tolerance=0.85)
+        self.assertEqual(match['class_id'], "IT_2")
+        self.assertEqual(match['metadata']['roll_no'], "4")
+        stranger = _unit(np.random.default_rng(2).normal(size=512))
+        self.assertIsNone(self.index.nearest(stranger, tolerance=0.85))
+
+    def test_insert_and_remove(self):
+        """Test that in-process writes are visible immediately"""
+        self.index.refresh_interval = 3600
+        self.index.refresh(force=True)
+        new_face = _unit(np.random.default_rng(3).normal(size=512))
+        self.index.insert("CE_1", new_face, {"roll_no": "9"})
+        self.assertEqual(self.index.nearest(new_face, tolerance=0.1)['metadata']['roll_no'], "9")
+        self.index.remove("CE_1", "9")
+        self.assertIsNone(self.index.nearest(new_face, tolerance=0.1))
+
+    def test_refresh_picks_up_store_changes(self):
+        """Test that journal writes from other processes are reconciled"""
+        self.assertEqual(self.index.find_key("1"), [("CE_1", {"roll_no": "1"})])
+        self.store.tombstone("CE_1", "1")
+        self.store.upsert("IT_2", self.faces[1], {"roll_no": "1"})
+        self.assertEqual(self.index.find_key("1"), [("IT_2", {"roll_no": "1"})])
+        self.assertEqual(len(self.index.entries()), 6)
+
+if __name__ == '__main__':
+    unittest.main()
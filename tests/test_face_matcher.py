@@ -0,0 +1,52 @@
+import unittest
+import numpy as np
+import os
+import sys
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.face_matcher import match_embeddings
+
+def _unit(v):
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+class TestFaceMatcher(unittest.TestCase):
+    """Test cases for batched gallery matching"""
+
+    def setUp(self):
+        """Build a gallery of averaged embeddings like registration does"""
+        rng = np.random.default_rng(0)
+        self.gallery = np.mean(_unit(rng.normal(size=(60, 3, 512))), axis=1).astype(np.float32)
+        self.metadata = [{"roll_no": str(i)} for i in range(60)]
+        noise = rng.normal(scale=0.02, size=(30, 512))
+        self.faces = _unit(self.gallery[:30] + noise).astype(np.float32)
+
+    def test_matches_per_face_loop(self):
+        """Test that decisions equal the per-face L2 loop"""
+        for tolerance in (0.5, 0.85, 1.2):
+            matches = match_embeddings(self.faces, self.gallery, self.metadata, tolerance=tolerance)
+            for face, match in zip(self.faces, matches):
+                dists = np.linalg.norm(self.gallery - face, axis=1)
+                expected = int(np.argmin(dists)) if np.min(dists) < tolerance else None
+                self.assertEqual(match['index'], expected)
+                self.assertAlmostEqual(match['distance'], float(np.min(dists)), places=4)
+
+    def test_top_k_sorted(self):
+        """Test that top-k candidates come back nearest first"""
+        matches = match_embeddings(self.faces[:2], self.gallery, top_k=5)
+        for match in matches:
+            dists = [d for _, d in match['top_k']]
+            self.assertEqual(len(dists), 5)
+            self.assertEqual(dists, sorted(dists))
+            self.assertEqual(match['top_k'][0][0], match['index'])
+
+    def test_empty_inputs(self):
+        """Test that empty frames and empty galleries are handled"""
+        self.assertEqual(match_embeddings([], self.gallery), [])
+        matches = match_embeddings(self.faces[:2], [])
+        self.assertEqual(len(matches), 2)
+        self.assertIsNone(matches[0]['index'])
+
+if __name__ == '__main__':
+    unittest.main()
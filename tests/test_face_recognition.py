@@ -6,7 +6,7 @@ import sys
 # Add the app directory to the path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
 
-from services.face_recognition import FaceRecognitionService
+from services.face_recognition import FaceRecognitionService, get_face_service
 
 class TestFaceRecognition(unittest.TestCase):
     """Test cases for face recognition functionality"""
@@ -34,6 +34,18 @@ class TestFaceRecognition(unittest.TestCase):
         # Should not crash, may or may not find faces
         self.assertIsInstance(faces, list)
     
+    def test_get_faces_batch_blank_images(self):
+        """Test batched detection returns one (empty) result list per image"""
+        blank_images = [np.zeros((100, 100, 3), dtype=np.uint8) for _ in range(3)]
+        results = self.face_service.get_faces_batch(blank_images)
+        self.assertEqual(results, [[], [], []])
+    
+    def test_detect_faces_blank_image(self):
+        """Test detection-only path on an image without faces"""
+        blank_image = np.zeros((100, 100, 3), dtype=np.uint8)
+        self.assertEqual(self.face_service.detect_faces(blank_image), [])
+        self.assertEqual(self.face_service.embed_faces([]), [])
+    
     def test_compare_faces_empty(self):
         """Test face comparison with empty encodings"""
         known_encodings = []
@@ -63,6 +75,34 @@ class TestFaceRecognition(unittest.TestCase):
         result, distance = self.face_service.find_matching_face(known_encodings, known_metadata, None)
         self.assertIsNone(result)
         self.assertIsNone(distance)
+    
+    def test_shared_service_is_reused(self):
+        """Test that the process-wide service is loaded once and warmed up"""
+        service = get_face_service()
+        self.assertIs(service, get_face_service())
+        self.assertTrue(service.warmed_up)
+        self.assertIsNotNone(service.status()['load_time'])
+
+class TestServiceHelpers(unittest.TestCase):
+    """Test cases for service helpers that need no model"""
+
+    def test_non_positive_batch_embeds_one_at_a_time(self):
+        """Test that a zero or negative batch size still embeds every crop"""
+        class FakeModel:
+            input_shape = ['None', 3, 112, 112]
+
+            def __init__(self):
+                self.calls = []
+
+            def get_feat(self, crops):
+                self.calls.append(len(crops))
+                return [np.zeros(512) for _ in crops]
+
+        for max_batch in (0, -4):
+            model = FakeModel()
+            feats = FaceRecognitionService._embed_crops(None, model, ['a', 'b', 'c'], max_batch)
+            self.assertEqual(len(feats), 3)
+            self.assertEqual(model.calls, [1, 1, 1])
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
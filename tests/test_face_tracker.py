@@ -0,0 +1,101 @@
+import unittest
+import numpy as np
+import os
+import sys
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.face_tracker import FaceTracker, iou_matrix, track_and_recognize
+from services.gallery_cache import Gallery
+
+class _Face:
+    def __init__(self, bbox, identity):
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        self.identity = identity
+        self.embedding = None
+
+    @property
+    def normed_embedding(self):
+        return self.embedding
+
+class _StaticClassroom:
+    """Face service stand-in: the same students sit still in every frame"""
+
+    def __init__(self, gallery_rows):
+        self.gallery_rows = gallery_rows
+        self.embedded = 0
+
+    def detect_faces(self, image):
+        return [_Face([i * 50, 10, i * 50 + 40, 50], i) for i in range(len(self.gallery_rows))]
+
+    def embed_faces(self, items):
+        for _, face in items:
+            face.embedding = self.gallery_rows[face.identity]
+        self.embedded += len(items)
+        return [face for _, face in items]
+
+class TestFaceTracker(unittest.TestCase):
+    """Test cases for the IoU face tracker"""
+
+    def test_iou(self):
+        """Test IoU of identical, overlapping and disjoint boxes"""
+        ious = iou_matrix([[0, 0, 10, 10]], [[0, 0, 10, 10], [5, 0, 15, 10], [20, 20, 30, 30]])
+        np.testing.assert_allclose(ious[0], [1.0, 1 / 3, 0.0], rtol=1e-5)
+
+    def test_track_continues_and_reverifies(self):
+        """Test that a still face keeps its track and is re-verified on schedule"""
+        tracker = FaceTracker(iou_threshold=0.3, max_age=2, reverify_interval=5, retry_interval=1)
+        (track, needs), = tracker.update([[0, 0, 10, 10]], 0.0)
+        self.assertTrue(needs)
+        tracker.vote(track, 'A')
+        (same, needs), = tracker.update([[1, 0, 11, 10]], 0.5)
+        self.assertIs(same, track)
+        self.assertFalse(needs)
+        (_, needs), = tracker.update([[1, 0, 11, 10]], 5.0)
+        self.assertTrue(needs)
+
+    def test_unidentified_track_retries_sooner(self):
+        """Test that a track without an identity is retried on the retry interval"""
+        tracker = FaceTracker(reverify_interval=5, retry_interval=1)
+        tracker.update([[0, 0, 10, 10]], 0.0)
+        (_, needs), = tracker.update([[0, 0, 10, 10]], 1.0)
+        self.assertTrue(needs)
+
+    def test_expired_track_keeps_identity(self):
+        """Test that identities survive the end of their track"""
+        tracker = FaceTracker(max_age=1)
+        (track, _), = tracker.update([[0, 0, 10, 10]], 0.0)
+        tracker.vote(track, 'A')
+        (other, needs), = tracker.update([[0, 0, 10, 10]], 5.0)
+        self.assertIsNot(other, track)
+        self.assertTrue(needs)
+        self.assertEqual(tracker.identities(), {'A'})
+
+    def test_track_vote(self):
+        """Test that the majority identity wins the track-level vote"""
+        tracker = FaceTracker(min_votes=2)
+        (track, _), = tracker.update([[0, 0, 10, 10]], 0.0)
+        tracker.vote(track, 'A')
+        self.assertIsNone(track.identity(tracker.min_votes))
+        tracker.vote(track, 'B')
+        tracker.vote(track, 'B')
+        self.assertEqual(track.identity(tracker.min_votes), 'B')
+
+    def test_static_footage_recognition_drop(self):
+        """Test that a minute of still classroom at 2 fps recognizes each face ~once per 5 s"""
+        rng = np.random.default_rng(0)
+        rows = rng.normal(size=(5, 512)).astype(np.float32)
+        gallery = Gallery('CE_1', rows, [{'roll_no': str(i)} for i in range(5)])
+        service = _StaticClassroom(rows)
+        tracker = FaceTracker(reverify_interval=5)
+        frame = np.zeros((60, 260, 3), dtype=np.uint8)
+        for i in range(120):
+            track_and_recognize(service, tracker, [frame], [i * 0.5], gallery, 0.85,
+                                lambda metadata: metadata['roll_no'])
+        self.assertEqual(tracker.identities(), {'0', '1', '2', '3', '4'})
+        self.assertEqual(tracker.stats()['detections'], 600)
+        self.assertLessEqual(service.embedded, 60)
+
+if __name__ == '__main__':
+    unittest.main()
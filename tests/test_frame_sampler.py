@@ -0,0 +1,89 @@
+import unittest
+import numpy as np
+import os
+import sys
+import shutil
+import tempfile
+import cv2
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.frame_sampler import FrameSampler
+
+class TestFrameSampler(unittest.TestCase):
+    """Test cases for video frame sampling"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Write a 3 second, 30 fps video whose frame i has pixel value i"""
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.video_path = os.path.join(cls.tmp_dir, 'clip.avi')
+        writer = cv2.VideoWriter(cls.video_path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (64, 48))
+        for i in range(90):
+            writer.write(np.full((48, 64, 3), i, dtype=np.uint8))
+        writer.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def _sample(self, sampler, start_frame=0, end_frame=None):
+        capture = cv2.VideoCapture(self.video_path)
+        try:
+            return [(index, int(round(frame[0, 0, 0])))
+                    for index, _, frame in sampler.frames(capture, start_frame, end_frame)]
+        finally:
+            capture.release()
+
+    def test_grab_stride(self):
+        """Test that grab mode samples every stride-th frame"""
+        sampler = FrameSampler(sample_fps=2, max_frames=0, seek_mode='grab')
+        frames = self._sample(sampler)
+        self.assertEqual([index for index, _ in frames], [0, 15, 30, 45, 60, 75])
+        for index, value in frames:
+            self.assertAlmostEqual(value, index, delta=2)
+        report = sampler.report()
+        self.assertFalse(report['seek'])
+        self.assertEqual(report['frames_grabbed'], 70)
+        self.assertAlmostEqual(report['sample_fps_achieved'], 2.0)
+
+    def test_seek_matches_grab(self):
+        """Test that seeking lands on the same frames as grabbing"""
+        grabbed = self._sample(FrameSampler(sample_fps=1, max_frames=0, seek_mode='grab'))
+        sampler = FrameSampler(sample_fps=1, max_frames=0, seek_mode='seek')
+        sought = self._sample(sampler)
+        self.assertEqual([i for i, _ in sought], [i for i, _ in grabbed])
+        for (_, a), (_, b) in zip(sought, grabbed):
+            self.assertAlmostEqual(a, b, delta=2)
+        self.assertEqual(sampler.report()['seeks'], 2)
+
+    def test_max_frames_widens_stride(self):
+        """Test that the stride widens so the whole video fits in max_frames"""
+        sampler = FrameSampler(sample_fps=0, max_frames=4, seek_mode='auto', seek_min_stride=10)
+        frames = self._sample(sampler)
+        self.assertEqual([index for index, _ in frames], [0, 23, 46, 69])
+        self.assertEqual(sampler.report()['frames_expected'], 4)
+
+    def test_every_frame(self):
+        """Test that sample_fps=0 without a cap reads every frame"""
+        sampler = FrameSampler(sample_fps=0, max_frames=0)
+        self.assertEqual(len(self._sample(sampler)), 90)
+
+    def test_ranges_cover_full_pass(self):
+        """Test that sampling consecutive ranges yields the frames of one full pass"""
+        full = self._sample(FrameSampler(sample_fps=4, max_frames=0, seek_mode='grab'))
+        pieces = []
+        for start, end in [(0, 31), (31, 64), (64, 90)]:
+            pieces.extend(self._sample(FrameSampler(sample_fps=4, max_frames=0, seek_mode='grab'), start, end))
+        self.assertEqual([i for i, _ in pieces], [i for i, _ in full])
+        for (_, a), (_, b) in zip(pieces, full):
+            self.assertAlmostEqual(a, b, delta=2)
+
+    def test_invalid_mode(self):
+        """Test that an unknown seek mode is rejected"""
+        with self.assertRaises(ValueError):
+            FrameSampler(seek_mode='fast')
+
+if __name__ == '__main__':
+    unittest.main()
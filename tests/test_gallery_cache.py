@@ -0,0 +1,66 @@
+import unittest
+import numpy as np
+import os
+import sys
+import shutil
+import tempfile
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.gallery_cache import GalleryCache
+from services.embedding_store import EmbeddingStore
+
+class TestGalleryCache(unittest.TestCase):
+    """Test cases for the in-process gallery cache"""
+
+    def setUp(self):
+        """Set up a temporary encodings directory"""
+        self.split_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.split_dir)
+
+    def _write_class(self, class_id, count):
+        encodings = [np.random.rand(512) for _ in range(count)]
+        metadata = [{"roll_no": str(i), "name": f"student{i}"} for i in range(count)]
+        EmbeddingStore(self.split_dir).save(class_id, encodings, metadata)
+
+    def test_missing_class(self):
+        """Test that a class without an encoding file returns None"""
+        cache = GalleryCache(self.split_dir)
+        self.assertIsNone(cache.get("CE_1"))
+
+    def test_hit_after_first_load(self):
+        """Test that repeated lookups are served from memory as float32"""
+        self._write_class("CE_1", 3)
+        cache = GalleryCache(self.split_dir)
+        first = cache.get("CE_1")
+        second = cache.get("CE_1")
+        self.assertIs(first, second)
+        self.assertEqual(first.encodings.dtype, np.float32)
+        self.assertEqual(first.encodings.shape, (3, 512))
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['hits'], 1)
+
+    def test_reload_on_file_change(self):
+        """Test that a rewritten encoding file is picked up on revalidation"""
+        self._write_class("CE_1", 2)
+        cache = GalleryCache(self.split_dir, revalidate_interval=0)
+        self.assertEqual(len(cache.get("CE_1")), 2)
+        self._write_class("CE_1", 5)
+        self.assertEqual(len(cache.get("CE_1")), 5)
+
+    def test_lru_eviction(self):
+        """Test that the least recently used gallery is evicted over budget"""
+        self._write_class("CE_1", 4)
+        self._write_class("CE_2", 4)
+        cache = GalleryCache(self.split_dir, max_bytes=4 * 512 * 4)
+        cache.get("CE_1")
+        cache.get("CE_2")
+        stats = cache.stats()
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['evictions'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
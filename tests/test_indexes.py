@@ -0,0 +1,102 @@
+import unittest
+import os
+import sys
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from pymongo.errors import OperationFailure
+from db.indexes import (ATTENDANCE_KEY_FIELDS, CANONICAL_QUERIES, INDEXES, check_query_plans, ensure_indexes,
+                        plan_stages)
+from services.attendance_writer import ATTENDANCE_KEY
+
+IXSCAN_PLAN = {'stage': 'FETCH', 'inputStage': {'stage': 'IXSCAN', 'indexName': 'students_class'}}
+COLLSCAN_PLAN = {'stage': 'COLLSCAN', 'filter': {}}
+
+class FakeCursor:
+    def __init__(self, plan):
+        self.plan = plan
+        self.sorted_by = None
+
+    def sort(self, keys):
+        self.sorted_by = keys
+        return self
+
+    def explain(self):
+        return {'queryPlanner': {'winningPlan': self.plan}}
+
+class FakeCollection:
+    def __init__(self, plan=IXSCAN_PLAN, fail_code=None):
+        self.plan = plan
+        self.fail_code = fail_code
+        self.created = []
+
+    def create_index(self, keys, name=None, **options):
+        if self.fail_code:
+            raise OperationFailure('index build failed', code=self.fail_code)
+        self.created.append((name, keys, options))
+
+    def find(self, query):
+        return FakeCursor(self.plan)
+
+class FakeDatabase(dict):
+    def __missing__(self, name):
+        self[name] = FakeCollection()
+        return self[name]
+
+class TestIndexRegistry(unittest.TestCase):
+    """Test cases for the MongoDB index registry"""
+
+    def test_attendance_key_matches_writer(self):
+        """Test that the unique index covers exactly the fields upserts are keyed on"""
+        self.assertEqual(ATTENDANCE_KEY_FIELDS, ATTENDANCE_KEY)
+
+    def test_every_query_has_a_candidate_index(self):
+        """Test that each canonical query filters on the leading field of some index"""
+        for query in CANONICAL_QUERIES:
+            leading = {spec['keys'][0][0] for spec in INDEXES if spec['collection'] == query['collection']}
+            self.assertTrue(leading & set(query['filter']), query['name'])
+
+    def test_ensure_creates_all(self):
+        """Test that every registered index is created with its name and options"""
+        db = FakeDatabase()
+        report = ensure_indexes(db)
+        self.assertEqual(len(report), len(INDEXES))
+        self.assertTrue(all(error is None for _, _, error in report))
+        ttl = db['live_sessions'].created[0]
+        self.assertEqual(ttl[0], 'live_sessions_expires_at')
+        self.assertEqual(ttl[2], {'expireAfterSeconds': 0})
+
+    def test_ensure_only_selected_collections(self):
+        """Test that ensuring one collection leaves the others alone"""
+        db = FakeDatabase()
+        ensure_indexes(db, collections=['students'])
+        self.assertEqual(set(db), {'students'})
+
+    def test_ensure_reports_conflicts(self):
+        """Test that an index existing with other options is reported, not raised"""
+        db = FakeDatabase()
+        db['faculty'] = FakeCollection(fail_code=85)
+        report = {name: error for _, name, error in ensure_indexes(db)}
+        self.assertIn('different options', report['faculty_email'])
+        self.assertIsNone(report['students_class'])
+
+class TestQueryPlans(unittest.TestCase):
+    """Test cases for the COLLSCAN check"""
+
+    def test_plan_stages(self):
+        """Test that nested classic and slot-based plans are flattened"""
+        self.assertEqual(plan_stages(IXSCAN_PLAN), ['FETCH', 'IXSCAN'])
+        sbe = {'queryPlan': {'stage': 'SORT', 'inputStage': {'stage': 'OR', 'inputStages': [
+            {'stage': 'IXSCAN'}, {'stage': 'COLLSCAN'}]}}}
+        self.assertEqual(plan_stages(sbe), ['SORT', 'OR', 'IXSCAN', 'COLLSCAN'])
+
+    def test_collscan_reported(self):
+        """Test that only queries planned as collection scans are reported"""
+        db = FakeDatabase()
+        db['faculty'] = FakeCollection(plan=COLLSCAN_PLAN)
+        problems = check_query_plans(db)
+        self.assertEqual(problems, [('faculty by email', ['COLLSCAN'])])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import os
+import sys
+from unittest import mock
+
+# Route helpers are imported through the app package
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.routes import attendance_routes
+from app.services.attendance_writer import AttendanceWriter, attendance_upsert
+
+LECTURE = {'date': '2024-01-15', 'subject': 'DBMS', 'faculty_email': 'f@example.com', 'classroom': 'class_1',
+           'branch': 'CE', 'semester': 3, 'section': 'A'}
+
+class FakeAttendanceService:
+    """Records saved attendance instead of writing to MongoDB"""
+
+    def __init__(self):
+        self.saved = []
+
+    def save_attendance(self, records, overwrite=True):
+        self.saved.extend((record['student'].get('roll_no'), record['student']['status'], overwrite)
+                          for record in records)
+        return {'inserted': len(records), 'updated': 0}
+
+    def get_students_for_class(self, branch, semester, section):
+        return [{'roll_no': '1', 'name': 'asha'}, {'roll_no': '2', 'name': 'ravi'},
+                {'roll_no': '3', 'name': 'meera'}]
+
+class TestSaveLiveAttendance(unittest.TestCase):
+    """Test cases for saving a stopped live session"""
+
+    def test_present_written_when_background_write_failed(self):
+        """Test that recognized students are saved Present even if their queued upserts failed"""
+        class Failing:
+            def bulk_write(self, operations, ordered=True):
+                raise RuntimeError('not primary')
+
+        writer = AttendanceWriter(Failing(), max_queue=10, batch_size=10)
+        writer.submit('s1', [attendance_upsert(attendance_routes._live_attendance_record(LECTURE, roll_no, name,
+                                                                                       'Present'))
+                             for roll_no, name in (('1', 'asha'), ('2', 'ravi'))])
+        service = FakeAttendanceService()
+        session_data = {'session_id': 's1', 'faculty_email': 'f@example.com', 'class_id': 'CE_3',
+                        'lecture': LECTURE, 'recognized_students': {'1_asha', '2_ravi'}}
+        with mock.patch.object(attendance_routes, 'get_attendance_writer', return_value=writer), \
+                mock.patch.object(attendance_routes, 'AttendanceService', return_value=service):
+            self.assertEqual(attendance_routes._save_live_attendance(session_data), 2)
+
+        self.assertEqual(writer.stats()['failed'], 2)
+        self.assertEqual(sorted(service.saved), [('1', 'Present', True), ('2', 'Present', True),
+                                                 ('3', 'Absent', False)])
+
+if __name__ == '__main__':
+    unittest.main()
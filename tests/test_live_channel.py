@@ -0,0 +1,71 @@
+import unittest
+import os
+import sys
+import queue
+import threading
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.live_channel import LiveFrameChannel
+
+class _FakeSocket:
+    """WebSocket stand-in fed from a queue; None in the queue closes it"""
+
+    def __init__(self):
+        self.messages = queue.Queue()
+
+    def receive(self, timeout=None):
+        try:
+            message = self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+        if message is None:
+            raise ConnectionError('closed')
+        return message
+
+class TestLiveFrameChannel(unittest.TestCase):
+    """Test cases for the latest-frame WebSocket buffer"""
+
+    def test_only_latest_frame_kept(self):
+        """Test that frames arriving during processing replace each other"""
+        channel = LiveFrameChannel(_FakeSocket(), idle_timeout=1)
+        for i in range(5):
+            channel.put(bytes([i]))
+        self.assertEqual(channel.next_frame(), bytes([4]))
+        self.assertEqual(channel.stats(), {'received': 5, 'processed': 1, 'dropped': 4})
+
+    def test_reader_feeds_frames(self):
+        """Test that binary messages reach the processing loop and text is ignored"""
+        ws = _FakeSocket()
+        channel = LiveFrameChannel(ws, idle_timeout=2)
+        channel.start()
+        ws.messages.put('hello')
+        ws.messages.put(b'frame')
+        self.assertEqual(channel.next_frame(), b'frame')
+        ws.messages.put('stop')
+        self.assertIsNone(channel.next_frame())
+
+    def test_connection_close_ends_loop(self):
+        """Test that a closed socket wakes a waiting processing loop"""
+        ws = _FakeSocket()
+        channel = LiveFrameChannel(ws, idle_timeout=5)
+        channel.start()
+        result = []
+        waiter = threading.Thread(target=lambda: result.append(channel.next_frame()))
+        waiter.start()
+        ws.messages.put(None)
+        waiter.join(timeout=2)
+        self.assertFalse(waiter.is_alive())
+        self.assertEqual(result, [None])
+
+    def test_idle_timeout(self):
+        """Test that a silent client closes the channel after the idle timeout"""
+        channel = LiveFrameChannel(_FakeSocket(), idle_timeout=0.1)
+        start = time.perf_counter()
+        self.assertIsNone(channel.next_frame())
+        self.assertLess(time.perf_counter() - start, 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,65 @@
+import unittest
+import os
+import sys
+import threading
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.live_events import SessionEvents, format_sse
+
+class TestSessionEvents(unittest.TestCase):
+    """Test cases for the live session change log"""
+
+    def test_resume_after_id(self):
+        """Test that a client resuming from an id gets only later events"""
+        events = SessionEvents()
+        for i in range(3):
+            events.publish('update', {'n': i})
+        self.assertEqual([item[0] for item in events.since(1)], [2, 3])
+        self.assertEqual(events.since(3), [])
+
+    def test_trimmed_log_needs_snapshot(self):
+        """Test that resuming past the retained events is refused"""
+        events = SessionEvents(max_events=2)
+        for i in range(5):
+            events.publish('update', {'n': i})
+        self.assertIsNone(events.since(1))
+        self.assertEqual([item[0] for item in events.since(3)], [4, 5])
+
+    def test_unknown_id_needs_snapshot(self):
+        """Test that an id from another session or server is refused"""
+        events = SessionEvents()
+        events.publish('update', {})
+        self.assertIsNone(events.since(7))
+
+    def test_wait_wakes_on_publish(self):
+        """Test that a waiting stream wakes as soon as an event is published"""
+        events = SessionEvents()
+        timer = threading.Timer(0.05, events.publish, ('update', {'new_students': ['1_a']}))
+        timer.start()
+        start = time.perf_counter()
+        pending = events.wait(0, timeout=5)
+        self.assertLess(time.perf_counter() - start, 2)
+        self.assertEqual(pending, [(1, 'update', {'new_students': ['1_a']})])
+
+    def test_wait_timeout_is_heartbeat(self):
+        """Test that waiting without changes returns an empty list"""
+        self.assertEqual(SessionEvents().wait(0, timeout=0.05), [])
+
+    def test_close_publishes_end_once(self):
+        """Test that closing publishes a single end event"""
+        events = SessionEvents()
+        events.close({'count': 2})
+        events.close({'count': 3})
+        self.assertTrue(events.closed)
+        self.assertEqual(events.since(0), [(1, 'end', {'count': 2})])
+
+    def test_format(self):
+        """Test the text/event-stream encoding"""
+        self.assertEqual(format_sse(4, 'update', {'total_recognized': 1}),
+                         'id: 4\nevent: update\ndata: {"total_recognized": 1}\n\n')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,244 @@
+import unittest
+import os
+import sys
+import threading
+import time
+import io
+from contextlib import redirect_stdout
+from unittest import mock
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+import services.live_sessions as live_sessions
+from services.live_sessions import MemorySessionStore, MongoSessionStore, SessionReaper, TimingWindow
+
+class TestMemorySessionStore(unittest.TestCase):
+    """Test cases for the in-process live session store"""
+
+    def setUp(self):
+        self.store = MemorySessionStore()
+        self.store.create('s1', 'faculty@example.com', 'CE_1')
+
+    def test_create_and_get(self):
+        """Test that a new session is active, empty and returned as a copy"""
+        session = self.store.get('s1')
+        self.assertTrue(session['is_active'])
+        self.assertEqual(session['class_id'], 'CE_1')
+        self.assertEqual(session['recognized_students'], set())
+        session['recognized_students'].add('1_a')
+        self.assertEqual(self.store.get('s1')['recognized_students'], set())
+        self.assertIsNone(self.store.get('missing'))
+
+    def test_record_frame_merges_students(self):
+        """Test that each frame reports only students not seen before"""
+        first = self.store.record_frame('s1', {'1_a', '2_b'}, False)
+        self.assertEqual(first['new_students'], {'1_a', '2_b'})
+        self.assertTrue(first['newly_verified'])
+        second = self.store.record_frame('s1', {'2_b', '3_c'}, False)
+        self.assertEqual(second['new_students'], {'3_c'})
+        self.assertEqual(second['total_recognized'], 3)
+        self.assertFalse(second['newly_verified'])
+
+    def test_skipped_frames_count_for_gating(self):
+        """Test that skipped frames are counted and do not verify the model"""
+        result = self.store.record_frame('s1', set(), True)
+        self.assertFalse(result['model_verified'])
+        self.assertEqual(result['gating'], {'frames': 1, 'skipped': 1, 'skip_ratio': 1.0})
+        self.store.record_frame('s1', set(), False)
+        self.assertEqual(self.store.get('s1')['gating']['skip_ratio'], 0.5)
+
+    def test_deactivate_once(self):
+        """Test that only the first stop gets the session and later frames are refused"""
+        self.store.record_frame('s1', {'1_a'}, False)
+        stopped = self.store.deactivate('s1')
+        self.assertEqual(stopped['recognized_students'], {'1_a'})
+        self.assertIsNone(self.store.deactivate('s1'))
+        self.assertIsNone(self.store.record_frame('s1', {'2_b'}, False))
+        self.assertEqual(self.store.count(), 0)
+
+    def test_delete_drops_runtime(self):
+        """Test that deleting a session forgets its events and per-process state"""
+        runtime = self.store.runtime('s1')
+        runtime['tracker'] = object()
+        self.store.delete('s1')
+        self.assertIsNone(self.store.get('s1'))
+        self.assertIsNone(self.store.events('s1'))
+        self.assertNotIn('tracker', self.store.runtime('s1'))
+
+    def test_concurrent_frames_keep_every_student(self):
+        """Test that frames recorded from many threads lose no students"""
+        def worker(offset):
+            for i in range(50):
+                self.store.record_frame('s1', {f"{offset + i}_s"}, False)
+
+        threads = [threading.Thread(target=worker, args=(n * 50,)) for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        session = self.store.get('s1')
+        self.assertEqual(len(session['recognized_students']), 400)
+        self.assertEqual(session['frames'], 400)
+
+class TestTimingWindow(unittest.TestCase):
+    """Test cases for the live timing summaries"""
+
+    def test_stats(self):
+        """Test count, mean, 95th percentile and max over the recent window"""
+        window = TimingWindow(size=100)
+        self.assertIsNone(window.stats()['p95_ms'])
+        for ms in range(1, 201):
+            window.add(ms / 1000)
+        stats = window.stats()
+        self.assertEqual(stats['count'], 200)
+        self.assertEqual(stats['max_ms'], 200)
+        self.assertEqual(stats['p95_ms'], 196)
+        self.assertAlmostEqual(stats['mean_ms'], 150.5)
+
+class TestSessionReaper(unittest.TestCase):
+    """Test cases for the expiry of abandoned live sessions"""
+
+    def setUp(self):
+        self.store = MemorySessionStore()
+        self.saved = []
+        self.store.create('idle', 'faculty@example.com', 'CE_1')
+        self.store.create('busy', 'faculty@example.com', 'CE_1')
+        self.store.record_frame('idle', {'1_a'}, False)
+
+    def reaper(self, policy='commit', commit=None):
+        return SessionReaper(self.store, commit or self.saved.append, idle_seconds=60, max_seconds=3600,
+                             interval=1, policy=policy)
+
+    def test_idle_session_committed(self):
+        """Test that a session without frames is saved, ended and removed"""
+        reaper = self.reaper()
+        events = self.store.events('idle')
+        now = time.time() + 120
+        self.store._sessions['busy'].data['last_activity'] = now
+        self.assertEqual(reaper.reap(now), ['idle'])
+        self.assertEqual(self.saved[0]['recognized_students'], {'1_a'})
+        self.assertIsNone(self.store.get('idle'))
+        self.assertEqual(events.since(0)[-1][2], {'saved': True, 'count': 1, 'expired': 'idle'})
+        self.assertEqual(reaper.stats()['active'], 1)
+        self.assertEqual(reaper.stats()['committed'], 1)
+
+    def test_absolute_lifetime(self):
+        """Test that a session expires after its maximum lifetime even while receiving frames"""
+        reaper = self.reaper(policy='discard')
+        now = time.time() + 4000
+        for entry in self.store._sessions.values():
+            entry.data['last_activity'] = now
+        self.assertEqual(sorted(reaper.reap(now)), ['busy', 'idle'])
+        self.assertEqual(self.saved, [])
+        self.assertEqual(reaper.stats()['discarded'], 2)
+
+    def test_stopped_session_not_reaped(self):
+        """Test that a session stopped meanwhile is left to its stop request"""
+        reaper = self.reaper()
+        self.store.deactivate('idle')
+        self.assertEqual(reaper.reap(time.time() + 120), ['busy'])
+        self.assertEqual([data['session_id'] for data in self.saved], ['busy'])
+
+    def test_failed_commit_counted(self):
+        """Test that a session whose attendance cannot be saved still ends"""
+        def fail(session_data):
+            raise LookupError('Lecture info not found')
+
+        reaper = self.reaper(commit=fail)
+        reaper.reap(time.time() + 120)
+        self.assertEqual(self.store.count(), 0)
+        self.assertEqual(reaper.stats()['commit_failed'], 2)
+
+    def test_prunes_runtime_of_ended_sessions(self):
+        """Test that working objects of sessions ended elsewhere are dropped"""
+        self.store.runtime('gone')['tracker'] = object()
+        self.store.runtime('busy')['tracker'] = object()
+        self.reaper().reap()
+        self.assertEqual(set(self.store._runtime), {'busy'})
+
+    def test_unknown_policy(self):
+        """Test that a misspelled policy is refused"""
+        with self.assertRaises(ValueError):
+            self.reaper(policy='keep')
+
+class TestSessionStoreBackend(unittest.TestCase):
+    """Test cases for choosing the session store backend"""
+
+    def tearDown(self):
+        live_sessions._store = None
+
+    def test_memory_with_several_workers_warns(self):
+        """Test that forcing the memory store under several workers is reported"""
+        live_sessions._store = None
+        output = io.StringIO()
+        with mock.patch.dict(os.environ, {'GUNICORN_WORKERS': '3', 'LIVE_SESSION_STORE': 'memory'}), \
+                redirect_stdout(output):
+            store = live_sessions.get_session_store()
+        self.assertIsInstance(store, MemorySessionStore)
+        self.assertIn('LIVE_SESSION_STORE=mongo', output.getvalue())
+
+    def test_configured_workers(self):
+        """Test that the worker count comes from gunicorn or platform settings"""
+        with mock.patch.dict(os.environ, {'GUNICORN_WORKERS': '', 'WEB_CONCURRENCY': '4'}):
+            self.assertEqual(live_sessions._configured_workers(), 4)
+        with mock.patch.dict(os.environ, {'GUNICORN_WORKERS': 'many'}):
+            self.assertEqual(live_sessions._configured_workers(), 1)
+
+@unittest.skipUnless(os.environ.get('TEST_MONGO_URI'), 'set TEST_MONGO_URI to a local mongod to run')
+class TestMongoSessionStore(unittest.TestCase):
+    """Test cases for the MongoDB live session store"""
+
+    def setUp(self):
+        from pymongo import MongoClient
+        self.client = MongoClient(os.environ['TEST_MONGO_URI'])
+        self.collection = self.client['attendance_test']['live_sessions']
+        self.collection.delete_many({})
+        self.store = MongoSessionStore(self.collection, poll_interval=0.01, max_events=2, grace_seconds=60)
+        self.store.create('s1', 'faculty@example.com', 'CE_1')
+
+    def tearDown(self):
+        self.collection.drop()
+        self.client.close()
+
+    def test_concurrent_stores_merge_students(self):
+        """Test that two stores (like two workers) see each other's recognitions"""
+        other = MongoSessionStore(self.collection)
+        self.store.record_frame('s1', {'1_a'}, False)
+        result = other.record_frame('s1', {'1_a', '2_b'}, True)
+        self.assertEqual(result['new_students'], {'2_b'})
+        self.assertEqual(self.store.get('s1')['gating']['skipped'], 1)
+
+    def test_deactivate_once(self):
+        """Test that only the first stop gets the session"""
+        self.assertIsNotNone(self.store.deactivate('s1'))
+        self.assertIsNone(self.store.deactivate('s1'))
+        self.assertIsNone(self.store.record_frame('s1', {'1_a'}, False))
+
+    def test_events_ordered_and_ended(self):
+        """Test that events get increasing ids, are trimmed and end on close"""
+        events = self.store.events('s1')
+        self.assertEqual([events.publish('update', {'n': i}) for i in range(3)], [1, 2, 3])
+        self.assertIsNone(events.since(0))
+        events.close({'saved': True})
+        self.assertEqual(events.since(3), [(4, 'end', {'saved': True})])
+        self.assertTrue(events.closed)
+        self.assertIsNone(events.publish('update', {}))
+
+    def test_expired(self):
+        """Test that idle sessions and sessions past their lifetime are found"""
+        self.store.create('s2', 'faculty@example.com', 'CE_1')
+        self.collection.update_one({'_id': 's1'}, {'$set': {'last_activity': time.time() - 600}})
+        later = time.time() + 120
+        self.assertEqual(sorted(self.store.expired(300, 3600, later)), ['s1'])
+        self.assertEqual(sorted(self.store.expired(3600, 100, later)), ['s1', 's2'])
+
+    def test_deleted_session_hidden(self):
+        """Test that a deleted session is gone but its end event stays readable"""
+        self.store.events('s1').close()
+        self.store.delete('s1')
+        self.assertIsNone(self.store.get('s1'))
+        self.assertEqual(self.store.events('s1').since(0)[-1][1], 'end')
+
+if __name__ == '__main__':
+    unittest.main()
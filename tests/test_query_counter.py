@@ -0,0 +1,42 @@
+import unittest
+import os
+import sys
+import threading
+from types import SimpleNamespace
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from db.query_counter import QueryCounter
+
+def command(name):
+    return SimpleNamespace(command_name=name)
+
+class TestQueryCounter(unittest.TestCase):
+    """Test cases for the MongoDB command counter"""
+
+    def test_counts_only_while_started(self):
+        """Test that commands are tallied by name between start and stop"""
+        counter = QueryCounter()
+        counter.started(command('find'))
+        with counter.counting() as counts:
+            counter.started(command('aggregate'))
+            counter.started(command('find'))
+            counter.started(command('find'))
+        counter.started(command('find'))
+        self.assertEqual(counts, {'aggregate': 1, 'find': 2})
+        self.assertEqual(counter.stop(), {})
+
+    def test_counts_per_thread(self):
+        """Test that another thread's commands are not counted"""
+        counter = QueryCounter()
+        counts = counter.start()
+        other = threading.Thread(target=counter.started, args=(command('count'),))
+        other.start()
+        other.join()
+        counter.started(command('aggregate'))
+        self.assertEqual(counter.stop(), {'aggregate': 1})
+        self.assertEqual(counts, {'aggregate': 1})
+
+if __name__ == '__main__':
+    unittest.main()
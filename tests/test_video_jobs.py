@@ -0,0 +1,97 @@
+import unittest
+import os
+import sys
+import json
+import shutil
+import tempfile
+import threading
+import time
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.video_jobs import VideoJobQueue
+
+class TestVideoJobQueue(unittest.TestCase):
+    """Test cases for the background video job queue"""
+
+    def setUp(self):
+        """Set up a temporary jobs directory"""
+        self.jobs_dir = tempfile.mkdtemp()
+        self.queue = VideoJobQueue(self.jobs_dir, max_workers=1, progress_interval=0)
+
+    def tearDown(self):
+        shutil.rmtree(self.jobs_dir)
+
+    def _wait(self, job_id, timeout=5):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = self.queue.get(job_id)
+            if job['status'] in ('done', 'failed'):
+                return job
+            time.sleep(0.01)
+        self.fail(f"Job {job_id} did not finish")
+
+    def test_job_result_and_progress(self):
+        """Test that progress and the result are written to the status file"""
+        def target(job):
+            job.progress(5, 10, {'2'})
+            job.progress(10, 10, {'1', '2'})
+            return {'present_students': ['1', '2']}
+
+        job_id = self.queue.submit(target, {'video_path': 'x.mp4'}, class_id='CE_1')
+        job = self._wait(job_id)
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['frames_done'], 10)
+        self.assertEqual(job['recognized'], ['1', '2'])
+        self.assertEqual(job['result'], {'present_students': ['1', '2']})
+        self.assertEqual(job['class_id'], 'CE_1')
+
+    def test_status_visible_while_running(self):
+        """Test that another reader sees a running job's progress"""
+        release = threading.Event()
+
+        def target(job):
+            job.progress(3, 12, {'7'})
+            release.wait(5)
+
+        job_id = self.queue.submit(target, {})
+        deadline = time.time() + 5
+        while self.queue.get(job_id)['frames_done'] != 3 and time.time() < deadline:
+            time.sleep(0.01)
+        with open(self.queue.path_for(job_id)) as f:
+            job = json.load(f)
+        self.assertEqual(job['status'], 'running')
+        self.assertEqual(job['frames_total'], 12)
+        self.assertIsNotNone(job['eta_seconds'])
+        release.set()
+        self._wait(job_id)
+
+    def test_failed_job(self):
+        """Test that an exception marks the job failed with its message"""
+        def target(job):
+            raise IOError("Failed to open video file")
+
+        job = self._wait(self.queue.submit(target, {}))
+        self.assertEqual(job['status'], 'failed')
+        self.assertIn("Failed to open video file", job['error'])
+
+    def test_orphaned_job_reported_failed(self):
+        """Test that a job owned by a dead process is reported as failed"""
+        job_id = self.queue.submit(lambda job: None, {})
+        self._wait(job_id)
+        with open(self.queue.path_for(job_id)) as f:
+            record = json.load(f)
+        record['status'] = 'running'
+        record['owner'] = record['owner'].rpartition(':')[0] + ':999999999'
+        with open(self.queue.path_for(job_id), 'w') as f:
+            json.dump(record, f)
+        self.assertEqual(self.queue.get(job_id)['status'], 'failed')
+
+    def test_unknown_job(self):
+        """Test that unknown or malformed job ids return None"""
+        self.assertIsNone(self.queue.get('0' * 32))
+        self.assertIsNone(self.queue.get('../etc/passwd'))
+
+if __name__ == '__main__':
+    unittest.main()
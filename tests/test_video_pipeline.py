@@ -0,0 +1,248 @@
+import unittest
+import numpy as np
+import os
+import sys
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+import cv2
+
+# Add the app directory to the path
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'app'))
+
+from services.change_detector import ChangeDetector
+from services.frame_sampler import FrameSampler
+from services.gallery_cache import Gallery
+from services.video_attendance import EarlyStopPolicy, cpu_budget_lock, fcntl, process_video, plan_segments
+from services.video_pipeline import FramePipeline
+
+class _NoFaceService:
+    """Face service stand-in that finds no faces and counts the frames it saw"""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.frames = []
+
+    def detect_faces(self, image):
+        time.sleep(self.delay)
+        self.frames.append(image)
+        return []
+
+    def embed_faces(self, items):
+        return [face for _, face in items]
+
+class _Face:
+    def __init__(self, bbox):
+        self.bbox = np.asarray(bbox, dtype=np.float32)
+        self.embedding = None
+
+    @property
+    def normed_embedding(self):
+        return self.embedding
+
+class _WholeClassService:
+    """Face service stand-in that sees every gallery student in every frame"""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.frames = 0
+
+    def detect_faces(self, image):
+        self.frames += 1
+        return [_Face([i * 10, 0, i * 10 + 8, 8]) for i in range(len(self.rows))]
+
+    def embed_faces(self, items):
+        for _, face in items:
+            face.embedding = self.rows[int(face.bbox[0]) // 10]
+        return [face for _, face in items]
+
+class TestFramePipeline(unittest.TestCase):
+    """Test cases for the decode/inference pipeline"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Write a 2 second, 30 fps video"""
+        cls.tmp_dir = tempfile.mkdtemp()
+        cls.video_path = os.path.join(cls.tmp_dir, 'clip.avi')
+        writer = cv2.VideoWriter(cls.video_path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (160, 120))
+        for i in range(60):
+            frame = np.zeros((120, 160, 3), dtype=np.uint8)
+            frame[:, :, 0] = 200  # blue in BGR
+            writer.write(frame)
+        writer.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp_dir)
+
+    def test_frames_are_preprocessed(self):
+        """Test that frames arrive downscaled and converted to RGB"""
+        capture = cv2.VideoCapture(self.video_path)
+        pipeline = FramePipeline(capture, FrameSampler(sample_fps=0, max_frames=0), queue_size=4)
+        frames = [frame for _, _, frame in pipeline]
+        capture.release()
+        self.assertEqual(len(frames), 60)
+        self.assertEqual(frames[0].shape, (30, 40, 3))
+        self.assertGreater(frames[0][0, 0, 2], 150)  # blue moved to the last channel
+        self.assertLessEqual(pipeline.stats()['max_queue_depth'], 4)
+
+    def test_early_stop_releases_decoder(self):
+        """Test that abandoning the iteration stops the decoder thread"""
+        capture = cv2.VideoCapture(self.video_path)
+        pipeline = FramePipeline(capture, FrameSampler(sample_fps=0, max_frames=0), queue_size=2)
+        for count, _ in enumerate(pipeline):
+            if count == 3:
+                break
+        pipeline.close()
+        capture.release()
+        self.assertFalse(any(t.name == 'video-decoder' and t.is_alive() for t in threading.enumerate()))
+
+    def test_process_video_reports_stages(self):
+        """Test that process_video runs every sampled frame and reports stage timings"""
+        service = _NoFaceService(delay=0.01)
+        gallery = Gallery('CE_1', [np.ones(512)], [{'roll_no': '1', 'name': 'a'}])
+        outcome = process_video(self.video_path, service, gallery, batch_size=4,
+                                sampler=FrameSampler(sample_fps=10, max_frames=0), queue_size=2,
+                                change_detector=ChangeDetector(enabled=False))
+        self.assertEqual(outcome['recognized'], [])
+        self.assertEqual(outcome['frames_done'], 20)
+        self.assertEqual(len(service.frames), 20)
+        self.assertEqual(outcome['timings']['bottleneck'], 'inference')
+        self.assertGreater(outcome['timings']['inference_seconds'], 0)
+
+    def test_stops_when_roster_complete(self):
+        """Test that processing stops once every student has been recognized"""
+        rows = np.random.default_rng(0).normal(size=(3, 512)).astype(np.float32)
+        gallery = Gallery('CE_1', rows, [{'roll_no': str(i)} for i in range(3)])
+        service = _WholeClassService(rows)
+        outcome = process_video(self.video_path, service, gallery, batch_size=2,
+                                sampler=FrameSampler(sample_fps=0, max_frames=0),
+                                change_detector=ChangeDetector(enabled=False))
+        self.assertEqual(outcome['recognized'], ['0', '1', '2'])
+        self.assertEqual(outcome['early_stop']['reason'], 'roster_complete')
+        self.assertEqual(outcome['frames_done'], 2)
+        self.assertLess(outcome['early_stop']['fraction_processed'], 0.1)
+
+    def test_runs_to_end_without_policy(self):
+        """Test that a disabled policy processes the whole video"""
+        service = _NoFaceService()
+        gallery = Gallery('CE_1', [np.ones(512)], [{'roll_no': '1', 'name': 'a'}])
+        outcome = process_video(self.video_path, service, gallery, batch_size=4,
+                                sampler=FrameSampler(sample_fps=0, max_frames=0),
+                                early_stop=EarlyStopPolicy({'1'}, enabled=False))
+        self.assertEqual(outcome['early_stop']['reason'], 'end_of_video')
+        self.assertEqual(outcome['early_stop']['fraction_processed'], 1.0)
+        self.assertEqual(outcome['frames_done'], 60)
+
+    def test_static_frames_skip_detection(self):
+        """Test that a still video is detected once and the rest is gated"""
+        service = _NoFaceService()
+        gallery = Gallery('CE_1', [np.ones(512)], [{'roll_no': '1', 'name': 'a'}])
+        outcome = process_video(self.video_path, service, gallery, batch_size=4,
+                                sampler=FrameSampler(sample_fps=0, max_frames=0),
+                                early_stop=EarlyStopPolicy({'1'}, enabled=False),
+                                change_detector=ChangeDetector(max_skip_seconds=60))
+        self.assertEqual(outcome['frames_done'], 60)
+        self.assertEqual(len(service.frames), 1)
+        self.assertEqual(outcome['gating']['skipped'], 59)
+
+    def test_pending_batch_recognized_before_gated_frame(self):
+        """Test that changed frames waiting in a batch are recognized before a skipped frame"""
+        rows = np.random.default_rng(0).normal(size=(3, 512)).astype(np.float32)
+        gallery = Gallery('CE_1', rows, [{'roll_no': str(i)} for i in range(3)])
+        service = _WholeClassService(rows)
+        outcome = process_video(self.video_path, service, gallery, batch_size=8,
+                                sampler=FrameSampler(sample_fps=0, max_frames=0),
+                                change_detector=ChangeDetector(max_skip_seconds=60))
+        self.assertEqual(service.frames, 1)
+        self.assertEqual(outcome['early_stop']['reason'], 'roster_complete')
+        self.assertEqual(outcome['frames_done'], 2)
+
+class TestEarlyStopPolicy(unittest.TestCase):
+    """Test cases for the early-exit policy"""
+
+    def test_idle_after_min_coverage(self):
+        """Test that the idle rule waits for minimum coverage"""
+        policy = EarlyStopPolicy({'1', '2'}, idle_seconds=60, min_coverage=0.5)
+        self.assertIsNone(policy.check({'1'}, 10, 0, 600))
+        self.assertIsNone(policy.check({'1'}, 200, 0, 600))  # idle, but only a third covered
+        self.assertEqual(policy.check({'1'}, 300, 0, 600), 'idle')
+
+    def test_new_identity_resets_idle_clock(self):
+        """Test that a newly recognized student postpones the idle stop"""
+        policy = EarlyStopPolicy({'1', '2', '3'}, idle_seconds=60, min_coverage=0)
+        policy.check({'1'}, 10, 0, 600)
+        self.assertIsNone(policy.check({'1', '2'}, 65, 0, 600))
+        self.assertIsNone(policy.check({'1', '2'}, 120, 0, 600))
+        self.assertEqual(policy.check({'1', '2'}, 125, 0, 600), 'idle')
+
+    def test_roster_complete(self):
+        """Test that a fully recognized roster stops immediately"""
+        policy = EarlyStopPolicy({'1', '2'}, idle_seconds=0)
+        self.assertEqual(policy.check({'1', '2'}, 1, 0, 600), 'roster_complete')
+
+class TestPlanSegments(unittest.TestCase):
+    """Test cases for splitting a video into segments"""
+
+    def test_segments_on_sampling_grid(self):
+        """Test that segments start on the stride grid and cover the video"""
+        segments = plan_segments(9000, 15, 4)
+        self.assertEqual(len(segments), 4)
+        self.assertEqual(segments[0][0], 0)
+        self.assertEqual(segments[-1][1], 9000)
+        for (_, end), (start, _) in zip(segments, segments[1:]):
+            self.assertEqual(end, start)
+            self.assertEqual(start % 15, 0)
+
+    def test_more_segments_than_samples(self):
+        """Test that a short video gets at most one segment per sample"""
+        self.assertEqual(plan_segments(30, 15, 8), [(0, 15), (15, 30)])
+
+class TestCpuBudgetLock(unittest.TestCase):
+    """Test cases for the machine-wide video CPU budget"""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.lock_path = os.path.join(self.tmp_dir, 'video-cpu.lock')
+        os.environ['VIDEO_CPU_LOCK_FILE'] = self.lock_path
+
+    def tearDown(self):
+        os.environ.pop('VIDEO_CPU_LOCK_FILE', None)
+        shutil.rmtree(self.tmp_dir)
+
+    def test_jobs_in_one_process_take_turns(self):
+        """Test that a second job waits until the first releases the budget"""
+        waits = []
+
+        def job():
+            with cpu_budget_lock() as waited:
+                waits.append(waited)
+
+        with cpu_budget_lock():
+            thread = threading.Thread(target=job)
+            thread.start()
+            time.sleep(0.2)
+            self.assertEqual(waits, [])
+        thread.join(timeout=5)
+        self.assertEqual(len(waits), 1)
+        self.assertGreaterEqual(waits[0], 0.15)
+
+    @unittest.skipIf(fcntl is None, "fcntl not available")
+    def test_budget_held_across_processes(self):
+        """Test that another worker process cannot take the budget while a job holds it"""
+        probe = ("import fcntl, sys\n"
+                 "with open(sys.argv[1], 'a') as f:\n"
+                 "    try:\n"
+                 "        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)\n"
+                 "    except OSError:\n"
+                 "        sys.exit(1)\n")
+        with cpu_budget_lock():
+            held = subprocess.run([sys.executable, '-c', probe, self.lock_path])
+        self.assertEqual(held.returncode, 1)
+        released = subprocess.run([sys.executable, '-c', probe, self.lock_path])
+        self.assertEqual(released.returncode, 0)
+
+if __name__ == '__main__':
+    unittest.main()